@@ -0,0 +1,219 @@
+"""
+Database benchmark.
+
+Runs a concurrent read/write workload against a scratch SQLite database, once
+with SQLite's default settings (rollback journal, no indexes beyond keys) and
+once with the settings of storage.py (WAL, pragmas, owner indexes). Writer
+threads do what save_schedule and update_employee do; reader threads list a
+manager's employees and saved schedules. Reported per setup: operations per
+second, p50/p95 latency per operation and the number of "database is locked"
+errors. The app's database is never touched.
+
+Usage:
+    python benchmarks/db_benchmark.py
+    python benchmarks/db_benchmark.py --writers 8 --readers 16 --duration 10
+    python benchmarks/db_benchmark.py --setups tuned --output db_bench.json
+"""
+import argparse
+import json
+import platform
+import random
+import sqlite3
+import statistics
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'shift_scheduler_app'))
+
+from sqlalchemy import create_engine, text
+from sqlalchemy.exc import OperationalError
+
+from storage import DEFAULT_PRAGMAS, configure_sqlite
+
+# The columns the workload touches, as the app creates them
+SCHEMA = [
+    'CREATE TABLE employee (id INTEGER PRIMARY KEY, user_id INTEGER, manager_id INTEGER NOT NULL, '
+    'name VARCHAR(100) NOT NULL, min_hours INTEGER, max_hours INTEGER, wage FLOAT, updated_at DATETIME)',
+    'CREATE TABLE saved_schedule (id INTEGER PRIMARY KEY, user_id INTEGER NOT NULL, name VARCHAR(100) NOT NULL, '
+    'data TEXT NOT NULL, created_at DATETIME, updated_at DATETIME)',
+]
+INDEXES = [
+    'CREATE INDEX ix_employee_manager_id ON employee (manager_id)',
+    'CREATE INDEX ix_employee_user_id ON employee (user_id)',
+    'CREATE INDEX ix_saved_schedule_user_updated ON saved_schedule (user_id, updated_at)',
+]
+
+SETUPS = {
+    # journal_mode is persistent, so the default is set explicitly
+    'default': {'pragmas': {'journal_mode': 'DELETE'}, 'indexes': False},
+    'tuned': {'pragmas': DEFAULT_PRAGMAS, 'indexes': True},
+}
+
+OPERATIONS = ['save_schedule', 'update_employee', 'list_employees', 'list_schedules']
+
+
+def create_database(path, setup, args):
+    conn = sqlite3.connect(path)
+    for statement in SCHEMA + (INDEXES if setup['indexes'] else []):
+        conn.execute(statement)
+    now = datetime.utcnow()
+    rng = random.Random(args.seed)
+    conn.executemany(
+        'INSERT INTO employee (user_id, manager_id, name, min_hours, max_hours, wage, updated_at) '
+        'VALUES (?, ?, ?, 0, 40, ?, ?)',
+        [(None if i % 3 else i, i % args.managers, f'Emp{i}', round(rng.uniform(10, 30), 2), now)
+         for i in range(args.managers * args.employees)])
+    conn.executemany(
+        'INSERT INTO saved_schedule (user_id, name, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?)',
+        [(i % args.managers, f'Week {i}', '{}', now, now) for i in range(args.managers * args.schedules)])
+    conn.commit()
+    conn.close()
+
+
+def writer(engine, args, rng, payload, record, stop):
+    while not stop.is_set():
+        manager = rng.randrange(args.managers)
+        if rng.random() < 0.5:
+            operation = 'save_schedule'
+            statement = text('INSERT INTO saved_schedule (user_id, name, data, created_at, updated_at) '
+                             'VALUES (:manager, :name, :data, :now, :now)')
+            params = {'manager': manager, 'name': 'Bench', 'data': payload, 'now': datetime.utcnow()}
+        else:
+            # Read the employee first, as the ORM does before an update
+            operation = 'update_employee'
+            statement = None
+            params = {'manager': manager, 'wage': round(rng.uniform(10, 30), 2), 'now': datetime.utcnow()}
+        started = time.perf_counter()
+        try:
+            with engine.begin() as conn:
+                if statement is not None:
+                    conn.execute(statement, params)
+                else:
+                    emp_id = conn.execute(text('SELECT id FROM employee WHERE manager_id = :manager LIMIT 1'),
+                                          params).scalar()
+                    conn.execute(text('UPDATE employee SET wage = :wage, updated_at = :now WHERE id = :id'),
+                                 dict(params, id=emp_id))
+            record(operation, time.perf_counter() - started)
+        except OperationalError as e:
+            record(operation, None, e)
+
+
+def reader(engine, args, rng, record, stop):
+    while not stop.is_set():
+        manager = rng.randrange(args.managers)
+        if rng.random() < 0.5:
+            operation = 'list_employees'
+            statement = text('SELECT id, name, min_hours, max_hours, wage FROM employee WHERE manager_id = :manager')
+        else:
+            operation = 'list_schedules'
+            statement = text('SELECT id, name, updated_at FROM saved_schedule WHERE user_id = :manager '
+                             'ORDER BY updated_at DESC, id DESC LIMIT 50')
+        started = time.perf_counter()
+        try:
+            with engine.connect() as conn:
+                conn.execute(statement, {'manager': manager}).all()
+            record(operation, time.perf_counter() - started)
+        except OperationalError as e:
+            record(operation, None, e)
+
+
+def benchmark(name, args):
+    setup = SETUPS[name]
+    with tempfile.TemporaryDirectory() as tmp:
+        path = str(Path(tmp) / 'bench.db')
+        create_database(path, setup, args)
+        engine = create_engine(f'sqlite:///{path}', pool_size=args.writers + args.readers)
+        configure_sqlite(engine, setup['pragmas'])
+
+        latencies = {op: [] for op in OPERATIONS}
+        errors = {op: 0 for op in OPERATIONS}
+        lock = threading.Lock()
+
+        def record(operation, seconds, error=None):
+            with lock:
+                if error is None:
+                    latencies[operation].append(seconds)
+                elif 'locked' in str(error):
+                    errors[operation] += 1
+                else:
+                    raise error
+
+        payload = json.dumps({'schedule': {f'Day{d}': {'Morning': [f'Emp{i}' for i in range(20)]} for d in range(7)}})
+        stop = threading.Event()
+        threads = [threading.Thread(target=writer, args=(engine, args, random.Random(args.seed + i), payload, record, stop))
+                   for i in range(args.writers)]
+        threads += [threading.Thread(target=reader, args=(engine, args, random.Random(-args.seed - i - 1), record, stop))
+                    for i in range(args.readers)]
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+        engine.dispose()
+
+    result = {'setup': name, 'seconds': elapsed, 'operations': {}}
+    for op in OPERATIONS:
+        samples = sorted(latencies[op])
+        result['operations'][op] = {
+            'count': len(samples),
+            'per_second': len(samples) / elapsed,
+            'p50_ms': statistics.median(samples) * 1000 if samples else None,
+            'p95_ms': samples[int(len(samples) * 0.95)] * 1000 if samples else None,
+            'locked_errors': errors[op],
+        }
+    result['per_second'] = sum(r['per_second'] for r in result['operations'].values())
+    return result
+
+
+def print_table(results):
+    print(f"{'setup':>8} {'operation':>16} {'ops/s':>9} {'p50 ms':>9} {'p95 ms':>9} {'locked':>7}", file=sys.stderr)
+    for r in results:
+        for op, stats in r['operations'].items():
+            p50 = f"{stats['p50_ms']:9.2f}" if stats['p50_ms'] is not None else f"{'-':>9}"
+            p95 = f"{stats['p95_ms']:9.2f}" if stats['p95_ms'] is not None else f"{'-':>9}"
+            print(f"{r['setup']:>8} {op:>16} {stats['per_second']:9.1f} {p50} {p95} {stats['locked_errors']:>7}",
+                  file=sys.stderr)
+        print(f"{r['setup']:>8} {'total':>16} {r['per_second']:9.1f}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark concurrent reads and writes on SQLite')
+    parser.add_argument('--setups', nargs='+', choices=sorted(SETUPS), default=['default', 'tuned'])
+    parser.add_argument('--writers', type=int, default=4, help='Writer threads')
+    parser.add_argument('--readers', type=int, default=8, help='Reader threads')
+    parser.add_argument('--duration', type=float, default=5, help='Seconds per setup')
+    parser.add_argument('--managers', type=int, default=50)
+    parser.add_argument('--employees', type=int, default=40, help='Employees per manager')
+    parser.add_argument('--schedules', type=int, default=20, help='Saved schedules per manager to start with')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    args = parser.parse_args()
+
+    results = [benchmark(name, args) for name in args.setups]
+    report = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'sqlite': sqlite3.sqlite_version,
+            'writers': args.writers,
+            'readers': args.readers,
+            'duration': args.duration,
+        },
+        'results': results,
+    }
+
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
@@ -0,0 +1,82 @@
+"""
+Reproducible synthetic scheduling instances.
+
+make_instance() returns a /solve_schedule payload (the same JSON the browser
+sends), so instances can be fed to the solver in-process or over HTTP.
+Staffing minimums are derived from the expected available headcount, which
+keeps most generated instances feasible.
+
+Usage:
+    python benchmarks/instances.py --employees 200 --seed 3 > instance.json
+"""
+import argparse
+import json
+import random
+
+DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+SHIFTS = [('Morning', 4), ('Afternoon', 4), ('Evening', 5), ('Night', 6)]
+
+
+def make_instance(employees=50, days=7, shifts=3, density=0.6, wage_spread=0.3,
+                  responsible_share=0.3, seed=0):
+    """Build a payload for `employees` people over the first `days` days and `shifts` shifts.
+
+    density is the probability that someone is available for a given shift,
+    wage_spread the relative spread of wages around 15/hour.
+    """
+    rng = random.Random(seed)
+    day_names = DAYS[:days] if days <= len(DAYS) else [f'D{d + 1}' for d in range(days)]
+    shift_list = SHIFTS[:shifts] if shifts <= len(SHIFTS) else [(f'S{s + 1}', 4) for s in range(shifts)]
+    shift_hours = dict(shift_list)
+
+    employees_data = []
+    for i in range(employees):
+        name = f'Employee{i + 1}'
+        availability = {f'{name}_{d}_{s}': rng.random() < density for d in day_names for s in shift_hours}
+        available_hours = sum(shift_hours[key.rsplit('_', 1)[1]] for key, ok in availability.items() if ok)
+        max_hours = rng.choice([0, 16, 24, 32, 40])
+        min_hours = min(rng.choice([0, 0, 8, 12]), available_hours, max_hours or available_hours)
+        employees_data.append({
+            'name': name,
+            'availability': availability,
+            'min_hours': min_hours,
+            'max_hours': max_hours,
+            'wage': round(15 * (1 + rng.uniform(-wage_spread, wage_spread)), 2),
+            'can_be_responsible': rng.random() < responsible_share,
+        })
+
+    # Make sure every shift has someone responsible available
+    responsible = [emp for emp in employees_data if emp['can_be_responsible']]
+    if responsible:
+        for d in day_names:
+            for s in shift_hours:
+                if not any(emp['availability'][f"{emp['name']}_{d}_{s}"] for emp in responsible):
+                    emp = rng.choice(responsible)
+                    emp['availability'][f"{emp['name']}_{d}_{s}"] = True
+
+    # Ask for roughly a fifth of the expected available headcount per shift
+    expected = employees * density
+    min_staff = max(1, int(expected * 0.2)) if employees else 0
+    max_staff = max(min_staff, int(expected * 0.6))
+    keys = [f'{d}_{s}' for d in day_names for s in shift_hours]
+    return {
+        'days': day_names,
+        'shifts': [{'name': s, 'hours': h} for s, h in shift_list],
+        'min_employees_per_shift': {k: min_staff for k in keys},
+        'max_employees_per_shift': {k: max_staff for k in keys},
+        'responsible_required_overall': bool(responsible),
+        'full_time_hours_per_week': 38,
+        'employees': employees_data,
+    }
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Print a synthetic /solve_schedule payload')
+    parser.add_argument('--employees', type=int, default=50)
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--shifts', type=int, default=3)
+    parser.add_argument('--density', type=float, default=0.6, help='Probability of being available for a shift')
+    parser.add_argument('--wage-spread', type=float, default=0.3, help='Relative wage spread around 15/hour')
+    parser.add_argument('--seed', type=int, default=0)
+    args = parser.parse_args()
+    print(json.dumps(make_instance(args.employees, args.days, args.shifts, args.density, args.wage_spread, seed=args.seed)))
@@ -0,0 +1,310 @@
+"""
+HTTP load test.
+
+Seeds a throwaway SQLite database with synthetic managers, their employees
+(see instances.py) and saved schedules, then lets concurrent virtual users,
+each logged in as one of the managers, drive a weighted mix of requests
+against the app: login, /api/employees, /get_schedules, /load_schedule,
+/save_schedule and /solve_schedule (on the stored employees). Requests go
+through Flask's test client in this process, or with --http over real HTTP
+to a server started on localhost. Reported per route: requests, errors,
+throughput and p50/p95/p99 latency. The app's own database is never touched.
+
+Usage:
+    python benchmarks/load_test.py
+    python benchmarks/load_test.py --users 16 --duration 30 --http --output load.json
+    python benchmarks/load_test.py --baseline load.json
+
+With --baseline the exit status is 1 when the p95 latency of a route got
+worse than the tolerance allows, or its throughput dropped by as much.
+"""
+import argparse
+import http.cookiejar
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'shift_scheduler_app'))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+import app as scheduler
+from instances import make_instance
+
+PASSWORD = 'load-test'
+
+# Relative frequency of each action of a virtual user
+ACTIONS = {
+    'login': 1,
+    'list_employees': 8,
+    'get_schedules': 4,
+    'load_schedule': 3,
+    'save_schedule': 2,
+    'solve_schedule': 1,
+}
+
+# Latency differences below this many milliseconds are treated as noise when comparing
+MIN_REGRESSION_MS = 2.0
+
+
+class TestClient:
+    # Flask's test client, answering like HttpClient
+    def __init__(self, app):
+        self.client = app.test_client()
+
+    def request(self, method, path, json_body=None, form=None):
+        response = self.client.open(path, method=method, json=json_body, data=form)
+        return response.status_code, response.get_data()
+
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = urllib.request.build_opener(urllib.request.HTTPCookieProcessor(http.cookiejar.CookieJar()))
+
+    def request(self, method, path, json_body=None, form=None):
+        headers, data = {}, None
+        if json_body is not None:
+            headers['Content-Type'] = 'application/json'
+            data = json.dumps(json_body).encode('utf-8')
+        elif form is not None:
+            data = urllib.parse.urlencode(form).encode('utf-8')
+        req = urllib.request.Request(self.base_url + path, data=data, headers=headers, method=method)
+        try:
+            with self.opener.open(req) as response:
+                return response.status, response.read()
+        except urllib.error.HTTPError as e:
+            return e.code, e.read()
+
+
+def seed(scheduler, app, args):
+    """Create the managers, employees and saved schedules; returns [(username, solve payload, schedule ids)]."""
+    A = scheduler
+    managers = []
+    with app.app_context():
+        for m in range(args.managers):
+            instance = make_instance(args.employees, seed=args.seed + m)
+            user = A.User(username=f'manager{m}', role='manager')
+            user.set_password(PASSWORD)
+            A.db.session.add(user)
+            A.db.session.flush()
+            for emp in instance['employees']:
+                employee = A.Employee(manager_id=user.id, name=emp['name'], min_hours=emp['min_hours'],
+                                      max_hours=emp['max_hours'], wage=emp['wage'],
+                                      can_be_responsible=emp['can_be_responsible'])
+                employee.set_availability(mapping=emp['availability'])
+                A.db.session.add(employee)
+            A.db.session.flush()
+
+            # Solve on the stored employees, like the scheduler page
+            solve_input = {key: value for key, value in instance.items() if key != 'employees'}
+            solve_input.update(employee_ids='all', time_limit=args.solve_time_limit)
+            schedule_ids = []
+            for i in range(args.schedules):
+                saved = A.SavedSchedule(user_id=user.id, name=f'Week {i + 1}')
+                saved.set_schedule_data({'input': instance, 'schedule': {}})
+                A.db.session.add(saved)
+                A.db.session.flush()
+                schedule_ids.append(saved.id)
+            managers.append((user.username, solve_input, instance, schedule_ids))
+        A.db.session.commit()
+    return managers
+
+
+def virtual_user(client, manager, args, rng, record, stop):
+    username, solve_input, instance, schedule_ids = manager
+    actions, weights = list(ACTIONS), list(ACTIONS.values())
+    action = 'login'
+    while not stop.is_set():
+        if action == 'login':
+            request = ('POST', '/login', None, {'form_type': 'login', 'username': username, 'password': PASSWORD})
+            ok = (302,)
+        elif action == 'list_employees':
+            request = ('GET', '/api/employees', None, None)
+            ok = (200,)
+        elif action == 'get_schedules':
+            request = ('GET', '/get_schedules', None, None)
+            ok = (200,)
+        elif action == 'load_schedule':
+            request = ('GET', f'/load_schedule/{rng.choice(schedule_ids)}', None, None)
+            ok = (200,)
+        elif action == 'save_schedule':
+            request = ('POST', '/save_schedule', {'name': 'Load test', 'schedule_data': {'input': instance, 'schedule': {}}}, None)
+            ok = (200,)
+        else:
+            request = ('POST', '/solve_schedule', solve_input, None)
+            ok = (200,)
+
+        started = time.perf_counter()
+        try:
+            status, body = client.request(*request)
+            error = None if status in ok else f'HTTP {status}'
+        except OSError as e:
+            body, error = b'', str(e)
+        seconds = time.perf_counter() - started
+        record(action, seconds, error)
+        if action == 'save_schedule' and error is None:
+            schedule_ids.append(json.loads(body)['schedule_id'])
+
+        if args.think:
+            time.sleep(rng.uniform(0, 2 * args.think))
+        action = rng.choices(actions, weights)[0]
+
+
+def percentile(samples, q):
+    # Nearest rank on sorted samples
+    if not samples:
+        return None
+    return samples[min(len(samples) - 1, max(0, int(round(q / 100 * len(samples))) - 1))]
+
+
+def run(args):
+    with tempfile.TemporaryDirectory() as tmp:
+        app = scheduler.create_app({'SQLALCHEMY_DATABASE_URI': f"sqlite:///{(Path(tmp) / 'load_test.db').as_posix()}"})
+        scheduler.init_db(app)
+        managers = seed(scheduler, app, args)
+        solve_jobs = app.extensions['solve_jobs']
+        solve_jobs.start()
+
+        server = None
+        if args.http:
+            from werkzeug.serving import make_server
+            server = make_server('127.0.0.1', args.port, app, threaded=True)
+            threading.Thread(target=server.serve_forever, daemon=True).start()
+            base_url = f'http://127.0.0.1:{server.server_port}'
+
+        samples = {action: [] for action in ACTIONS}
+        errors = {action: {} for action in ACTIONS}
+        lock = threading.Lock()
+
+        def record(action, seconds, error):
+            with lock:
+                if error is None:
+                    samples[action].append(seconds)
+                else:
+                    errors[action][error] = errors[action].get(error, 0) + 1
+
+        stop = threading.Event()
+        threads = []
+        for u in range(args.users):
+            client = HttpClient(base_url) if args.http else TestClient(app)
+            threads.append(threading.Thread(target=virtual_user, args=(
+                client, managers[u % len(managers)], args, random.Random(args.seed + u), record, stop)))
+        started = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        time.sleep(args.duration)
+        stop.set()
+        for thread in threads:
+            thread.join()
+        elapsed = time.perf_counter() - started
+
+        if server is not None:
+            server.shutdown()
+        solve_jobs.shutdown()
+        with app.app_context():
+            scheduler.db.engine.dispose()
+
+    routes = {}
+    for action in ACTIONS:
+        done = sorted(samples[action])
+        routes[action] = {
+            'requests': len(done),
+            'errors': errors[action],
+            'per_second': len(done) / elapsed,
+            'p50_ms': _ms(percentile(done, 50)),
+            'p95_ms': _ms(percentile(done, 95)),
+            'p99_ms': _ms(percentile(done, 99)),
+        }
+    return {'seconds': elapsed, 'per_second': sum(r['per_second'] for r in routes.values()), 'routes': routes}
+
+
+def _ms(seconds):
+    return seconds * 1000 if seconds is not None else None
+
+
+def compare(result, baseline, tolerance):
+    regressions = []
+    for action, current in result['routes'].items():
+        old = baseline['result']['routes'].get(action)
+        if old is None or old['p95_ms'] is None or current['p95_ms'] is None:
+            continue
+        if current['p95_ms'] > old['p95_ms'] * (1 + tolerance) and current['p95_ms'] - old['p95_ms'] > MIN_REGRESSION_MS:
+            regressions.append({'route': action, 'metric': 'p95_ms', 'baseline': old['p95_ms'], 'current': current['p95_ms']})
+        if current['per_second'] < old['per_second'] / (1 + tolerance):
+            regressions.append({'route': action, 'metric': 'per_second',
+                                'baseline': old['per_second'], 'current': current['per_second']})
+    return regressions
+
+
+def print_table(result):
+    print(f"{'route':>15} {'requests':>9} {'errors':>7} {'req/s':>8} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9}",
+          file=sys.stderr)
+    for action, r in result['routes'].items():
+        cells = ' '.join(f'{r[k]:9.1f}' if r[k] is not None else f"{'-':>9}" for k in ('p50_ms', 'p95_ms', 'p99_ms'))
+        print(f"{action:>15} {r['requests']:>9} {sum(r['errors'].values()):>7} {r['per_second']:8.1f} {cells}",
+              file=sys.stderr)
+    print(f"{'total':>15} {'':>9} {'':>7} {result['per_second']:8.1f}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Load test the app with concurrent virtual users')
+    parser.add_argument('--users', type=int, default=8, help='Concurrent virtual users')
+    parser.add_argument('--duration', type=float, default=15, help='Seconds to run')
+    parser.add_argument('--think', type=float, default=0.0, help='Mean pause between requests of a user (seconds)')
+    parser.add_argument('--managers', type=int, default=4)
+    parser.add_argument('--employees', type=int, default=30, help='Employees per manager')
+    parser.add_argument('--schedules', type=int, default=20, help='Saved schedules per manager to start with')
+    parser.add_argument('--solve-time-limit', type=float, default=5, help='time_limit of the solve requests (seconds)')
+    parser.add_argument('--http', action='store_true', help='Send real HTTP requests to a server on localhost')
+    parser.add_argument('--port', type=int, default=0, help='Port of that server (default: any free port)')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.25, help='Allowed relative slowdown per route')
+    args = parser.parse_args()
+
+    result = run(args)
+    report = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'cpus': os.cpu_count(),
+            'mode': 'http' if args.http else 'in-process',
+            'users': args.users,
+            'duration': args.duration,
+            'managers': args.managers,
+            'employees': args.employees,
+        },
+        'result': result,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        if baseline['meta']['mode'] != report['meta']['mode'] or baseline['meta']['users'] != args.users:
+            print('Note: the baseline was measured with another mode or number of users', file=sys.stderr)
+        report['regressions'] = compare(result, baseline, args.tolerance)
+        for r in report['regressions']:
+            print(f"REGRESSION {r['route']} {r['metric']}: {r['baseline']:.1f} -> {r['current']:.1f}", file=sys.stderr)
+        exit_code = 1 if report['regressions'] else 0
+
+    print_table(result)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    raise SystemExit(exit_code)
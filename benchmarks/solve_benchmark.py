@@ -0,0 +1,216 @@
+"""
+Solver benchmark.
+
+Runs the solve path in-process on synthetic instances (see instances.py),
+through engines.solve() as the solve workers do, and times each phase
+separately: request parsing (JSON decode + parse_problem), the pre-solve
+checks, the heuristic (MIP start or greedy engine), model build, optimize()
+and result extraction, as reported in the result's solve_stats. Results are
+written as JSON and can be compared against an earlier run. No network or
+database is needed.
+
+The optimizations of the solve path can each be switched on or off, so runs
+with and without one can be compared: --no-precheck, --aggregate (interchange-
+able employees solved as classes), --heuristic-start (greedy MIP start) and
+--model-cache-mb (the per-worker model cache; 0 disables it). --engine picks
+the engine, e.g. greedy to time the heuristic alone.
+
+Usage:
+    python benchmarks/solve_benchmark.py
+    python benchmarks/solve_benchmark.py --sizes 10 50 200 --repeat 5 --output bench.json
+    python benchmarks/solve_benchmark.py --baseline bench.json
+    python benchmarks/solve_benchmark.py --size-limited
+    python benchmarks/solve_benchmark.py --aggregate --output aggregated.json
+    python benchmarks/solve_benchmark.py --model-cache-mb 0 --no-precheck
+
+With --baseline the exit status is 1 when a phase got slower than the
+tolerance allows. --size-limited skips instances that don't fit the
+restricted license bundled with the gurobipy wheel (2000 variables and
+constraints); without it such instances are reported as 'size_limited'.
+"""
+import argparse
+import json
+import platform
+import statistics
+import sys
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'shift_scheduler_app'))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+import gurobipy as gp
+import numpy as np
+from gurobipy import GRB
+
+from instances import make_instance
+import engines
+from models import ModelCache
+from problem import parse_problem
+
+DEFAULT_SIZES = [10, 50, 100, 200, 500, 1000, 2000]
+PHASES = ['parse', 'precheck', 'heuristic', 'build', 'optimize', 'extract', 'total']
+
+# solve_stats timings and the phase they count towards
+STAT_PHASES = {
+    'precheck_seconds': 'precheck',
+    'heuristic_seconds': 'heuristic',
+    'construct_seconds': 'heuristic',
+    'improve_seconds': 'heuristic',
+    'build_seconds': 'build',
+    'optimize_seconds': 'optimize',
+    'extract_seconds': 'extract',
+    'disaggregate_seconds': 'extract',
+}
+# solve_stats reported with each size
+STAT_INFO = ['variables', 'constraints', 'nodes', 'aggregated', 'classes', 'model_reused', 'heuristic_cost']
+
+# Limits of the restricted license shipped with gurobipy
+RESTRICTED_LICENSE_LIMIT = 2000
+
+# Differences below this many seconds are treated as noise when comparing
+MIN_REGRESSION_SECONDS = 0.005
+
+
+def solve_options(args):
+    # The optimizations of the solve path, each of which can be switched off
+    return {'engine': args.engine, 'precheck': args.precheck, 'aggregate': args.aggregate,
+            'heuristic_start': args.heuristic_start, 'model_cache_mb': args.model_cache_mb}
+
+
+def run_once(raw, time_limit, options, models):
+    timings = {}
+    started = time.perf_counter()
+    problem = parse_problem(json.loads(raw))
+    timings['parse'] = time.perf_counter() - started
+
+    result = engines.solve(options['engine'], problem, time_limit=time_limit, precheck=options['precheck'],
+                           aggregate=options['aggregate'], heuristic_start=options['heuristic_start'],
+                           models=models, owner='benchmark')
+    timings['total'] = time.perf_counter() - started
+
+    stats = result.get('solve_stats', {})
+    for name, phase in STAT_PHASES.items():
+        if name in stats:
+            timings[phase] = timings.get(phase, 0.0) + stats[name]
+    info = {'status': result['status'], 'engine': result.get('engine'), 'objective': result.get('total_cost')}
+    info.update({name: stats[name] for name in STAT_INFO if name in stats})
+    if 'fallback_reason' in result:
+        info['fallback_reason'] = result['fallback_reason']
+    return timings, info
+
+
+def benchmark(employees, args):
+    payload = make_instance(employees, args.days, args.shifts, args.density, args.wage_spread, seed=args.seed)
+    raw = json.dumps(payload)
+    options = solve_options(args)
+    record = {'employees': employees, 'days': args.days, 'shifts': args.shifts,
+              'density': args.density, 'seed': args.seed, 'options': options}
+
+    if args.size_limited and args.engine != 'greedy':
+        slots = sum(ok for emp in payload['employees'] for ok in emp['availability'].values())
+        rows = employees * 2 + args.days * args.shifts * 3
+        if max(slots, rows) > RESTRICTED_LICENSE_LIMIT:
+            record['status'] = 'skipped'
+            return record
+
+    # One cache per instance, so repeats after the first reuse its model like a what-if loop
+    models = ModelCache(int(options['model_cache_mb'] * 2**20)) if options['model_cache_mb'] else None
+    samples = []
+    try:
+        for _ in range(args.repeat):
+            timings, info = run_once(raw, args.time_limit, options, models)
+            samples.append(timings)
+    except gp.GurobiError as e:
+        if e.errno != GRB.Error.SIZE_LIMIT_EXCEEDED:
+            raise
+        record['status'] = 'size_limited'
+        return record
+    finally:
+        if models is not None:
+            models.clear()
+
+    record.update(info)
+    record['seconds'] = {phase: statistics.median(s.get(phase, 0.0) for s in samples) for phase in PHASES}
+    return record
+
+
+def compare(results, baseline, tolerance):
+    def key(r):
+        return (r['employees'], r['days'], r['shifts'], r['density'], r['seed'],
+                json.dumps(r.get('options'), sort_keys=True))
+
+    previous = {key(r): r for r in baseline['results'] if 'seconds' in r}
+    regressions = []
+    for record in results:
+        old = previous.get(key(record))
+        if old is None or 'seconds' not in record:
+            continue
+        for phase in PHASES:
+            before, after = old['seconds'][phase], record['seconds'][phase]
+            if after > before * (1 + tolerance) and after - before > MIN_REGRESSION_SECONDS:
+                regressions.append({'employees': record['employees'], 'phase': phase,
+                                    'baseline': before, 'current': after})
+    return regressions
+
+
+def print_table(results):
+    print(f"{'employees':>9} {'status':>12} {'vars':>7} " + ' '.join(f'{p + " ms":>12}' for p in PHASES), file=sys.stderr)
+    for r in results:
+        seconds = r.get('seconds', {})
+        cells = ' '.join(f"{seconds[p] * 1000:12.1f}" if p in seconds else f"{'-':>12}" for p in PHASES)
+        print(f"{r['employees']:>9} {r['status']:>12} {r.get('variables', '-'):>7} {cells}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark the schedule solver on synthetic instances')
+    parser.add_argument('--sizes', type=int, nargs='+', default=DEFAULT_SIZES, help='Employee counts to run')
+    parser.add_argument('--days', type=int, default=7)
+    parser.add_argument('--shifts', type=int, default=3)
+    parser.add_argument('--density', type=float, default=0.6)
+    parser.add_argument('--wage-spread', type=float, default=0.3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=3, help='Runs per size, the median is reported')
+    parser.add_argument('--time-limit', type=float, default=60, help='Gurobi TimeLimit per run (seconds)')
+    parser.add_argument('--engine', choices=sorted(engines.ENGINES), default='gurobi')
+    parser.add_argument('--no-precheck', dest='precheck', action='store_false', help='Skip the combinatorial pre-solve checks')
+    parser.add_argument('--aggregate', action='store_true', help='Solve interchangeable employees as classes')
+    parser.add_argument('--heuristic-start', action='store_true', help='Use the greedy schedule as MIP start')
+    parser.add_argument('--model-cache-mb', type=float, default=0, help='Model cache budget, 0 builds every model anew')
+    parser.add_argument('--size-limited', action='store_true', help='Skip instances too large for a restricted license')
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    parser.add_argument('--baseline', help='JSON results of an earlier run to compare against')
+    parser.add_argument('--tolerance', type=float, default=0.2, help='Allowed relative slowdown per phase')
+    args = parser.parse_args()
+
+    results = [benchmark(n, args) for n in args.sizes]
+    report = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'gurobi': '.'.join(map(str, gp.gurobi.version())),
+            'numpy': np.__version__,
+            'options': solve_options(args),
+        },
+        'results': results,
+    }
+
+    exit_code = 0
+    if args.baseline:
+        with open(args.baseline) as f:
+            report['regressions'] = compare(results, json.load(f), args.tolerance)
+        for r in report['regressions']:
+            print(f"REGRESSION employees={r['employees']} {r['phase']}: "
+                  f"{r['baseline'] * 1000:.1f} ms -> {r['current'] * 1000:.1f} ms", file=sys.stderr)
+        exit_code = 1 if report['regressions'] else 0
+
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
+    raise SystemExit(exit_code)
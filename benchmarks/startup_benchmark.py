@@ -0,0 +1,140 @@
+"""
+Startup benchmark.
+
+Starts the app in fresh Python processes and times what a new web worker goes
+through before and while serving its first request: importing app.py,
+create_app(), and the first request (a failed login, which renders a page and
+queries the database). Two modes are compared:
+
+    lazy   how the app starts now: the schema is left to init_db and the
+           optimization stack is only imported by the solve workers
+    eager  the previous startup, reproduced: Gurobi, SciPy and the model code
+           are imported with the app and every process runs init_db
+
+With --solve, the first /solve_schedule (a small synthetic instance, see
+instances.py) is timed as well, which includes starting the solve pool.
+Reported per mode: the median of each stage over --repeat processes. The
+app's database is never touched.
+
+Usage:
+    python benchmarks/startup_benchmark.py
+    python benchmarks/startup_benchmark.py --repeat 10 --solve --output startup.json
+"""
+import argparse
+import importlib
+import json
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'shift_scheduler_app'))
+sys.path.insert(0, str(ROOT / 'benchmarks'))
+
+MODES = ['lazy', 'eager']
+STAGES = ['import_ms', 'create_app_ms', 'init_db_ms', 'first_request_ms', 'first_solve_ms']
+
+
+def child(mode, database, solve):
+    # Runs in the measured process; prints the stage timings as JSON
+    timings = {}
+    started = time.perf_counter()
+    import app as scheduler
+    if mode == 'eager':
+        # Imported for its side effect only: it pulls in gurobipy and scipy, as app.py used to
+        importlib.import_module('solver')
+    timings['import_ms'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    app = scheduler.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}'})
+    timings['create_app_ms'] = (time.perf_counter() - started) * 1000
+
+    started = time.perf_counter()
+    if mode == 'eager':
+        scheduler.init_db(app)
+    timings['init_db_ms'] = (time.perf_counter() - started) * 1000
+
+    client = app.test_client()
+    started = time.perf_counter()
+    response = client.post('/login', data={'form_type': 'login', 'username': 'nobody', 'password': 'wrong'})
+    timings['first_request_ms'] = (time.perf_counter() - started) * 1000
+    assert response.status_code == 200, response.status_code
+
+    if solve:
+        from instances import make_instance
+        started = time.perf_counter()
+        response = client.post('/solve_schedule', json=dict(make_instance(10, seed=0), time_limit=10))
+        timings['first_solve_ms'] = (time.perf_counter() - started) * 1000
+        assert response.status_code == 200, response.get_data(as_text=True)
+        app.extensions['solve_jobs'].shutdown()
+    print(json.dumps(timings))
+
+
+def benchmark(mode, database, args):
+    command = [sys.executable, __file__, '--child', mode, '--database', database]
+    if args.solve:
+        command.append('--solve')
+    runs = []
+    for _ in range(args.repeat):
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        runs.append(json.loads(output.strip().splitlines()[-1]))
+
+    result = {'mode': mode, 'runs': len(runs)}
+    for stage in STAGES:
+        samples = [run[stage] for run in runs if stage in run]
+        result[stage] = statistics.median(samples) if samples else None
+    # Until the first page is served
+    result['ready_ms'] = sum(result[stage] for stage in STAGES[:4])
+    return result
+
+
+def print_table(results):
+    print(f"{'mode':>6} " + ' '.join(f'{stage[:-3]:>13}' for stage in STAGES + ['ready_ms']), file=sys.stderr)
+    for r in results:
+        cells = ' '.join(f'{r[stage]:13.1f}' if r[stage] is not None else f"{'-':>13}" for stage in STAGES + ['ready_ms'])
+        print(f"{r['mode']:>6} {cells}", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark app startup and first-request latency')
+    parser.add_argument('--modes', nargs='+', choices=MODES, default=MODES)
+    parser.add_argument('--repeat', type=int, default=5, help='Processes started per mode')
+    parser.add_argument('--solve', action='store_true', help='Also time the first solve request')
+    parser.add_argument('--output', help='Write JSON results to this file instead of stdout')
+    parser.add_argument('--child', choices=MODES, help=argparse.SUPPRESS)
+    parser.add_argument('--database', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        child(args.child, args.database, args.solve)
+        raise SystemExit(0)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        # The schema is set up once, like a deploy running init-db
+        database = (Path(tmp) / 'startup.db').as_posix()
+        import app as scheduler
+        scheduler.init_db(scheduler.create_app({'SQLALCHEMY_DATABASE_URI': f'sqlite:///{database}'}))
+        results = [benchmark(mode, database, args) for mode in args.modes]
+
+    report = {
+        'meta': {
+            'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+            'python': platform.python_version(),
+            'platform': platform.platform(),
+            'repeat': args.repeat,
+            'solve': args.solve,
+        },
+        'results': results,
+    }
+
+    print_table(results)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+    else:
+        print(json.dumps(report, indent=2))
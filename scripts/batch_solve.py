@@ -0,0 +1,244 @@
+"""
+Standalone script to regenerate the schedule of every store (manager) in one run, e.g. overnight.
+For each manager it takes a saved shift configuration, the manager's current employees and
+solves all stores in parallel. The schedules are saved as new SavedSchedule rows.
+
+A saved shift configuration is a saved schedule whose data holds the solve input
+({'input': {days, shifts, min/max_employees_per_shift, ...}, ...}); the employees in it are
+ignored in favour of the stored ones.
+
+Usage:
+    python scripts/batch_solve.py --list
+    python scripts/batch_solve.py --workers 4 --threads 8
+    python scripts/batch_solve.py --manager alice --manager bob --config "Default week" --dry-run
+
+Default DB path: instance/scheduler.db
+Exit status: 0 when every solved store got a schedule, 2 otherwise (also when a store's
+shift configuration is unusable or its solve failed).
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import sqlite3
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from datetime import datetime
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT / 'shift_scheduler_app'))
+
+from availability import unpack, from_keys, pack, encode_mask
+from payloads import dump_data, load_data, assignment_rows
+from roster import Roster
+
+DEFAULT_DB = ROOT / 'instance' / 'scheduler.db'
+
+# Keys of a saved solve input that make up the shift configuration
+CONFIG_KEYS = ('days', 'shifts', 'min_employees_per_shift', 'max_employees_per_shift',
+               'responsible_required_overall', 'full_time_hours_per_week', 'forbid_close_open')
+
+
+def has_compressed_payloads(cur):
+    # Databases the app hasn't migrated yet only have the JSON text column
+    return 'data_zlib' in {row[1] for row in cur.execute("PRAGMA table_info(saved_schedule)")}
+
+
+def load_config(cur, manager_id, name=None):
+    # Most recent saved schedule of the manager (with that name) that holds a solve input
+    select = "data, data_zlib" if has_compressed_payloads(cur) else "data, NULL"
+    query = "SELECT id, name FROM saved_schedule WHERE user_id=?"
+    params = [manager_id]
+    if name:
+        query += " AND name=?"
+        params.append(name)
+    for schedule_id, schedule_name in cur.execute(query + " ORDER BY updated_at DESC", params).fetchall():
+        # Payloads are read one at a time, newest first, until one holds a solve input
+        data, data_zlib = cur.execute(f"SELECT {select} FROM saved_schedule WHERE id=?", (schedule_id,)).fetchone()
+        solve_input = load_data(data, data_zlib).get('input')
+        if solve_input:
+            return schedule_name, {key: solve_input[key] for key in CONFIG_KEYS if key in solve_input}
+    return None, None
+
+
+def load_employees(cur, manager_id):
+    # Rows for Roster.from_rows; databases the app hasn't migrated yet only have the JSON availability
+    columns = {row[1] for row in cur.execute("PRAGMA table_info(employee)")}
+    packed = 'availability_bits' in columns
+    select = "availability_bits, availability_shifts, availability" if packed else "NULL, NULL, availability"
+    rows = []
+    for row in cur.execute(f"SELECT id, name, min_hours, max_hours, wage, can_be_responsible, is_full_time, {select} "
+                           f"FROM employee WHERE manager_id=? ORDER BY id", (manager_id,)):
+        emp_id, name, min_hours, max_hours, wage, responsible, full_time, bits, shifts, legacy = row
+        if bits is None and legacy:
+            shifts, grid = from_keys(name, json.loads(legacy))
+        else:
+            shifts = json.loads(shifts) if shifts else []
+            grid = unpack(bits, len(shifts))
+        rows.append((emp_id, name, min_hours, max_hours, wage, responsible, full_time, shifts, grid))
+    return rows
+
+
+def solve_store(store, time_limit, threads, aggregate):
+    # Executed inside a pool worker process. Whatever goes wrong with one store
+    # is reported as its result, so the other stores are still solved and saved.
+    started = time.perf_counter()
+    try:
+        import solver
+    except ImportError as e:
+        return store['manager_id'], {'status': 'error', 'message': f'Cannot load the solver: {e}'}, 0.0
+    try:
+        result = solver.solve(store['problem'], time_limit=time_limit, threads=threads, aggregate=aggregate)
+    except solver.gp.GurobiError as e:
+        result = {'status': 'error', 'message': f'Gurobi Error: {e.message}'}
+    except Exception as e:
+        result = {'status': 'error', 'message': f'{type(e).__name__}: {e}'}
+    return store['manager_id'], result, time.perf_counter() - started
+
+
+def solve_input(config, rows, problem):
+    # Solve input stored with the result, so the schedule can be re-solved from the app.
+    # Hours and wage are taken from the problem, which applies the full-time rules.
+    employees = []
+    for e, (emp_id, name, _, _, _, responsible, _, shifts, grid) in enumerate(rows):
+        employees.append({
+            'id': emp_id, 'name': name,
+            'min_hours': float(problem.min_hours[e]), 'max_hours': float(problem.max_hours[e]),
+            'wage': float(problem.wage[e]), 'can_be_responsible': bool(responsible),
+            'availability_mask': encode_mask(shifts, pack(grid)),
+        })
+    return dict(config, employees=employees)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Solve every manager's next schedule and save the results")
+    parser.add_argument('--db', help='Path to sqlite DB', default=str(DEFAULT_DB))
+    parser.add_argument('--list', action='store_true', help='List managers and their shift configuration')
+    parser.add_argument('--manager', action='append', help='Only solve for this username (repeatable)')
+    parser.add_argument('--config', help='Name of the saved schedule to take the shift configuration from '
+                                         '(default: the most recent one with a solve input)')
+    parser.add_argument('--name', default='{config} ({date})', help='Name of the saved schedules, '
+                                                                     'may use {config}, {date} and {manager}')
+    parser.add_argument('--workers', type=int, default=os.cpu_count() or 1, help='Stores solved in parallel')
+    parser.add_argument('--threads', type=int, help='Total Gurobi threads, split over the workers '
+                                                    '(default: one per worker)')
+    parser.add_argument('--time-limit', type=float, default=60, help='Gurobi TimeLimit per store (seconds)')
+    parser.add_argument('--aggregate', action='store_true', help='Solve interchangeable employees as classes')
+    parser.add_argument('--dry-run', action='store_true', help="Solve but don't save anything")
+    args = parser.parse_args()
+
+    db_path = Path(args.db)
+    if not db_path.exists():
+        print(f"DB not found at {db_path}")
+        raise SystemExit(1)
+
+    conn = sqlite3.connect(str(db_path))
+    cur = conn.cursor()
+
+    managers = cur.execute("SELECT id, username FROM user WHERE role='manager' ORDER BY id").fetchall()
+    if args.manager:
+        managers = [m for m in managers if m[1] in args.manager]
+        missing = set(args.manager) - {m[1] for m in managers}
+        if missing:
+            print(f"Managers not found: {', '.join(sorted(missing))}")
+            conn.close()
+            raise SystemExit(1)
+
+    stores, summary = [], {}
+    for manager_id, username in managers:
+        config_name, config = load_config(cur, manager_id, args.config)
+        rows = load_employees(cur, manager_id)
+        summary[manager_id] = {'manager': username, 'config': config_name, 'employees': len(rows),
+                               'status': 'skipped', 'seconds': None, 'total_cost': None, 'schedule_id': None}
+        if config is None:
+            summary[manager_id]['message'] = 'no saved shift configuration'
+        elif not rows:
+            summary[manager_id]['message'] = 'no employees'
+        else:
+            try:
+                problem = Roster.from_rows(rows).problem(config, 'all')
+            except (KeyError, TypeError, ValueError, AttributeError) as e:
+                summary[manager_id].update(status='error', message=f'invalid shift configuration ({type(e).__name__}: {e})')
+                continue
+            stores.append({'manager_id': manager_id, 'problem': problem, 'input': solve_input(config, rows, problem)})
+
+    if args.list:
+        for info in summary.values():
+            print(f"manager={info['manager']} config={info['config']} employees={info['employees']}"
+                  + (f" ({info['message']})" if 'message' in info else ''))
+        conn.close()
+        raise SystemExit(0)
+
+    workers = max(1, min(args.workers, len(stores) or 1))
+    threads = max(1, (args.threads or workers) // workers)
+    results = {}
+    started = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers, mp_context=multiprocessing.get_context('spawn')) as pool:
+        futures = {pool.submit(solve_store, store, args.time_limit, threads, args.aggregate): store['manager_id']
+                   for store in stores}
+        for future in as_completed(futures):
+            try:
+                manager_id, result, seconds = future.result()
+            except Exception as e:
+                # E.g. a worker process that died
+                manager_id, result, seconds = futures[future], {'status': 'error', 'message': f'{type(e).__name__}: {e}'}, None
+            results[manager_id] = result
+            summary[manager_id].update(status=result['status'], seconds=seconds, total_cost=result.get('total_cost'))
+            if 'schedule' not in result:
+                summary[manager_id]['message'] = result.get('message')
+    elapsed = time.perf_counter() - started
+
+    # One bulk insert for all stores that got a schedule
+    now = datetime.utcnow()
+    date = now.strftime('%Y-%m-%d')
+    inserts = []
+    for store in stores:
+        result = results.get(store['manager_id'], {})
+        if 'schedule' not in result:
+            continue
+        info = summary[store['manager_id']]
+        name = args.name.format(config=info['config'], date=date, manager=info['manager'])
+        data = {'input': store['input'], 'schedule': result['schedule'],
+                'result': {key: result[key] for key in ('status', 'total_cost', 'mip_gap') if key in result}}
+        inserts.append((store['manager_id'], name, data))
+        # Employee names are unique within a store unless the roster repeats one; those are not indexed
+        names = [emp['name'] for emp in store['input']['employees']]
+        store['employee_ids'] = {emp['name']: emp['id'] for emp in store['input']['employees']
+                                 if names.count(emp['name']) == 1}
+
+    if inserts and not args.dry_run:
+        if has_compressed_payloads(cur):
+            cur.executemany("INSERT INTO saved_schedule (user_id, name, data, data_zlib, created_at, updated_at) "
+                            "VALUES (?, ?, ?, ?, ?, ?)",
+                            [(user_id, name, *dump_data(data), str(now), str(now)) for user_id, name, data in inserts])
+        else:
+            cur.executemany("INSERT INTO saved_schedule (user_id, name, data, created_at, updated_at) VALUES (?, ?, ?, ?, ?)",
+                            [(user_id, name, json.dumps(data), str(now), str(now)) for user_id, name, data in inserts])
+        # The transaction holds the write lock, so the new rows have the highest, consecutive ids
+        last_id = cur.execute("SELECT MAX(id) FROM saved_schedule").fetchone()[0]
+        for offset, (user_id, *_) in enumerate(reversed(inserts)):
+            summary[user_id]['schedule_id'] = last_id - offset
+        # Assignment rows for the employee shift lookups of the app, if its database has them,
+        # in the same transaction
+        if cur.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name='shift_assignment'").fetchone():
+            cur.executemany("INSERT INTO shift_assignment (schedule_id, employee_id, day, shift) VALUES (?, ?, ?, ?)", [
+                (summary[store['manager_id']]['schedule_id'], *row)
+                for store in stores if 'employee_ids' in store
+                for row in assignment_rows({'schedule': results[store['manager_id']]['schedule']}, store['employee_ids'])
+            ])
+        conn.commit()
+    conn.close()
+
+    print(f"{'manager':<20} {'employees':>9} {'status':>12} {'cost':>10} {'seconds':>8} {'saved as':>8}")
+    for info in summary.values():
+        cost = f"{info['total_cost']:.2f}" if info['total_cost'] is not None else '-'
+        seconds = f"{info['seconds']:.2f}" if info['seconds'] is not None else '-'
+        print(f"{info['manager']:<20} {info['employees']:>9} {info['status']:>12} {cost:>10} {seconds:>8} "
+              f"{info['schedule_id'] or '-':>8}" + (f"  {info['message']}" if info.get('message') else ''))
+    print(f"{len(stores)} stores solved in {elapsed:.2f}s with {workers} workers x {threads} threads, "
+          f"{0 if args.dry_run else len(inserts)} schedules saved")
+    # A time_limit result may come without a schedule; stores with a broken configuration count as failed too
+    failed = [info for info in summary.values() if info['status'] == 'error']
+    raise SystemExit(0 if all('schedule' in r for r in results.values()) and not failed else 2)
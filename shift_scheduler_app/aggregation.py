@@ -0,0 +1,126 @@
+"""
+Symmetry reduction for interchangeable employees.
+
+Employees with the same wage, weekly hour limits, responsible flag and
+availability are interchangeable: any permutation of their assignments costs
+the same. group_employees() merges them into classes that are solved with one
+integer count per (class, day, shift) instead of one binary per person, and
+disaggregate() turns the counts back into named assignments that respect each
+person's weekly hours.
+"""
+from dataclasses import replace
+
+import numpy as np
+
+
+def group_employees(problem):
+    """Return the classes of interchangeable employees as lists of indices, in input order.
+
+    Employees are only merged when any split of their class counts can be
+    balanced within their weekly hours: either they have no hour limits, or
+    all shifts they are available for have the same length. Everyone else
+    stays in a class of their own.
+    """
+    classes = {}
+    for e in range(len(problem.employees)):
+        key = (
+            float(problem.wage[e]),
+            float(problem.min_hours[e]),
+            float(problem.max_hours[e]),
+            bool(problem.responsible[e]),
+            problem.available[e].tobytes(),
+        )
+        if _shift_length(problem, e) is None:
+            key = ('single', e)
+        classes.setdefault(key, []).append(e)
+    return list(classes.values())
+
+
+def _shift_length(problem, e):
+    # Returns 0 for employees without hour limits, the common length of the shifts
+    # they can work when their limits can be rounded to whole shifts, else None
+    if problem.min_hours[e] <= 0 and problem.max_hours[e] <= 0:
+        return 0.0
+    lengths = np.unique(problem.shift_hours[problem.available[e].any(axis=0)])
+    if len(lengths) != 1 or lengths[0] <= 0:
+        return None
+    # A limit below one shift would round to 0, which means 'unlimited'
+    if 0 < problem.max_hours[e] < lengths[0]:
+        return None
+    return float(lengths[0])
+
+
+def class_problem(problem, classes):
+    """Problem with one pseudo-employee per class and hour limits scaled by class size.
+
+    Limits are first rounded to whole shifts (someone with 4 hour shifts and
+    a 10 hour maximum can work 8 hours), which makes the scaled limits exact.
+    Returns (class_problem, sizes); the caller bounds each count by sizes.
+    """
+    first = [members[0] for members in classes]
+    sizes = np.array([len(members) for members in classes], dtype=float)
+    min_hours = problem.min_hours[first].copy()
+    max_hours = problem.max_hours[first].copy()
+    for c, e in enumerate(first):
+        length = _shift_length(problem, e)
+        if length:
+            min_hours[c] = np.ceil(min_hours[c] / length - 1e-9) * length if min_hours[c] > 0 else 0
+            max_hours[c] = np.floor(max_hours[c] / length + 1e-9) * length if max_hours[c] > 0 else 0
+    aggregated = replace(
+        problem,
+        employees=[problem.employees[e] for e in first],
+        available=problem.available[first],
+        min_hours=min_hours * sizes,
+        max_hours=max_hours * sizes,
+        wage=problem.wage[first],
+        responsible=problem.responsible[first],
+    )
+    return aggregated, sizes
+
+
+def disaggregate(problem, classes, slots, values):
+    """Spread class counts over the class members.
+
+    slots/values are the columns and solution of the class model. Members
+    are filled shift by shift, each time picking the members with the fewest
+    hours so far, which balances the week to within one shift. Returns an
+    (E, D, S) bool tensor, or None if someone's weekly hours end up violated.
+    """
+    n_emp, n_days, n_shifts = problem.shape
+    assigned = np.zeros(problem.shape, dtype=bool)
+    counts = np.rint(np.asarray(values)).astype(int)
+    c_idx, d_idx, s_idx = np.unravel_index(slots, (len(classes), n_days, n_shifts))
+
+    for c, members in enumerate(classes):
+        used = np.flatnonzero((c_idx == c) & (counts > 0))
+        if not len(used):
+            continue
+        if len(members) == 1:
+            assigned[members[0], d_idx[used], s_idx[used]] = True
+            continue
+
+        members = np.array(members)
+        hours = problem.shift_hours[s_idx[used]]
+        split = _balanced_split(len(members), counts[used], hours)
+        if not _within_hours(problem, members, split @ hours):
+            return None
+        rows, cols = np.nonzero(split)
+        assigned[members[rows], d_idx[used][cols], s_idx[used][cols]] = True
+    return assigned
+
+
+def _balanced_split(n_members, counts, hours):
+    split = np.zeros((n_members, len(counts)), dtype=bool)
+    worked = np.zeros(n_members)
+    for j in range(len(counts)):
+        chosen = np.argsort(worked, kind='stable')[:counts[j]]
+        split[chosen, j] = True
+        worked[chosen] += hours[j]
+    return split
+
+
+def _within_hours(problem, members, worked):
+    min_hours = problem.min_hours[members]
+    max_hours = problem.max_hours[members]
+    return bool(np.all((min_hours <= 0) | (worked >= min_hours - 1e-6))
+                and np.all((max_hours <= 0) | (worked <= max_hours + 1e-6)))
@@ -1,31 +1,173 @@
-from flask import Flask, request, jsonify, render_template, redirect, url_for, session, flash
+from flask import Flask, Response, request, jsonify, render_template, redirect, url_for, session, flash, stream_with_context, g, has_request_context, current_app
 from flask_sqlalchemy import SQLAlchemy
+from sqlalchemy import event, func, tuple_, insert, select, update, bindparam
+from sqlalchemy.orm import joinedload, deferred, undefer_group
+from sqlalchemy.engine import Engine
+from werkzeug.local import LocalProxy
 from werkzeug.security import generate_password_hash, check_password_hash
 from dotenv import load_dotenv
 import os
 from pathlib import Path
-import gurobipy as gp
-from gurobipy import GRB
-import time
+import atexit
+import csv
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+import hashlib
 import json
+import time
+from collections import Counter
 from datetime import datetime
 
+from problem import parse_problem, apply_delta, affected_days
+from jobs import SolveJobs, JobQueueFull
+from engines import ENGINES
+from horizon import parse_horizon, HorizonError
+from cache import SolveCache
+from roster import RosterCache, UnknownEmployees
+from availability import pack, unpack, from_keys, to_keys, encode_mask, decode_mask
+import metrics
+import bulk
+from payloads import dump_data, load_data, assignment_rows, COMPRESS_MIN_BYTES
+from storage import DEFAULT_PRAGMAS, configure_sqlite, migrate, WriteBehind
+
 # Load environment variables from .env (if present)
 load_dotenv()
 
-app = Flask(__name__)
-
 # Compute a deterministic DB path pointing to the project's instance/scheduler.db
 # app.py lives in shift_scheduler_app; go up to the workspace root then into instance/
 BASE_DIR = Path(__file__).resolve().parents[1]
 DB_PATH = BASE_DIR / 'instance' / 'scheduler.db'
-DB_PATH.parent.mkdir(parents=True, exist_ok=True)
 
-app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-this-in-production')
-app.config['SQLALCHEMY_DATABASE_URI'] = f"sqlite:///{DB_PATH.as_posix()}"
-app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+db = SQLAlchemy()
+
+# Views are collected here and registered on every app create_app() builds,
+# under the endpoint names url_for() knows them by
+_views = []
+
+def route(rule, **options):
+    def decorator(view):
+        _views.append((rule, view, options))
+        return view
+    return decorator
+
+# Services of the current app, set up by create_app()
+write_behind = LocalProxy(lambda: current_app.extensions['write_behind'])
+solve_cache = LocalProxy(lambda: current_app.extensions['solve_cache'])
+solve_jobs = LocalProxy(lambda: current_app.extensions['solve_jobs'])
+roster_cache = LocalProxy(lambda: current_app.extensions['roster_cache'])
+password_hashers = LocalProxy(lambda: current_app.extensions['password_hashers'])
+
+def create_app(config=None):
+    """Build the app; config overrides settings read from the environment.
+
+    Neither importing this module nor building the app touches the schema
+    (see init_db) or imports the optimization stack, which only the solve
+    workers load.
+    """
+    app = Flask(__name__)
+    DB_PATH.parent.mkdir(parents=True, exist_ok=True)
+
+    app.config['SECRET_KEY'] = os.getenv('SECRET_KEY', 'your-secret-key-change-this-in-production')
+    # DATABASE_URL points the app at another database, e.g. a throwaway one for load tests
+    app.config['SQLALCHEMY_DATABASE_URI'] = os.getenv('DATABASE_URL', f"sqlite:///{DB_PATH.as_posix()}")
+    app.config['SQLALCHEMY_TRACK_MODIFICATIONS'] = False
+
+    # SQLite pragmas set on every connection (see storage.py), each overridable as
+    # SQLITE_<NAME>, e.g. SQLITE_BUSY_TIMEOUT=10000 (milliseconds)
+    app.config['SQLITE_PRAGMAS'] = {name: os.getenv(f'SQLITE_{name.upper()}', default)
+                                    for name, default in DEFAULT_PRAGMAS.items()}
+    # Writes nothing waits for (solve cache hit times) are batched every this many seconds
+    app.config['WRITE_BATCH_INTERVAL'] = float(os.getenv('WRITE_BATCH_INTERVAL', 1.0))
+
+    # Solve worker pool: number of processes, default/max per-job time limit (seconds)
+    # and how many jobs may wait in the queue before new submissions are rejected
+    app.config['SOLVE_WORKERS'] = int(os.getenv('SOLVE_WORKERS', max(1, (os.cpu_count() or 2) // 2)))
+    app.config['SOLVE_TIME_LIMIT'] = float(os.getenv('SOLVE_TIME_LIMIT', 60))
+    app.config['SOLVE_MAX_TIME_LIMIT'] = float(os.getenv('SOLVE_MAX_TIME_LIMIT', 300))
+    app.config['SOLVE_MAX_PENDING'] = int(os.getenv('SOLVE_MAX_PENDING', 100))
+    # Cores shared by all concurrent solves (split evenly over the workers) and the
+    # default relative MIP gap (unset: Gurobi's default)
+    app.config['SOLVE_THREADS'] = int(os.getenv('SOLVE_THREADS', os.cpu_count() or 1))
+    app.config['SOLVE_MIP_GAP'] = float(os.getenv('SOLVE_MIP_GAP')) if os.getenv('SOLVE_MIP_GAP') else None
+    # Per-tenant defaults as JSON, keyed by manager user id, e.g. {"3": {"time_limit": 120, "mip_gap": 0.01}}
+    app.config['SOLVE_TENANT_DEFAULTS'] = {int(user_id): defaults for user_id, defaults
+                                           in json.loads(os.getenv('SOLVE_TENANT_DEFAULTS', '{}')).items()}
+    # Most alternative schedules one solve may return from Gurobi's solution pool
+    app.config['SOLVE_MAX_ALTERNATIVES'] = int(os.getenv('SOLVE_MAX_ALTERNATIVES', 10))
+    # Default solver engine ('auto': Gurobi, greedy when Gurobi can't run; 'gurobi'; 'greedy',
+    # see engines.py) and whether Gurobi starts from the greedy schedule
+    app.config['SOLVE_ENGINE'] = os.getenv('SOLVE_ENGINE', 'auto')
+    app.config['SOLVE_HEURISTIC_START'] = os.getenv('SOLVE_HEURISTIC_START', '1') == '1'
+    # Megabytes of built models each solve worker keeps for what-if re-solves (0 disables it)
+    app.config['SOLVE_MODEL_CACHE_MB'] = float(os.getenv('SOLVE_MODEL_CACHE_MB', 256))
+    # Number of solve results kept in the in-memory tier of the result cache
+    app.config['SOLVE_CACHE_SIZE'] = int(os.getenv('SOLVE_CACHE_SIZE', 256))
+    # Solve interchangeable employees as aggregated classes unless a request says otherwise
+    app.config['SOLVE_AGGREGATE'] = os.getenv('SOLVE_AGGREGATE', '0') == '1'
+    # Longest horizon, in weeks, accepted by /api/solve_jobs/horizon
+    app.config['SOLVE_MAX_WEEKS'] = int(os.getenv('SOLVE_MAX_WEEKS', 13))
+    # Number of managers whose employee arrays are kept for solves by employee id
+    app.config['ROSTER_CACHE_SIZE'] = int(os.getenv('ROSTER_CACHE_SIZE', 128))
+    # Seconds between job state checks in the /events stream
+    app.config['SOLVE_EVENTS_INTERVAL'] = float(os.getenv('SOLVE_EVENTS_INTERVAL', 0.25))
+    # Bulk employee import: rows per transaction, most rows per upload and threads
+    # hashing account passwords (hashlib releases the GIL while hashing)
+    app.config['BULK_IMPORT_BATCH_SIZE'] = int(os.getenv('BULK_IMPORT_BATCH_SIZE', 500))
+    app.config['BULK_IMPORT_MAX_ROWS'] = int(os.getenv('BULK_IMPORT_MAX_ROWS', 10000))
+    app.config['BULK_HASH_WORKERS'] = int(os.getenv('BULK_HASH_WORKERS', os.cpu_count() or 1))
+    # Add a Server-Timing header (total and DB time) to every response
+    app.config['METRICS_TIMING_HEADER'] = os.getenv('METRICS_TIMING_HEADER', '0') == '1'
+    # Settings passed in win, e.g. the database of a load test
+    app.config.update(config or {})
+
+    db.init_app(app)
+    with app.app_context():
+        if db.engine.dialect.name == 'sqlite':
+            configure_sqlite(db.engine, app.config['SQLITE_PRAGMAS'])
+        write_behind = WriteBehind(db.engine, interval=app.config['WRITE_BATCH_INTERVAL'])
+    atexit.register(write_behind.flush)
+
+    solve_cache = SolveCache(app.config['SOLVE_CACHE_SIZE'], load=partial(load_cached_result, app),
+                             store=partial(store_cached_result, app))
+    # The pool starts on the first solve, or with SolveJobs.start()
+    solve_jobs = SolveJobs(
+        max_workers=app.config['SOLVE_WORKERS'],
+        default_time_limit=app.config['SOLVE_TIME_LIMIT'],
+        max_time_limit=app.config['SOLVE_MAX_TIME_LIMIT'],
+        max_pending=app.config['SOLVE_MAX_PENDING'],
+        cache=solve_cache,
+        thread_budget=app.config['SOLVE_THREADS'],
+        default_mip_gap=app.config['SOLVE_MIP_GAP'],
+        tenant_defaults=app.config['SOLVE_TENANT_DEFAULTS'],
+        max_alternatives=app.config['SOLVE_MAX_ALTERNATIVES'],
+        on_result=metrics.record_solve,
+        model_cache_bytes=int(app.config['SOLVE_MODEL_CACHE_MB'] * 2**20),
+        default_engine=app.config['SOLVE_ENGINE'],
+        heuristic_start=app.config['SOLVE_HEURISTIC_START'],
+    )
+    atexit.register(solve_jobs.shutdown)
+    password_hashers = ThreadPoolExecutor(max_workers=app.config['BULK_HASH_WORKERS'])
+    atexit.register(password_hashers.shutdown)
+    app.extensions.update(
+        write_behind=write_behind,
+        solve_cache=solve_cache,
+        solve_jobs=solve_jobs,
+        roster_cache=RosterCache(load_roster, maxsize=app.config['ROSTER_CACHE_SIZE'], version=employee_version),
+        password_hashers=password_hashers,
+    )
+
+    app.before_request(start_request_timer)
+    app.after_request(record_request)
+    for rule, view, options in _views:
+        app.add_url_rule(rule, view_func=view, **options)
+
+    @app.cli.command('init-db')
+    def init_db_command():
+        """Create missing tables and run pending migrations."""
+        init_db(app)
+
+    return app
 
-db = SQLAlchemy(app)
 
 # Database Models
 class User(db.Model):
@@ -48,38 +190,277 @@ class User(db.Model):
 
 class Employee(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True)  # Nullable for manual entries
-    manager_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)  # Who created this employee
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=True, index=True)  # Nullable for manual entries
+    manager_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)  # Who created this employee
     name = db.Column(db.String(100), nullable=False)
     is_full_time = db.Column(db.Boolean, default=False)
     min_hours = db.Column(db.Integer, default=0)
     max_hours = db.Column(db.Integer, default=40)
     wage = db.Column(db.Float, default=0.0)
     can_be_responsible = db.Column(db.Boolean, default=False)
-    availability = db.Column(db.Text, nullable=True)  # JSON string of availability
+    availability = db.Column(db.Text, nullable=True)  # Legacy JSON availability, converted by migrate_availability()
+    availability_bits = db.Column(db.LargeBinary, nullable=True)  # Packed day x shift grid (see availability.py)
+    availability_shifts = db.Column(db.Text, nullable=True)  # JSON list of the grid's shift names
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
     
     # Manager relationship
     manager = db.relationship('User', foreign_keys=[manager_id], backref='managed_employees')
 
+    def availability_grid(self):
+        """(shifts, (7, len(shifts)) bool grid) of this employee's availability."""
+        if self.availability_bits is None and self.availability:
+            return from_keys(self.name, json.loads(self.availability))
+        shifts = json.loads(self.availability_shifts) if self.availability_shifts else []
+        return shifts, unpack(self.availability_bits, len(shifts))
+
+    def availability_dict(self):
+        return to_keys(self.name, *self.availability_grid())
+
+    def availability_mask(self):
+        if self.availability_bits is None:
+            shifts, grid = self.availability_grid()
+            return encode_mask(shifts, pack(grid))
+        return encode_mask(json.loads(self.availability_shifts or '[]'), self.availability_bits)
+
+    def set_availability(self, mapping=None, mask=None):
+        """Store availability given as a legacy dict or an API mask; invalid masks raise ValueError."""
+        if mask is not None:
+            shifts, bits = decode_mask(mask)
+        else:
+            shifts, grid = from_keys(self.name, mapping or {})
+            bits = pack(grid)
+        self.availability_shifts = json.dumps(shifts)
+        self.availability_bits = bits
+        self.availability = None
+
 class SavedSchedule(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
     name = db.Column(db.String(200), nullable=False)
-    data = db.Column(db.Text, nullable=False)  # JSON string of schedule data
+    # Payload as JSON text, or zlib-compressed with an empty data (see payloads.py);
+    # only loaded when accessed, so listings read metadata alone
+    data = deferred(db.Column(db.Text, nullable=False), group='payload')
+    data_zlib = deferred(db.Column(db.LargeBinary), group='payload')
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
-# Create tables
-with app.app_context():
-    db.create_all()
+    # Keyset pagination of a user's schedules, newest first
+    __table_args__ = (db.Index('ix_saved_schedule_user_updated', 'user_id', 'updated_at'),)
 
-@app.route('/')
+    def schedule_data(self):
+        return load_data(self.data, self.data_zlib)
+
+    def set_schedule_data(self, payload):
+        self.data, self.data_zlib = dump_data(payload)
+
+class ShiftAssignment(db.Model):
+    # One row per assignment of a saved schedule, filled from its 'schedule' when it is saved
+    id = db.Column(db.Integer, primary_key=True)
+    schedule_id = db.Column(db.Integer, db.ForeignKey('saved_schedule.id'), nullable=False)
+    employee_id = db.Column(db.Integer, db.ForeignKey('employee.id'), nullable=False)
+    day = db.Column(db.String(40), nullable=False)
+    shift = db.Column(db.String(100), nullable=False)
+
+    # "My shifts" by employee, "who works" by schedule and slot
+    __table_args__ = (
+        db.Index('ix_shift_assignment_employee', 'employee_id', 'schedule_id'),
+        db.Index('ix_shift_assignment_slot', 'schedule_id', 'day', 'shift'),
+    )
+
+class SolveCacheEntry(db.Model):
+    id = db.Column(db.Integer, primary_key=True)
+    key = db.Column(db.String(64), unique=True, nullable=False)  # sha256 of the normalized solve input
+    result = db.Column(db.Text, nullable=False)  # JSON string of the solve result
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+    last_hit_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+# Schema migrations, run once per database by storage.migrate() (see MIGRATIONS
+# below). Each gets the connection of its transaction and uses plain SQL, which
+# keeps updated_at untouched; all of them tolerate running on a database that
+# is already up to date.
+
+# Older databases predate the packed availability columns; add them and
+# convert the JSON availability once
+def migrate_availability(conn):
+    columns = {c['name'] for c in db.inspect(conn).get_columns('employee')}
+    for name, sql_type in (('availability_bits', 'BLOB'), ('availability_shifts', 'TEXT')):
+        if name not in columns:
+            conn.execute(db.text(f'ALTER TABLE employee ADD COLUMN {name} {sql_type}'))
+    rows = conn.execute(db.text(
+        'SELECT id, name, availability FROM employee WHERE availability_bits IS NULL AND availability IS NOT NULL'
+    )).all()
+    updates = []
+    for emp_id, name, raw in rows:
+        shifts, grid = from_keys(name, json.loads(raw))
+        updates.append({'id': emp_id, 'bits': pack(grid), 'shifts': json.dumps(shifts)})
+    if updates:
+        conn.execute(db.text(
+            'UPDATE employee SET availability_bits = :bits, availability_shifts = :shifts, availability = NULL WHERE id = :id'
+        ), updates)
+
+# Older databases lack the compressed payload column and the listing index;
+# large payloads are compressed once
+def migrate_saved_schedules(conn):
+    columns = {c['name'] for c in db.inspect(conn).get_columns('saved_schedule')}
+    if 'data_zlib' not in columns:
+        conn.execute(db.text('ALTER TABLE saved_schedule ADD COLUMN data_zlib BLOB'))
+    conn.execute(db.text(
+        'CREATE INDEX IF NOT EXISTS ix_saved_schedule_user_updated ON saved_schedule (user_id, updated_at)'
+    ))
+    rows = conn.execute(db.text(
+        'SELECT id, data FROM saved_schedule WHERE data_zlib IS NULL AND length(data) >= :size'
+    ), {'size': COMPRESS_MIN_BYTES}).all()
+    updates = [dict(zip(('data', 'data_zlib'), dump_data(json.loads(raw))), id=schedule_id)
+               for schedule_id, raw in rows]
+    if updates:
+        conn.execute(db.text('UPDATE saved_schedule SET data = :data, data_zlib = :data_zlib WHERE id = :id'),
+                     updates)
+
+# Employees are always looked up by manager (and by account on login); saved
+# schedules by user are covered by ix_saved_schedule_user_updated
+def index_employee_owners(conn):
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_employee_manager_id ON employee (manager_id)'))
+    conn.execute(db.text('CREATE INDEX IF NOT EXISTS ix_employee_user_id ON employee (user_id)'))
+
+def schedule_employee_ids(manager_id, payload, conn=None):
+    # Schedule names -> ids of the manager's employees. Ids sent with the solve input
+    # win; otherwise names that several employees share are left out.
+    employees = (conn or db.session).execute(
+        select(Employee.id, Employee.name).where(Employee.manager_id == manager_id)
+    ).all()
+    counts = Counter(name for _, name in employees)
+    ids = {name: emp_id for emp_id, name in employees if counts[name] == 1}
+    own = {emp_id for emp_id, _ in employees}
+    solve_input = payload.get('input') if isinstance(payload, dict) else None
+    for emp in (solve_input or {}).get('employees') or []:
+        if emp.get('id') in own:
+            ids[emp['name']] = emp['id']
+    return ids
+
+def add_assignments(schedule, payload):
+    rows = assignment_rows(payload, schedule_employee_ids(schedule.user_id, payload))
+    db.session.bulk_insert_mappings(ShiftAssignment, [
+        {'schedule_id': schedule.id, 'employee_id': emp_id, 'day': day, 'shift': shift} for emp_id, day, shift in rows
+    ])
+
+# Saved schedules that predate the assignment table get their assignment rows
+def backfill_assignments(conn):
+    schedules = conn.execute(
+        select(SavedSchedule.id, SavedSchedule.user_id, SavedSchedule.data, SavedSchedule.data_zlib)
+        .where(SavedSchedule.id.not_in(select(ShiftAssignment.schedule_id)))
+    ).all()
+    mappings = []
+    for schedule_id, user_id, data, data_zlib in schedules:
+        payload = load_data(data, data_zlib)
+        mappings.extend({'schedule_id': schedule_id, 'employee_id': emp_id, 'day': day, 'shift': shift}
+                        for emp_id, day, shift in assignment_rows(payload, schedule_employee_ids(user_id, payload, conn)))
+    if mappings:
+        conn.execute(insert(ShiftAssignment), mappings)
+
+# Append only: applied names are recorded in the schema_migrations table
+MIGRATIONS = [
+    ('0001_availability_bits', migrate_availability),
+    ('0002_saved_schedule_payloads', migrate_saved_schedules),
+    ('0003_shift_assignments', backfill_assignments),
+    ('0004_employee_owner_indexes', index_employee_owners),
+]
+
+# Create missing tables, then migrate. Run once per deploy (flask --app app init-db)
+# rather than by every process that imports the app
+def init_db(app):
+    with app.app_context():
+        db.create_all()
+        migrate(db.engine, MIGRATIONS)
+
+# Persistent tier of the solve result cache. Hits only read; their timestamps
+# and new results are written in batches, off the solve pool's callback thread.
+# A result another process stored first is kept.
+touch_cache_entry = (update(SolveCacheEntry).where(SolveCacheEntry.key == bindparam('entry_key'))
+                     .values(last_hit_at=bindparam('hit_at')))
+add_cache_entry = insert(SolveCacheEntry).from_select(
+    ['key', 'result', 'created_at', 'last_hit_at'],
+    select(bindparam('entry_key', type_=db.String), bindparam('result', type_=db.Text),
+           bindparam('now', type_=db.DateTime), bindparam('now', type_=db.DateTime))
+    .where(~select(SolveCacheEntry.id).filter_by(key=bindparam('entry_key')).exists()))
+
+def load_cached_result(app, key):
+    with app.app_context():
+        result = db.session.execute(select(SolveCacheEntry.result).filter_by(key=key)).scalar()
+        if result is None:
+            return None
+        write_behind.add(touch_cache_entry, {'entry_key': key, 'hit_at': datetime.utcnow()})
+        return json.loads(result)
+
+def store_cached_result(app, key, result):
+    with app.app_context():
+        write_behind.add(add_cache_entry, {'entry_key': key, 'result': json.dumps(result), 'now': datetime.utcnow()})
+
+# Newest updated_at and count of a manager's employees. Deletions don't move the
+# newest updated_at, hence the count
+def employee_version(manager_id):
+    return tuple(db.session.query(func.max(Employee.updated_at), func.count(Employee.id)).filter(
+        Employee.manager_id == manager_id).one())
+
+# Stored employees as solver arrays, per manager; the employee routes invalidate it
+# and other processes notice changes through employee_version
+def load_roster(manager_id):
+    employees = Employee.query.filter_by(manager_id=manager_id).all()
+    return [(emp.id, emp.name, emp.min_hours, emp.max_hours, emp.wage, emp.can_be_responsible, emp.is_full_time,
+             *emp.availability_grid())
+            for emp in employees]
+
+# Instrumentation: request latency and DB queries per route (see metrics.py)
+@event.listens_for(Engine, 'before_cursor_execute')
+def start_query_timer(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+@event.listens_for(Engine, 'after_cursor_execute')
+def stop_query_timer(conn, cursor, statement, parameters, context, executemany):
+    seconds = time.perf_counter() - conn.info['query_started'].pop()
+    endpoint = (request.endpoint or 'unmatched') if has_request_context() else 'none'
+    metrics.db_queries.inc(endpoint=endpoint)
+    metrics.db_latency.observe(seconds, endpoint=endpoint)
+    if has_request_context() and 'db_queries' in g:
+        g.db_queries += 1
+        g.db_seconds += seconds
+
+def start_request_timer():
+    g.request_started = time.perf_counter()
+    g.db_queries = 0
+    g.db_seconds = 0.0
+
+def record_request(response):
+    if 'request_started' not in g:
+        return response
+    seconds = time.perf_counter() - g.request_started
+    endpoint = request.endpoint or 'unmatched'
+    metrics.http_requests.inc(endpoint=endpoint, method=request.method, status=response.status_code)
+    metrics.http_latency.observe(seconds, endpoint=endpoint, method=request.method)
+    if current_app.config['METRICS_TIMING_HEADER']:
+        response.headers['Server-Timing'] = (f'app;dur={seconds * 1000:.1f}, '
+                                             f'db;dur={g.db_seconds * 1000:.1f};desc="{g.db_queries} queries"')
+    return response
+
+@metrics.registry.collector
+def collect_pool_metrics():
+    pool = solve_jobs.utilization()
+    for name in ('running', 'queued'):
+        solve_pool_jobs.set(pool[name], state=name)
+    solve_pool_utilization.set(pool['utilization'])
+    cache = solve_cache.stats()
+    solve_cache_lookups.set_total(cache['hits'], result='hit')
+    solve_cache_lookups.set_total(cache['misses'], result='miss')
+
+solve_pool_jobs = metrics.registry.gauge('solve_pool_jobs', 'Solve jobs on the pool', ('state',))
+solve_pool_utilization = metrics.registry.gauge('solve_pool_utilization', 'Share of worker time spent solving')
+solve_cache_lookups = metrics.registry.counter('solve_cache_lookups_total', 'Solve result cache lookups', ('result',))
+
+@route('/')
 def landing():
     return render_template('landing.html')
 
-@app.route('/login', methods=['GET', 'POST'])
+@route('/login', methods=['GET', 'POST'])
 def login():
     if request.method == 'POST':
         form_type = request.form.get('form_type')
@@ -130,18 +511,18 @@ def login():
 
     return render_template('login.html')
 
-@app.route('/logout')
+@route('/logout')
 def logout():
     session.clear()
     return redirect(url_for('landing'))
 
-@app.route('/manager_dashboard')
+@route('/manager_dashboard')
 def manager_dashboard():
     if 'user_id' not in session or session.get('role') != 'manager':
         return redirect(url_for('login'))
     return render_template('manager_dashboard.html')
 
-@app.route('/employee_dashboard')
+@route('/employee_dashboard')
 def employee_dashboard():
     if 'user_id' not in session or session.get('role') != 'employee':
         return redirect(url_for('login'))
@@ -155,7 +536,7 @@ def employee_dashboard():
     
     return render_template('employee_dashboard.html', employee=employee)
 
-@app.route('/scheduler')
+@route('/scheduler')
 def scheduler():
     if 'user_id' not in session:
         return render_template('index.html')
@@ -166,31 +547,84 @@ def scheduler():
     else:
         return redirect(url_for('employee_dashboard'))
 
+def availability_fields(employee):
+    """Availability as returned by the API: the legacy dict, or the packed mask with ?availability=mask."""
+    if request.args.get('availability') == 'mask':
+        return {'availability_mask': employee.availability_mask()}
+    return {'availability': employee.availability_dict()}
+
+def apply_availability(employee, data):
+    """Set availability from a request body if it has any; returns an error message for invalid masks."""
+    try:
+        if data.get('availability_mask') is not None:
+            employee.set_availability(mask=data['availability_mask'])
+        elif 'availability' in data:
+            employee.set_availability(mapping=data['availability'])
+    except (KeyError, TypeError, ValueError) as e:
+        return f'Invalid availability: {e}'
+    return None
+
+# Fields of the employee listing, selectable with ?fields=
+EMPLOYEE_FIELDS = {
+    'id': lambda emp: {'id': emp.id},
+    'name': lambda emp: {'name': emp.name},
+    'is_full_time': lambda emp: {'is_full_time': emp.is_full_time},
+    'min_hours': lambda emp: {'min_hours': emp.min_hours},
+    'max_hours': lambda emp: {'max_hours': emp.max_hours},
+    'wage': lambda emp: {'wage': emp.wage},
+    'can_be_responsible': lambda emp: {'can_be_responsible': emp.can_be_responsible},
+    'availability': availability_fields,
+    'has_account': lambda emp: {'has_account': emp.user_id is not None},
+    'username': lambda emp: {'username': emp.user_account.username if emp.user_account else None},
+}
+
 # Employee Management Routes
-@app.route('/api/employees', methods=['GET'])
+@route('/api/employees', methods=['GET'])
 def get_employees():
+    # Optional ?fields=id,name,..., ?page= and ?per_page=; answers 304 to a matching
+    # If-None-Match while the manager's employees are unchanged
     if 'user_id' not in session or session.get('role') != 'manager':
         return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
-    
-    employees = Employee.query.filter_by(manager_id=session['user_id']).all()
-    employees_list = []
-    for emp in employees:
-        employees_list.append({
-            'id': emp.id,
-            'name': emp.name,
-            'is_full_time': emp.is_full_time,
-            'min_hours': emp.min_hours,
-            'max_hours': emp.max_hours,
-            'wage': emp.wage,
-            'can_be_responsible': emp.can_be_responsible,
-            'availability': json.loads(emp.availability) if emp.availability else {},
-            'has_account': emp.user_id is not None,
-            'username': emp.user_account.username if emp.user_account else None
-        })
-    
-    return jsonify({'status': 'success', 'employees': employees_list})
 
-@app.route('/api/employees', methods=['POST'])
+    fields = request.args.get('fields', '').split(',') if request.args.get('fields') else list(EMPLOYEE_FIELDS)
+    unknown = [f for f in fields if f not in EMPLOYEE_FIELDS]
+    if unknown:
+        return jsonify({'status': 'error', 'message': f"Unknown fields: {', '.join(unknown)}"}), 400
+    page = request.args.get('page', type=int)
+    per_page = request.args.get('per_page', 100, type=int)
+    if (page is not None and page < 1) or not 1 <= per_page <= 1000:
+        return jsonify({'status': 'error', 'message': 'page must be at least 1 and per_page between 1 and 1000'}), 400
+
+    # The count is part of the validator, see employee_version. There is no
+    # Last-Modified: the newest updated_at alone misses deletions
+    last_modified, count = employee_version(session['user_id'])
+    etag = hashlib.sha1(f"{session['user_id']}|{last_modified}|{count}|{request.query_string.decode()}".encode()).hexdigest()
+    if etag in request.if_none_match:
+        response = Response(status=304)
+    else:
+        query = Employee.query.filter_by(manager_id=session['user_id']).order_by(Employee.id)
+        if 'username' in fields:
+            query = query.options(joinedload(Employee.user_account))
+        if page is not None:
+            query = query.limit(per_page).offset((page - 1) * per_page)
+        employees_list = []
+        for emp in query:
+            item = {}
+            for field in fields:
+                item.update(EMPLOYEE_FIELDS[field](emp))
+            employees_list.append(item)
+        body = {'status': 'success', 'employees': employees_list}
+        if page is not None:
+            body.update(page=page, per_page=per_page, total=count)
+        response = jsonify(body)
+
+    response.set_etag(etag)
+    # Browsers revalidate on every load instead of reusing a stale roster
+    response.cache_control.private = True
+    response.cache_control.no_cache = True
+    return response
+
+@route('/api/employees', methods=['POST'])
 def create_employee():
     if 'user_id' not in session or session.get('role') != 'manager':
         return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
@@ -228,11 +662,15 @@ def create_employee():
         max_hours=data.get('max_hours', 40),
         wage=data.get('wage', 0.0),
         can_be_responsible=data.get('can_be_responsible', False),
-        availability=json.dumps(data.get('availability', {}))
     )
+    error = apply_availability(new_employee, {'availability': {}, **data})
+    if error:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': error}), 400
     
     db.session.add(new_employee)
     db.session.commit()
+    roster_cache.invalidate(new_employee.manager_id)
     
     return jsonify({
         'status': 'success',
@@ -240,7 +678,120 @@ def create_employee():
         'employee_id': new_employee.id
     })
 
-@app.route('/api/employees/<int:employee_id>', methods=['PUT'])
+def import_batch(manager_id, batch, errors):
+    # Insert one batch of validated (line, fields) rows in a single transaction;
+    # returns (employees, accounts) created and appends row errors
+    usernames = [fields['username'] for _, fields in batch if 'username' in fields]
+    taken = {name for (name,) in db.session.query(User.username).filter(User.username.in_(usernames))}
+    employees, accounts = [], []
+    for line, fields in batch:
+        username = fields.get('username')
+        if username is not None and username in taken:
+            errors.append({'line': line, 'message': 'Username already exists'})
+            continue
+        # A transient Employee validates the availability and converts it to the stored columns
+        employee = Employee(name=fields['name'])
+        error = apply_availability(employee, fields)
+        if error:
+            errors.append({'line': line, 'message': error})
+            continue
+        taken.add(username)
+        now = datetime.utcnow()
+        employees.append(dict(
+            {key: fields[key] for key in ('name', 'is_full_time', 'min_hours', 'max_hours', 'wage', 'can_be_responsible')},
+            manager_id=manager_id, user_id=None, availability=None, availability_bits=employee.availability_bits,
+            availability_shifts=employee.availability_shifts, created_at=now, updated_at=now,
+        ))
+        if username is not None:
+            accounts.append((employees[-1], username, fields['password']))
+
+    # Executemany inserts; account ids are looked up by their (unique) usernames
+    if accounts:
+        hashes = password_hashers.map(generate_password_hash, [password for _, _, password in accounts])
+        db.session.execute(insert(User), [
+            {'username': username, 'role': 'employee', 'password_hash': password_hash, 'created_at': row['created_at']}
+            for (row, username, _), password_hash in zip(accounts, hashes)
+        ])
+        user_ids = dict(db.session.query(User.username, User.id).filter(
+            User.username.in_([username for _, username, _ in accounts])))
+        for row, username, _ in accounts:
+            row['user_id'] = user_ids[username]
+    if employees:
+        db.session.execute(insert(Employee), employees)
+    db.session.commit()
+    return len(employees), len(accounts)
+
+@route('/api/employees/import', methods=['POST'])
+def import_employees():
+    # Body: CSV or JSON Lines (?format=csv|jsonl, see bulk.py), read row by row.
+    # Invalid rows are skipped and reported by line; valid ones are inserted in
+    # batches of BULK_IMPORT_BATCH_SIZE rows, one transaction each.
+    if 'user_id' not in session or session.get('role') != 'manager':
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in bulk.FORMATS:
+        return jsonify({'status': 'error', 'message': f"format must be one of {', '.join(bulk.FORMATS)}"}), 400
+
+    manager_id = session['user_id']
+    batch_size = current_app.config['BULK_IMPORT_BATCH_SIZE']
+    errors, batch = [], []
+    imported = accounts = rows = 0
+    try:
+        for line, row in bulk.read_rows(request.stream, fmt):
+            rows += 1
+            if rows > current_app.config['BULK_IMPORT_MAX_ROWS']:
+                errors.append({'line': line, 'message': f"Only {current_app.config['BULK_IMPORT_MAX_ROWS']} rows are imported per upload"})
+                break
+            fields, error = bulk.employee_fields(row)
+            if error:
+                errors.append({'line': line, 'message': error})
+                continue
+            batch.append((line, fields))
+            if len(batch) >= batch_size:
+                created, with_account = import_batch(manager_id, batch, errors)
+                imported, accounts, batch = imported + created, accounts + with_account, []
+        if batch:
+            created, with_account = import_batch(manager_id, batch, errors)
+            imported, accounts = imported + created, accounts + with_account
+    except (UnicodeDecodeError, csv.Error) as e:
+        errors.append({'line': None, 'message': f'Unreadable upload: {e}'})
+    finally:
+        if imported:
+            roster_cache.invalidate(manager_id)
+
+    return jsonify({
+        'status': 'success' if not errors else 'partial' if imported else 'error',
+        'imported': imported,
+        'accounts_created': accounts,
+        'errors': errors[:100],
+        'error_count': len(errors),
+    }), 200 if imported or not errors else 400
+
+@route('/api/employees/export', methods=['GET'])
+def export_employees():
+    # Streams the manager's employees (?format=csv|jsonl) without holding the roster in memory
+    if 'user_id' not in session or session.get('role') != 'manager':
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+
+    fmt = request.args.get('format', 'csv')
+    if fmt not in bulk.FORMATS:
+        return jsonify({'status': 'error', 'message': f"format must be one of {', '.join(bulk.FORMATS)}"}), 400
+    manager_id = session['user_id']
+
+    def rows():
+        if fmt == 'csv':
+            yield bulk.csv_line(bulk.EXPORT_FIELDS)
+        query = (select(Employee, User.username).outerjoin(User, User.id == Employee.user_id)
+                 .filter(Employee.manager_id == manager_id).order_by(Employee.id)
+                 .execution_options(yield_per=current_app.config['BULK_IMPORT_BATCH_SIZE']))
+        for employee, username in db.session.execute(query):
+            yield bulk.export_row(employee, username, fmt)
+
+    return Response(stream_with_context(rows()), mimetype=bulk.FORMATS[fmt],
+                    headers={'Content-Disposition': f'attachment; filename=employees.{fmt}'})
+
+@route('/api/employees/<int:employee_id>', methods=['PUT'])
 def update_employee(employee_id):
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
@@ -276,14 +827,17 @@ def update_employee(employee_id):
         employee.wage = data['wage']
     if 'can_be_responsible' in data:
         employee.can_be_responsible = data['can_be_responsible']
-    if 'availability' in data:
-        employee.availability = json.dumps(data['availability'])
+    error = apply_availability(employee, data)
+    if error:
+        db.session.rollback()
+        return jsonify({'status': 'error', 'message': error}), 400
     
     db.session.commit()
+    roster_cache.invalidate(employee.manager_id)
     
     return jsonify({'status': 'success', 'message': 'Employee updated successfully'})
 
-@app.route('/api/employees/<int:employee_id>', methods=['DELETE'])
+@route('/api/employees/<int:employee_id>', methods=['DELETE'])
 def delete_employee(employee_id):
     if 'user_id' not in session or session.get('role') != 'manager':
         return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
@@ -301,12 +855,15 @@ def delete_employee(employee_id):
         if user:
             db.session.delete(user)
     
+    manager_id = employee.manager_id
+    ShiftAssignment.query.filter_by(employee_id=employee.id).delete()
     db.session.delete(employee)
     db.session.commit()
+    roster_cache.invalidate(manager_id)
     
     return jsonify({'status': 'success', 'message': 'Employee deleted successfully'})
 
-@app.route('/api/my_profile', methods=['GET'])
+@route('/api/my_profile', methods=['GET'])
 def get_my_profile():
     if 'user_id' not in session or session.get('role') != 'employee':
         return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
@@ -327,25 +884,26 @@ def get_my_profile():
             'max_hours': employee.max_hours,
             'wage': employee.wage,
             'can_be_responsible': employee.can_be_responsible,
-            'availability': json.loads(employee.availability) if employee.availability else {}
+            **availability_fields(employee)
         }
     })
 
-@app.route('/save_schedule', methods=['POST'])
+@route('/save_schedule', methods=['POST'])
 def save_schedule():
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'You must be logged in to save schedules'}), 401
 
     data = request.json
     schedule_name = data.get('name', 'Untitled Schedule')
-    schedule_data = json.dumps(data.get('schedule_data', {}))
 
     new_schedule = SavedSchedule(
         user_id=session['user_id'],
-        name=schedule_name,
-        data=schedule_data
+        name=schedule_name
     )
+    new_schedule.set_schedule_data(data.get('schedule_data', {}))
     db.session.add(new_schedule)
+    db.session.flush()
+    add_assignments(new_schedule, data.get('schedule_data', {}))
     db.session.commit()
 
     return jsonify({
@@ -354,12 +912,31 @@ def save_schedule():
         'schedule_id': new_schedule.id
     })
 
-@app.route('/get_schedules', methods=['GET'])
+@route('/get_schedules', methods=['GET'])
 def get_schedules():
+    # Newest first, ?limit= (default 50) at a time; pass the returned next_cursor
+    # as ?cursor= for the following page
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'You must be logged in'}), 401
 
-    user_schedules = SavedSchedule.query.filter_by(user_id=session['user_id']).order_by(SavedSchedule.updated_at.desc()).all()
+    limit = request.args.get('limit', 50, type=int)
+    if not 1 <= limit <= 500:
+        return jsonify({'status': 'error', 'message': 'limit must be between 1 and 500'}), 400
+    query = SavedSchedule.query.filter_by(user_id=session['user_id'])
+    if request.args.get('cursor'):
+        try:
+            updated_at, schedule_id = request.args['cursor'].rsplit(',', 1)
+            query = query.filter(tuple_(SavedSchedule.updated_at, SavedSchedule.id)
+                                 < (datetime.fromisoformat(updated_at), int(schedule_id)))
+        except ValueError:
+            return jsonify({'status': 'error', 'message': 'Invalid cursor'}), 400
+    # One extra row tells whether there is a next page
+    user_schedules = query.order_by(SavedSchedule.updated_at.desc(), SavedSchedule.id.desc()).limit(limit + 1).all()
+    next_cursor = None
+    if len(user_schedules) > limit:
+        user_schedules = user_schedules[:limit]
+        last = user_schedules[-1]
+        next_cursor = f'{last.updated_at.isoformat()},{last.id}'
     schedules_list = []
     for schedule in user_schedules:
         schedules_list.append({
@@ -369,14 +946,15 @@ def get_schedules():
             'updated_at': schedule.updated_at.strftime('%Y-%m-%d %H:%M')
         })
 
-    return jsonify({'status': 'success', 'schedules': schedules_list})
+    return jsonify({'status': 'success', 'schedules': schedules_list, 'next_cursor': next_cursor})
 
-@app.route('/load_schedule/<int:schedule_id>', methods=['GET'])
+@route('/load_schedule/<int:schedule_id>', methods=['GET'])
 def load_schedule(schedule_id):
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'You must be logged in'}), 401
 
-    schedule = SavedSchedule.query.filter_by(id=schedule_id, user_id=session['user_id']).first()
+    schedule = SavedSchedule.query.options(undefer_group('payload')).filter_by(
+        id=schedule_id, user_id=session['user_id']).first()
     if not schedule:
         return jsonify({'status': 'error', 'message': 'Schedule not found'}), 404
 
@@ -385,13 +963,13 @@ def load_schedule(schedule_id):
         'schedule': {
             'id': schedule.id,
             'name': schedule.name,
-            'data': json.loads(schedule.data),
+            'data': schedule.schedule_data(),
             'created_at': schedule.created_at.strftime('%Y-%m-%d %H:%M'),
             'updated_at': schedule.updated_at.strftime('%Y-%m-%d %H:%M')
         }
     })
 
-@app.route('/delete_schedule/<int:schedule_id>', methods=['DELETE'])
+@route('/delete_schedule/<int:schedule_id>', methods=['DELETE'])
 def delete_schedule(schedule_id):
     if 'user_id' not in session:
         return jsonify({'status': 'error', 'message': 'You must be logged in'}), 401
@@ -400,156 +978,287 @@ def delete_schedule(schedule_id):
     if not schedule:
         return jsonify({'status': 'error', 'message': 'Schedule not found'}), 404
 
+    ShiftAssignment.query.filter_by(schedule_id=schedule.id).delete()
     db.session.delete(schedule)
     db.session.commit()
 
     return jsonify({'status': 'success', 'message': 'Schedule deleted successfully'})
 
-@app.route('/solve_schedule', methods=['POST'])
+@route('/api/my_shifts', methods=['GET'])
+def get_my_shifts():
+    # Shifts of the logged-in employee in the newest ?schedules= (default 1) saved
+    # schedules of their manager that assign them
+    if 'user_id' not in session or session.get('role') != 'employee':
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+
+    employee = Employee.query.filter_by(user_id=session['user_id']).first()
+    if not employee:
+        return jsonify({'status': 'error', 'message': 'Employee profile not found'}), 404
+    limit = request.args.get('schedules', 1, type=int)
+    if not 1 <= limit <= 50:
+        return jsonify({'status': 'error', 'message': 'schedules must be between 1 and 50'}), 400
+
+    schedules = (db.session.query(SavedSchedule.id, SavedSchedule.name, SavedSchedule.updated_at)
+                 .join(ShiftAssignment, ShiftAssignment.schedule_id == SavedSchedule.id)
+                 .filter(ShiftAssignment.employee_id == employee.id, SavedSchedule.user_id == employee.manager_id)
+                 .distinct().order_by(SavedSchedule.updated_at.desc(), SavedSchedule.id.desc()).limit(limit).all())
+    shifts = {schedule_id: [] for schedule_id, _, _ in schedules}
+    for schedule_id, day, shift in (db.session.query(ShiftAssignment.schedule_id, ShiftAssignment.day, ShiftAssignment.shift)
+                                    .filter(ShiftAssignment.employee_id == employee.id,
+                                            ShiftAssignment.schedule_id.in_(list(shifts)))
+                                    .order_by(ShiftAssignment.id)):
+        shifts[schedule_id].append({'day': day, 'shift': shift})
+
+    return jsonify({'status': 'success', 'schedules': [
+        {'id': schedule_id, 'name': name, 'updated_at': updated_at.strftime('%Y-%m-%d %H:%M'), 'shifts': shifts[schedule_id]}
+        for schedule_id, name, updated_at in schedules
+    ]})
+
+@route('/api/schedules/<int:schedule_id>/assignments', methods=['GET'])
+def get_schedule_assignments(schedule_id):
+    # Who works in a saved schedule, optionally only on ?day= and/or ?shift=
+    if 'user_id' not in session or session.get('role') != 'manager':
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+
+    if not db.session.query(SavedSchedule.id).filter_by(id=schedule_id, user_id=session['user_id']).first():
+        return jsonify({'status': 'error', 'message': 'Schedule not found'}), 404
+
+    query = (db.session.query(ShiftAssignment.day, ShiftAssignment.shift, Employee.id, Employee.name)
+             .join(Employee, Employee.id == ShiftAssignment.employee_id)
+             .filter(ShiftAssignment.schedule_id == schedule_id))
+    for field in ('day', 'shift'):
+        if request.args.get(field):
+            query = query.filter(getattr(ShiftAssignment, field) == request.args[field])
+
+    return jsonify({'status': 'success', 'assignments': [
+        {'day': day, 'shift': shift, 'employee_id': emp_id, 'name': name}
+        for day, shift, emp_id, name in query.order_by(ShiftAssignment.id)
+    ]})
+
+def finished_job_result(job):
+    # Response body and HTTP code for a job that is no longer queued or running
+    if job['state'] == 'failed':
+        return {'status': 'error', 'message': job['error']}, 500
+    return job['result'] or {'status': 'cancelled', 'message': 'The solve was cancelled.'}, 200
+
+def request_problem(data):
+    # A payload with 'employee_ids' (a list, or 'all') instead of 'employees' is
+    # solved for the logged-in manager's stored employees
+    if 'employees' not in data and 'employee_ids' in data:
+        if 'user_id' not in session or session.get('role') != 'manager':
+            raise PermissionError('Unauthorized')
+        return roster_cache.get(session['user_id']).problem(data, data['employee_ids'])
+    return parse_problem(data)
+
+def solve_request(data, parse=request_problem):
+    # The problem of a solve payload, as parse() makes it, and the SolveJobs.submit()
+    # options the payload asks for; returns (problem, options, None) or
+    # (None, None, error response)
+    try:
+        problem = parse(data)
+        options = {
+            'time_limit': data.get('time_limit'),
+            'owner': session.get('user_id'),
+            'mip_gap': data.get('mip_gap'),
+            'engine': data.get('engine') or current_app.config['SOLVE_ENGINE'],
+            'aggregate': data.get('aggregate', current_app.config['SOLVE_AGGREGATE']),
+            'alternatives': int(data.get('alternatives') or 1),
+            'min_changes': int(data.get('min_changes') or 0),
+            'explain': bool(data.get('explain_infeasibility')),
+        }
+    except PermissionError:
+        return None, None, (jsonify({'status': 'error', 'message': 'Unauthorized'}), 401)
+    except (UnknownEmployees, HorizonError) as e:
+        return None, None, (jsonify({'status': 'error', 'message': str(e)}), 400)
+    except (KeyError, TypeError, ValueError, AttributeError):
+        return None, None, (jsonify({'status': 'error', 'message': 'Invalid solve request'}), 400)
+    if options['engine'] not in ENGINES:
+        return None, None, (jsonify({'status': 'error', 'message': f"Unknown solver engine: {options['engine']}"}), 400)
+    return problem, options, None
+
+@route('/solve_schedule', methods=['POST'])
 def solve_schedule():
+    # Synchronous variant kept for API clients: runs on the solve pool and waits for the result
+    problem, options, error = solve_request(request.json)
+    if error:
+        return error
+
+    try:
+        job = solve_jobs.run(problem, **options)
+    except JobQueueFull as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
+
+    result, code = finished_job_result(job)
+    return jsonify(result), code
+
+# Background solve jobs
+@route('/api/solve_jobs', methods=['POST'])
+def submit_solve_job():
+    problem, options, error = solve_request(request.json)
+    if error:
+        return error
+
+    try:
+        job_id = solve_jobs.submit(problem, **options)
+    except JobQueueFull as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
+
+    return jsonify({'status': 'success', 'job_id': job_id}), 202
+
+@route('/api/solve_jobs/resolve', methods=['POST'])
+def submit_resolve_job():
+    # Re-solve after a small change: 'previous' holds the earlier solve input and
+    # its schedule ({'input': ..., 'schedule': ...}, the same layout is expected in
+    # a saved schedule referenced by 'previous_schedule_id') and 'delta' the change.
     data = request.json
+    previous = data.get('previous') or {}
+    if data.get('previous_schedule_id') is not None:
+        if 'user_id' not in session:
+            return jsonify({'status': 'error', 'message': 'You must be logged in'}), 401
+        saved = SavedSchedule.query.options(undefer_group('payload')).filter_by(
+            id=data['previous_schedule_id'], user_id=session['user_id']).first()
+        if not saved:
+            return jsonify({'status': 'error', 'message': 'Schedule not found'}), 404
+        previous = saved.schedule_data()
+
+    if not previous.get('input') or not previous.get('schedule'):
+        return jsonify({'status': 'error', 'message': 'A previous solve input and schedule are required'}), 400
+
+    delta = data.get('delta') or {}
+    if 'employees' not in previous['input'] and ('employees' in delta or 'remove_employees' in delta):
+        return jsonify({'status': 'error', 'message': 'The delta may only change staffing when solving for employee_ids'}), 400
+    # The problems come from the previous input, the solve options from this request
+    problems, options, error = solve_request(data, parse=lambda _: (
+        request_problem(previous['input']), request_problem(apply_delta(previous['input'], delta))))
+    if error:
+        return error
+    base, problem = problems
+
+    changed_days = affected_days(base, problem)
+    fixed_days = [d for d in problem.days if d not in changed_days] if data.get('fix_unaffected_days') else []
 
-    # --- Extract data from frontend ---
-    days = data['days']
-    shifts_data = data['shifts'] # List of {name: 'Morning', hours: 4}
-    num_shifts = len(shifts_data)
-
-    shift_names = [s['name'] for s in shifts_data]
-    shift_hours = {s['name']: s['hours'] for s in shifts_data}
-
-    min_employees_per_shift_input = data['min_employees_per_shift']
-    max_employees_per_shift_input = data['max_employees_per_shift']
-    responsible_required_overall = data['responsible_required_overall'] # True/False
-    full_time_hours_per_week = data['full_time_hours_per_week'] if data['full_time_hours_per_week'] else None
-
-    employees_data = data['employees'] # List of employee objects
-
-    # Process employee data
-    employees = [emp['name'] for emp in employees_data]
-    availability = {}
-    min_hours = {}
-    max_hours = {}
-    wage = {}
-    is_responsible = {}
-
-    for emp in employees_data:
-        e_name = emp['name']
-        min_hours[e_name] = emp['min_hours']
-        max_hours[e_name] = emp['max_hours']
-        wage[e_name] = emp['wage']
-        is_responsible[e_name] = 1 if emp['can_be_responsible'] else 0
-
-        for d in days:
-            for s_name in shift_names:
-                # Assuming frontend sends availability as 'Employee1_Mon_Morning': True/False
-                key = f"{e_name}_{d}_{s_name}"
-                availability[(e_name, d, s_name)] = 1 if emp['availability'].get(key, False) else 0
-
-    # Process min/max employees per shift
-    min_employees = {}
-    max_employees = {} # New variable
-    for d in days:
-        for s_name in shift_names:
-            min_employees[(d, s_name)] = min_employees_per_shift_input.get(f'{d}_{s_name}', 0)
-            max_employees[(d, s_name)] = max_employees_per_shift_input.get(f'{d}_{s_name}', 0)
-
-
-    # === Gurobi Model ===
-    model = gp.Model("ShiftScheduling")
-    model.setParam('OutputFlag', 0) # Suppress Gurobi output in console
-
-    # Decision variables
-    x = model.addVars(employees, days, shift_names, vtype=GRB.BINARY, name="x")
-
-    # Objective: minimize cost
-    # If full_time_hours_per_week is set, wage is only considered for non-full-time hours,
-    # or if we assume full-time workers have 0 wage cost in the model
-    model.setObjective(
-        gp.quicksum(wage[e] * shift_hours[s] * x[e, d, s]
-                    for e in employees for d in days for s in shift_names),
-        GRB.MINIMIZE
-    )
+    try:
+        job_id = solve_jobs.submit(problem, previous=previous['schedule'], fixed_days=fixed_days, **options)
+    except JobQueueFull as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
+
+    return jsonify({'status': 'success', 'job_id': job_id, 'affected_days': changed_days}), 202
+
+# Options of solve_request() that SolveJobs.submit_horizon() takes
+HORIZON_OPTIONS = ('time_limit', 'owner', 'mip_gap', 'engine', 'aggregate')
+
+@route('/api/solve_jobs/horizon', methods=['POST'])
+def submit_horizon_job():
+    # Multi-week plan: a one-week solve payload plus 'weeks' and optional
+    # per-week 'week_overrides' (see horizon.py)
+    weeks, options, error = solve_request(request.json, parse=lambda data: parse_horizon(
+        data, current_app.config['SOLVE_MAX_WEEKS'], parse=request_problem))
+    if error:
+        return error
 
-    # 1. Availability
-    for e in employees:
-        for d in days:
-            for s_name in shift_names:
-                if availability[e, d, s_name] == 0:
-                    model.addConstr(x[e, d, s_name] == 0, name=f"availability_{e}_{d}_{s_name}")
-
-    # Constraint 2: Max 2 shifts per day (REMOVED as per request)
-
-    # 3. Min and Max weekly hours
-    for e in employees:
-        total_hours = gp.quicksum(x[e, d, s_name] * shift_hours[s_name] for d in days for s_name in shift_names)
-
-        # Only add min/max hours constraint if they are not 'unlimited' (represented by None or 0)
-        if min_hours[e] is not None and min_hours[e] > 0:
-            model.addConstr(total_hours >= min_hours[e], name=f"min_hours_{e}")
-        if max_hours[e] is not None and max_hours[e] > 0:
-            model.addConstr(total_hours <= max_hours[e], name=f"max_hours_{e}")
-
-    # 4. Minimum number of employees per shift (if relevant)
-    if any(min_employees[(d, s)] > 0 for d in days for s in shift_names): # Check if any min_employees is > 0
-        for d in days:
-            for s_name in shift_names:
-                if min_employees[(d, s_name)] > 0:
-                    model.addConstr(gp.quicksum(x[e, d, s_name] for e in employees) >= min_employees[(d, s_name)],
-                                    name=f"min_emp_shift_{d}_{s_name}")
-
-    # 6. Maximum number of employees per shift (NEW CONSTRAINT)
-    if any(max_employees[(d, s)] > 0 for d in days for s in shift_names): # Check if any max_employees is > 0
-        for d in days:
-            for s_name in shift_names:
-                if max_employees[(d, s_name)] > 0:
-                    model.addConstr(gp.quicksum(x[e, d, s_name] for e in employees) <= max_employees[(d, s_name)],
-                                    name=f"max_emp_shift_{d}_{s_name}")
-
-    # 5. Responsible person assigned per shift (if required)
-    if responsible_required_overall:
-        for d in days:
-            for s_name in shift_names:
-                # Only require a responsible person if there are employees scheduled for that shift
-                # This formulation ensures at least one responsible if anyone is working.
-                # A stronger constraint would be to just require it if responsible_required_overall is true,
-                # which is what the user asked for.
-                model.addConstr(
-                    gp.quicksum(is_responsible[e] * x[e, d, s_name] for e in employees) >= 1, # Must be >= 1 if required
-                    name=f"responsible_req_{d}_{s_name}"
-                )
-
-
-    # Simulate a delay for processing to show user the "solving" message
-    time.sleep(1)
-
-    # === Solve ===
     try:
-        model.optimize()
-    except gp.GurobiError as e:
-        return jsonify({'status': 'error', 'message': f'Gurobi Error: {e.Message}'}), 500
-
-
-    # === Output ===
-    if model.Status == GRB.OPTIMAL:
-        schedule = {}
-        for d in days:
-            schedule[d] = {}
-            for s_name in shift_names:
-                assigned_employees = []
-                for e in employees:
-                    if x[e, d, s_name].x > 0.5:
-                        assigned_employees.append(e)
-                schedule[d][s_name] = assigned_employees
-
-        total_cost = model.ObjVal
-        return jsonify({'status': 'optimal', 'schedule': schedule, 'total_cost': total_cost})
-    elif model.Status == GRB.INFEASIBLE:
-        return jsonify({'status': 'infeasible', 'message': "No feasible solution found. The current availability of employees is not enough to generate a schedule that satisfies all conditions. Please adjust your inputs (e.g., increase availability, reduce minimum requirements, or add more employees)."}), 200
-    elif model.Status == GRB.UNBOUNDED:
-        return jsonify({'status': 'unbounded', 'message': "The model is unbounded, which means the objective can be infinitely improved. This usually indicates a problem in the model formulation."}), 200
-    else:
-        return jsonify({'status': 'error', 'message': f"Optimization stopped with status {model.Status}."}), 200
+        # Windows are single solves: no alternatives or infeasibility explanations
+        job_id = solve_jobs.submit_horizon(weeks, **{key: options[key] for key in HORIZON_OPTIONS})
+    except JobQueueFull as e:
+        return jsonify({'status': 'error', 'message': str(e)}), 503
+
+    return jsonify({'status': 'success', 'job_id': job_id, 'weeks': len(weeks)}), 202
+
+@route('/api/solve_jobs/<job_id>', methods=['GET'])
+def get_solve_job(job_id):
+    job = solve_jobs.status(job_id, owner=session.get('user_id'))
+    if not job:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+
+    # Schedules are served by the result and events endpoints
+    job.pop('result')
+    if job['progress']:
+        job['progress'].pop('solution', None)
+    return jsonify({'status': 'success', 'job': job})
+
+@route('/api/solve_jobs/<job_id>/events', methods=['GET'])
+def stream_solve_job(job_id):
+    # Server-Sent Events: 'progress' while the solver runs, 'incumbent' for every
+    # improving schedule and a final 'result' once the job is finished
+    owner = session.get('user_id')
+    if not solve_jobs.status(job_id, owner=owner):
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+
+    def event(name, payload):
+        return f"event: {name}\ndata: {json.dumps(payload)}\n\n"
+
+    def events():
+        last_progress = None
+        last_solution = 0
+        while True:
+            job = solve_jobs.status(job_id, owner=owner)
+            if job is None:
+                return
+            if job['state'] not in ('queued', 'running'):
+                yield event('result', {
+                    'state': job['state'],
+                    'result': finished_job_result(job)[0],
+                })
+                return
+
+            progress = job['progress'] or {}
+            solution = progress.pop('solution', None)
+            if solution and progress['solution_count'] != last_solution:
+                last_solution = progress['solution_count']
+                yield event('incumbent', solution)
+            progress['state'] = job['state']
+            if progress != last_progress:
+                last_progress = progress
+                yield event('progress', progress)
+            time.sleep(current_app.config['SOLVE_EVENTS_INTERVAL'])
+
+    return Response(stream_with_context(events()), mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+@route('/api/solve_jobs/<job_id>/result', methods=['GET'])
+def get_solve_job_result(job_id):
+    job = solve_jobs.status(job_id, owner=session.get('user_id'))
+    if not job:
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+
+    if job['state'] in ('queued', 'running'):
+        return jsonify({'status': 'pending', 'state': job['state'], 'progress': job['progress']}), 202
+    result, code = finished_job_result(job)
+    return jsonify(result), code
+
+@route('/api/solve_jobs/<job_id>', methods=['DELETE'])
+def cancel_solve_job(job_id):
+    if not solve_jobs.cancel(job_id, owner=session.get('user_id')):
+        return jsonify({'status': 'error', 'message': 'Job not found'}), 404
+
+    return jsonify({'status': 'success', 'message': 'Cancellation requested'})
+
+@route('/api/solve_cache/stats', methods=['GET'])
+def get_solve_cache_stats():
+    if 'user_id' not in session or session.get('role') != 'manager':
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+
+    return jsonify({'status': 'success', 'stats': solve_cache.stats()})
+
+@route('/api/solve_pool/stats', methods=['GET'])
+def get_solve_pool_stats():
+    if 'user_id' not in session or session.get('role') != 'manager':
+        return jsonify({'status': 'error', 'message': 'Unauthorized'}), 401
+
+    return jsonify({'status': 'success', 'stats': solve_jobs.utilization()})
+
+@route('/metrics', methods=['GET'])
+def get_metrics():
+    # Prometheus text format, for scraping
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
 
 if __name__ == '__main__':
+    app = create_app()
+    # The development server sets up its database itself
+    init_db(app)
+    # Start the solve workers and their Gurobi environments before the first
+    # request; with the reloader, only in the process that serves requests
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        app.extensions['solve_jobs'].start()
     app.run(debug=True) # debug=True allows automatic reloading on code changes
 
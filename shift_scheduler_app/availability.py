@@ -0,0 +1,104 @@
+"""
+Compact employee availability.
+
+Availability is stored as a packed bitmask over a day x shift grid: the days
+are always DAYS, the shift names are stored next to the bits, and bit
+d * len(shifts) + s (most significant bit first, as np.packbits) says whether
+the employee can work shift s on day d. Unlike the legacy
+{"{name}_{day}_{shift}": true} dict the mask doesn't depend on the employee's
+name, and it decodes with NumPy instead of per-key string handling.
+
+Over the API a mask is {'days': [...], 'shifts': [...], 'bits': <base64>}.
+"""
+import base64
+import re
+
+import numpy as np
+
+DAYS = ['Mon', 'Tue', 'Wed', 'Thu', 'Fri', 'Sat', 'Sun']
+DEFAULT_SHIFTS = ['Morning', 'Afternoon', 'Evening']
+
+_LEGACY_KEY = re.compile(r'^(.*?)_(' + '|'.join(DAYS) + r')_(.+)$')
+
+
+def pack(grid):
+    """(len(DAYS), S) bool grid -> bytes."""
+    return np.packbits(np.asarray(grid, dtype=bool).ravel()).tobytes()
+
+
+def unpack(bits, n_shifts):
+    """bytes -> (len(DAYS), n_shifts) bool grid."""
+    count = len(DAYS) * n_shifts
+    flat = np.unpackbits(np.frombuffer(bits or b'', dtype=np.uint8), count=count)
+    return flat.astype(bool).reshape(len(DAYS), n_shifts)
+
+
+def from_keys(name, mapping):
+    """Convert a legacy availability dict into (shifts, grid).
+
+    Keys are expected as '{name}_{day}_{shift}'; keys written under an older
+    name of the employee are recognized by their day part.
+    """
+    entries = []
+    prefix = f'{name}_'
+    for key, value in (mapping or {}).items():
+        if key.startswith(prefix) and '_' in key[len(prefix):]:
+            day, shift = key[len(prefix):].split('_', 1)
+        else:
+            match = _LEGACY_KEY.match(key)
+            if not match:
+                continue
+            day, shift = match.group(2), match.group(3)
+        if day in DAYS:
+            entries.append((day, shift, bool(value)))
+
+    seen = [shift for _, shift, _ in entries]
+    shifts = [s for s in DEFAULT_SHIFTS if s in seen]
+    shifts += [s for s in dict.fromkeys(seen) if s not in shifts]
+    grid = np.zeros((len(DAYS), len(shifts)), dtype=bool)
+    for day, shift, value in entries:
+        grid[DAYS.index(day), shifts.index(shift)] = value
+    return shifts, grid
+
+
+def to_keys(name, shifts, grid):
+    """Legacy {'{name}_{day}_{shift}': True} dict of the available slots."""
+    return {f'{name}_{DAYS[d]}_{shifts[s]}': True for d, s in zip(*np.nonzero(grid))}
+
+
+def encode_mask(shifts, bits):
+    return {'days': DAYS, 'shifts': list(shifts), 'bits': base64.b64encode(bits or b'').decode('ascii')}
+
+
+def decode_mask(mask):
+    """API mask -> (shifts, bits); raises ValueError when the bits don't fit the grid."""
+    shifts = list(mask['shifts'])
+    if list(mask.get('days', DAYS)) != DAYS:
+        raise ValueError(f'Availability masks must use the days {DAYS}')
+    bits = base64.b64decode(mask['bits'], validate=True)
+    if len(bits) != (len(DAYS) * len(shifts) + 7) // 8:
+        raise ValueError('Availability mask has the wrong length')
+    return shifts, bits
+
+
+class GridMapper:
+    """Maps availability masks onto the (days, shifts) grid of a solve request.
+
+    Index lookups are cached per mask shift list, so a team sharing the same
+    shifts is decoded with one fancy-indexing step per employee.
+    """
+
+    def __init__(self, days, shift_names):
+        self.day_idx = [DAYS.index(d) if d in DAYS else len(DAYS) for d in days]
+        self.shift_names = shift_names
+        self._shift_idx = {}
+
+    def grid(self, mask):
+        shifts, bits = decode_mask(mask)
+        key = tuple(shifts)
+        if key not in self._shift_idx:
+            self._shift_idx[key] = [shifts.index(s) if s in shifts else len(shifts) for s in self.shift_names]
+        # Pad with a False row/column for days and shifts the mask doesn't know
+        padded = np.zeros((len(DAYS) + 1, len(shifts) + 1), dtype=bool)
+        padded[:len(DAYS), :len(shifts)] = unpack(bits, len(shifts))
+        return padded[np.ix_(self.day_idx, self._shift_idx[key])]
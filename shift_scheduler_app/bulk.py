@@ -0,0 +1,134 @@
+"""
+Row formats of the bulk employee import and export (CSV and JSON Lines).
+
+Both formats carry the same fields as the employee API. In CSV, booleans are
+true/false (also 1/0, yes/no) and availability is the packed mask of the API
+as a JSON string ({"days": ..., "shifts": ..., "bits": ...}); in JSON Lines
+it is the mask object or the legacy availability dict. Hours are whole
+numbers; a row with e.g. 12.5 is reported instead of imported. Import rows
+with both a username and a password also create an employee account.
+Exports never contain passwords, so re-imported rows come without accounts.
+"""
+import csv
+import io
+import json
+
+EXPORT_FIELDS = ('id', 'name', 'is_full_time', 'min_hours', 'max_hours', 'wage', 'can_be_responsible',
+                 'username', 'availability')
+
+FORMATS = {'csv': 'text/csv', 'jsonl': 'application/x-ndjson'}
+
+_TRUE = {'1', 'true', 'yes', 'y'}
+_FALSE = {'', '0', 'false', 'no', 'n'}
+
+
+def read_rows(stream, fmt):
+    """Yield (line number, dict) from a binary stream, one row at a time."""
+    text = io.TextIOWrapper(stream, encoding='utf-8-sig', newline='' if fmt == 'csv' else None)
+    if fmt == 'csv':
+        reader = csv.DictReader(text)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for line_no, line in enumerate(text, start=1):
+        if line.strip():
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = None
+            yield line_no, row if isinstance(row, dict) else None
+
+
+def _bool(value):
+    if isinstance(value, bool) or value is None:
+        return bool(value)
+    text = str(value).strip().lower()
+    if text in _TRUE:
+        return True
+    if text in _FALSE:
+        return False
+    raise ValueError(f'not a boolean: {value!r}')
+
+
+def _whole(value):
+    # Hours are stored as integers: 12.5 is refused rather than cut to 12
+    try:
+        number = float(value) if isinstance(value, str) else value
+    except ValueError:
+        number = None
+    if isinstance(number, bool) or not isinstance(number, (int, float)) or not float(number).is_integer():
+        raise ValueError(f'not a whole number: {value!r}')
+    return int(number)
+
+
+def _number(value, default, kind):
+    if value is None or (isinstance(value, str) and not value.strip()):
+        return default
+    return kind(value)
+
+
+def employee_fields(row):
+    """Validate an import row; returns (fields, None) or (None, error message).
+
+    fields has the Employee columns, 'availability' or 'availability_mask' in
+    the shape apply_availability() takes, and 'username' / 'password' when an
+    account is to be created.
+    """
+    if row is None:
+        return None, 'not a JSON object'
+    name = (row.get('name') or '').strip()
+    if not name:
+        return None, 'name is required'
+    try:
+        fields = {
+            'name': name,
+            'is_full_time': _bool(row.get('is_full_time')),
+            'min_hours': _number(row.get('min_hours'), 0, _whole),
+            'max_hours': _number(row.get('max_hours'), 40, _whole),
+            'wage': _number(row.get('wage'), 0.0, float),
+            'can_be_responsible': _bool(row.get('can_be_responsible')),
+        }
+        availability = row.get('availability_mask', row.get('availability'))
+        if isinstance(availability, str):
+            availability = json.loads(availability) if availability.strip() else None
+    except ValueError as e:
+        return None, f'invalid value ({e})'
+    if fields['min_hours'] < 0 or fields['max_hours'] < 0 or fields['wage'] < 0:
+        return None, 'hours and wage must not be negative'
+    if isinstance(availability, dict) and 'bits' in availability:
+        fields['availability_mask'] = availability
+    else:
+        fields['availability'] = availability or {}
+
+    username = (row.get('username') or '').strip()
+    password = row.get('password') or ''
+    if password:
+        if not username:
+            return None, 'a password needs a username'
+        fields.update(username=username, password=password)
+    return fields, None
+
+
+def export_row(employee, username, fmt):
+    """One line of an export (CSV header excluded) for an Employee and its account's username."""
+    values = {
+        'id': employee.id,
+        'name': employee.name,
+        'is_full_time': bool(employee.is_full_time),
+        'min_hours': employee.min_hours,
+        'max_hours': employee.max_hours,
+        'wage': employee.wage,
+        'can_be_responsible': bool(employee.can_be_responsible),
+        'username': username,
+        'availability': employee.availability_mask(),
+    }
+    if fmt == 'jsonl':
+        return json.dumps(values) + '\n'
+    values['availability'] = json.dumps(values['availability'])
+    return csv_line([values[f] for f in EXPORT_FIELDS])
+
+
+def csv_line(values):
+    buffer = io.StringIO()
+    csv.writer(buffer).writerow(['' if v is None else str(v).lower() if isinstance(v, bool) else v for v in values])
+    return buffer.getvalue()
@@ -0,0 +1,134 @@
+"""
+Content-addressed cache of solve results.
+
+Results are keyed by a hash of the normalized solve input, so pressing "solve"
+again on unchanged inputs is answered without building a model. A bounded
+in-memory LRU sits in front of an optional persistent store (the
+SolveCacheEntry table, wired up in app.py).
+"""
+import hashlib
+import json
+import threading
+from collections import OrderedDict
+
+import numpy as np
+
+# Bump whenever the model formulation changes so stale results are not reused
+MODEL_VERSION = 2
+
+# Only final outcomes are cached; time limits and cancellations are not
+CACHEABLE_STATUSES = ('optimal', 'infeasible')
+
+
+def problem_key(problem, mip_gap=None, alternatives=1, min_changes=0, explain=False):
+    """Canonical sha256 of a Problem (and how it is solved), independent of employee order."""
+    employees = sorted(
+        [
+            name,
+            np.packbits(problem.available[e]).tobytes().hex(),
+            float(problem.wage[e]),
+            float(problem.min_hours[e]),
+            float(problem.max_hours[e]),
+            bool(problem.responsible[e]),
+        ]
+        for e, name in enumerate(problem.employees)
+    )
+    canonical = {
+        'version': MODEL_VERSION,
+        'days': problem.days,
+        'shifts': [[name, float(hours)] for name, hours in zip(problem.shift_names, problem.shift_hours)],
+        'min_staff': problem.min_staff.tolist(),
+        'max_staff': problem.max_staff.tolist(),
+        'responsible_required': problem.responsible_required,
+        'forbid_close_open': problem.forbid_close_open,
+        'week': problem.week.tolist(),
+        'employees': employees,
+    }
+    if mip_gap is not None:
+        canonical['mip_gap'] = float(mip_gap)
+    if alternatives > 1:
+        canonical['alternatives'] = [alternatives, min_changes]
+    # Infeasible results only carry the IIS when it was asked for
+    if explain:
+        canonical['explain'] = True
+    payload = json.dumps(canonical, separators=(',', ':'), sort_keys=True)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def reorder_schedule(result, employees):
+    """Sort each shift list of a cached result by the employee order of the current request."""
+    if 'schedule' not in result:
+        return result
+    position = {name: i for i, name in enumerate(employees)}
+
+    def reorder(schedule):
+        return {
+            day: {shift: sorted(names, key=lambda n: position.get(n, len(position))) for shift, names in shifts.items()}
+            for day, shifts in schedule.items()
+        }
+
+    result = dict(result, schedule=reorder(result['schedule']))
+    if 'alternatives' in result:
+        result['alternatives'] = [dict(alt, schedule=reorder(alt['schedule'])) for alt in result['alternatives']]
+    return result
+
+
+class SolveCache:
+    def __init__(self, maxsize=256, load=None, store=None):
+        # load(key) -> result or None and store(key, result) form the persistent tier
+        self.maxsize = maxsize
+        self._load = load
+        self._store = store
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.persistent_hits = 0
+
+    def get(self, key):
+        with self._lock:
+            result = self._entries.get(key)
+            if result is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return result
+
+        result = self._load(key) if self._load is not None else None
+        with self._lock:
+            if result is None:
+                self.misses += 1
+                return None
+            self.hits += 1
+            self.persistent_hits += 1
+            self._remember(key, result)
+        return result
+
+    def put(self, key, result):
+        if result.get('status') not in CACHEABLE_STATUSES:
+            return
+        with self._lock:
+            self._remember(key, result)
+        if self._store is not None:
+            self._store(key, result)
+
+    def _remember(self, key, result):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'persistent_hits': self.persistent_hits,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+                'size': len(self._entries),
+                'maxsize': self.maxsize,
+            }
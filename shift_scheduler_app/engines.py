@@ -0,0 +1,103 @@
+"""
+Solver engines.
+
+An engine turns a Problem into a result dict of the shape solver.solve()
+returns. 'gurobi' is solver.solve() itself. 'greedy' is the construction
+heuristic with local search of heuristic.py: it needs no license, answers in
+well under a second for large rosters and reports its gap to a simple lower
+bound. 'auto' runs Gurobi and falls back to the greedy engine when Gurobi
+can't run, e.g. without a license or for a model too large for the license.
+
+solve(engine, problem, **options) dispatches. Engines take the keyword
+arguments of solver.solve() and ignore the ones they have no use for.
+
+Gurobi is imported by the engines that use it, on their first solve, so the
+web process can check engine names without loading it, and hosts without
+gurobipy still have the greedy engine ('auto' falls back to it as well).
+"""
+import time
+
+import numpy as np
+
+import heuristic
+from feasibility import find_issues, infeasible_result
+from problem import extract_schedule
+
+NOT_FOUND_MESSAGE = "The greedy engine found no schedule that meets every rule. The problem may still be feasible; try the gurobi engine."
+NO_GUROBI_MESSAGE = "Gurobi is not installed on this server; use the greedy engine."
+
+
+def load_solver():
+    """The solver module, or None when gurobipy isn't installed."""
+    try:
+        import solver
+    except ModuleNotFoundError as e:
+        if e.name != 'gurobipy':
+            raise
+        return None
+    return solver
+
+
+def greedy(problem, time_limit=None, should_stop=None, on_incumbent=None, precheck=True, **ignored):
+    """Solve with the greedy construction and local search of heuristic.py."""
+    stats = {'engine': 'greedy', 'employees': len(problem.employees)}
+    if precheck:
+        started = time.perf_counter()
+        issues = find_issues(problem)
+        stats['precheck_seconds'] = time.perf_counter() - started
+        if issues:
+            return dict(infeasible_result(issues), solve_stats=stats)
+
+    started = time.perf_counter()
+    assigned = heuristic.construct(problem)
+    stats['construct_seconds'] = time.perf_counter() - started
+    if assigned is None:
+        return {'status': 'not_found', 'message': NOT_FOUND_MESSAGE, 'engine': 'greedy', 'solve_stats': stats}
+
+    started = time.perf_counter()
+    assigned = heuristic.improve(problem, assigned, time_limit, should_stop)
+    stats['improve_seconds'] = time.perf_counter() - started
+
+    slots = np.flatnonzero(assigned.ravel())
+    cost = heuristic.total_cost(problem, assigned)
+    bound = heuristic.lower_bound(problem)
+    result = {
+        'status': 'feasible',
+        'engine': 'greedy',
+        'schedule': extract_schedule(problem, slots, np.ones(len(slots))),
+        'total_cost': cost,
+        'bound': bound,
+        # Only a positive bound says anything about the gap
+        'mip_gap': (cost - bound) / max(cost, 1e-10) if bound > 0 else None,
+        'solve_stats': stats,
+    }
+    if on_incumbent is not None:
+        on_incumbent({key: result[key] for key in ('schedule', 'total_cost', 'mip_gap')})
+    return result
+
+
+def gurobi(problem, **options):
+    solver = load_solver()
+    if solver is None:
+        raise RuntimeError(NO_GUROBI_MESSAGE)
+    return dict(solver.solve(problem, **options), engine='gurobi')
+
+
+def auto(problem, **options):
+    """Gurobi, or the greedy engine when Gurobi isn't installed or raises an error (no license, size limit)."""
+    solver = load_solver()
+    if solver is None:
+        return dict(greedy(problem, **options), fallback_reason='Gurobi is not installed')
+    try:
+        return gurobi(problem, **options)
+    except solver.gp.GurobiError as e:
+        return dict(greedy(problem, **options), fallback_reason=f'Gurobi Error: {e.message}')
+
+
+ENGINES = {'auto': auto, 'gurobi': gurobi, 'greedy': greedy}
+
+
+def solve(engine, problem, **options):
+    if engine not in ENGINES:
+        raise ValueError(f'Unknown solver engine: {engine}')
+    return ENGINES[engine](problem, **options)
@@ -0,0 +1,147 @@
+"""
+Pre-solve feasibility analysis.
+
+Most infeasible inputs can be recognized without building a model: a shift
+with fewer available people than its minimum, a shift nobody responsible can
+work, or someone whose minimum hours exceed the hours they are available for.
+find_issues() runs those checks on the Problem arrays and then a max-flow
+capacity check, and reports exactly which day/shift/employee is short.
+"""
+import numpy as np
+
+# Hours are scaled to integers for the max-flow check (supports half/quarter hours)
+FLOW_SCALE = 100
+
+# Number of issues spelled out in the result message
+MESSAGE_ISSUES = 5
+
+
+def find_issues(problem):
+    """Return a list of issues that make the problem infeasible (empty if none were found).
+
+    An empty list doesn't prove feasibility; combinations of constraints can
+    still be infeasible and are left to the solver.
+    """
+    issues = _count_issues(problem)
+    if not issues:
+        issues = _capacity_issues(problem)
+    return issues
+
+
+def _count_issues(problem):
+    issues = []
+    days, shifts = problem.days, problem.shift_names
+    available = problem.available
+
+    # Per shift: headcount, responsible people and conflicting limits
+    headcount = available.sum(axis=0)
+    for d, s in zip(*np.nonzero((problem.min_staff > 0) & (problem.max_staff > 0) & (problem.min_staff > problem.max_staff))):
+        issues.append({'type': 'staffing_conflict', 'day': days[d], 'shift': shifts[s],
+                       'min_employees': int(problem.min_staff[d, s]), 'max_employees': int(problem.max_staff[d, s])})
+    for d, s in zip(*np.nonzero(headcount < problem.min_staff)):
+        issues.append({'type': 'understaffed', 'day': days[d], 'shift': shifts[s],
+                       'required': int(problem.min_staff[d, s]), 'available': int(headcount[d, s])})
+    if problem.responsible_required:
+        responsible = available[problem.responsible].sum(axis=0)
+        for d, s in zip(*np.nonzero(responsible == 0)):
+            issues.append({'type': 'no_responsible', 'day': days[d], 'shift': shifts[s]})
+
+    # Per employee (and week): minimum hours against availability and the maximum
+    in_week = problem.week[:, None] == np.arange(problem.n_weeks)
+    available_hours = (available * problem.shift_hours).sum(axis=2) @ in_week
+    for e in np.flatnonzero((problem.min_hours > 0) & (problem.max_hours > 0) & (problem.min_hours > problem.max_hours)):
+        issues.append({'type': 'hours_conflict', 'employee': problem.employees[e],
+                       'min_hours': float(problem.min_hours[e]), 'max_hours': float(problem.max_hours[e])})
+    for e, w in zip(*np.nonzero(problem.min_hours[:, None] > available_hours)):
+        issue = {'type': 'not_enough_availability', 'employee': problem.employees[e],
+                 'min_hours': float(problem.min_hours[e]), 'available_hours': float(available_hours[e, w])}
+        if problem.n_weeks > 1:
+            issue['week'] = int(w) + 1
+        issues.append(issue)
+    return issues
+
+
+def _capacity_issues(problem):
+    # Flow of hours: source -> employee (max weekly hours) -> available shift
+    # (shift length) -> sink (minimum staffing). Any schedule that meets the
+    # minimums is such a flow, so shifts the maximum flow can't fill are short.
+    issues = []
+    demand = problem.min_staff * problem.shift_hours
+    for d, s, covered in _short_shifts(problem, np.ones(len(problem.employees), dtype=bool), demand):
+        issues.append({'type': 'capacity', 'day': problem.days[d], 'shift': problem.shift_names[s],
+                       'required': int(problem.min_staff[d, s]), 'coverable': covered})
+
+    if problem.responsible_required:
+        demand = np.broadcast_to(problem.shift_hours, problem.min_staff.shape)
+        for d, s, covered in _short_shifts(problem, problem.responsible, demand):
+            issues.append({'type': 'responsible_capacity', 'day': problem.days[d], 'shift': problem.shift_names[s]})
+    return issues
+
+
+def _short_shifts(problem, who, demand):
+    # SciPy takes a while to import; the web process only needs it once a solve comes in
+    from scipy.sparse import csr_matrix
+    from scipy.sparse.csgraph import maximum_flow
+
+    n_emp, n_days, n_shifts = problem.shape
+    scaled_hours = np.rint(problem.shift_hours * FLOW_SCALE).astype(np.int64)
+    demand = np.rint(demand * FLOW_SCALE).astype(np.int64).ravel()
+    if not demand.any():
+        return []
+
+    # Nodes: source, employees, (day, shift) slots, sink
+    source, sink = 0, 1 + n_emp + n_days * n_shifts
+    available = problem.available & who[:, None, None]
+    e_idx, d_idx, s_idx = np.nonzero(available)
+    slot_node = 1 + n_emp + d_idx * n_shifts + s_idx
+
+    worked = (available * scaled_hours).sum(axis=(1, 2))
+    limit = np.rint(problem.max_hours * problem.n_weeks * FLOW_SCALE).astype(np.int64)
+    supply = np.where(limit > 0, np.minimum(limit, worked), worked)
+
+    tails = np.concatenate([np.zeros(n_emp, dtype=np.int64), 1 + e_idx, 1 + n_emp + np.arange(n_days * n_shifts)])
+    heads = np.concatenate([1 + np.arange(n_emp), slot_node, np.full(n_days * n_shifts, sink)])
+    caps = np.concatenate([supply, scaled_hours[s_idx], demand])
+    keep = caps > 0
+    graph = csr_matrix((caps[keep].astype(np.int32), (tails[keep], heads[keep])), shape=(sink + 1, sink + 1))
+
+    flow = maximum_flow(graph, source, sink).flow
+    filled = np.asarray(flow[1 + n_emp:sink, sink].todense()).ravel()
+    short = np.flatnonzero(filled < demand)
+    hours = scaled_hours[short % n_shifts]
+    return [(i // n_shifts, i % n_shifts, int(filled[i] // hours[k]) if hours[k] else 0)
+            for k, i in enumerate(short)]
+
+
+def describe(issue):
+    """One-sentence explanation of an issue for the result message."""
+    kind = issue['type']
+    where = f"{issue.get('day')} {issue.get('shift')}"
+    who = f"{issue.get('employee')} (week {issue['week']})" if 'week' in issue else issue.get('employee')
+    if kind == 'understaffed':
+        return f"{where} needs {issue['required']} employees but has only {issue['available']} available."
+    if kind == 'capacity':
+        return (f"{where} needs {issue['required']} employees but the available employees' maximum hours "
+                f"only cover {issue['coverable']}.")
+    if kind == 'staffing_conflict':
+        return f"{where} has a minimum of {issue['min_employees']} employees above its maximum of {issue['max_employees']}."
+    if kind == 'no_responsible':
+        return f"Nobody who can be responsible is available for {where}."
+    if kind == 'responsible_capacity':
+        return f"The responsible employees' maximum hours don't leave anyone responsible for {where}."
+    if kind == 'hours_conflict':
+        return f"{issue['employee']} has minimum hours ({issue['min_hours']:g}) above maximum hours ({issue['max_hours']:g})."
+    if kind == 'not_enough_availability':
+        return (f"{who} needs at least {issue['min_hours']:g} hours but is only available "
+                f"for {issue['available_hours']:g}.")
+    if kind == 'iis':
+        subject = who or where
+        return f"Conflicting constraint: {issue['constraint'].replace('_', ' ')} for {subject}."
+    return kind
+
+
+def infeasible_result(issues):
+    message = "No feasible solution found. " + " ".join(describe(issue) for issue in issues[:MESSAGE_ISSUES])
+    if len(issues) > MESSAGE_ISSUES:
+        message += f" ({len(issues) - MESSAGE_ISSUES} more issues)"
+    return {'status': 'infeasible', 'message': message, 'issues': issues}
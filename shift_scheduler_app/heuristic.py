@@ -0,0 +1,188 @@
+"""
+Greedy construction and local search for the scheduling problem.
+
+construct() fills a schedule in three passes over the Problem arrays: a
+responsible person for every shift (when required), the minimum headcount of
+every shift, then the minimum hours of every employee. Each pass takes the
+cheapest employees (wage times shift hours) who are still allowed to work the
+shift, counting people below their minimum hours as free since they have to
+work anyway; scarce shifts are served first. improve() then drops and swaps
+assignments as long as that lowers the cost. All rules of the model are kept
+throughout: availability, weekly hour limits, staffing limits, the
+responsible person and the rest rule.
+
+Only NumPy is used, so this runs without a Gurobi license: as an engine of
+its own (see engines.py) and as the MIP start of solver.solve().
+"""
+import time
+
+import numpy as np
+
+# Seconds improve() may spend at most when no other limit is given
+IMPROVE_SECONDS = 0.5
+
+
+class _State:
+    # Assignments with the running totals the feasibility checks need
+    def __init__(self, problem):
+        n_emp, n_days, n_shifts = problem.shape
+        self.p = problem
+        self.cost = problem.wage[:, None] * problem.shift_hours[None, :]   # (E, S)
+        self.max_hours = np.where(problem.max_hours > 0, problem.max_hours, np.inf)
+        self.max_staff = np.where(problem.max_staff > 0, problem.max_staff, np.inf)
+        self.rest = problem.forbid_close_open and n_shifts > 1 and n_days > 1
+        self.assigned = np.zeros(problem.shape, dtype=bool)
+        self.worked = np.zeros((n_emp, problem.n_weeks))
+        self.staff = np.zeros((n_days, n_shifts), dtype=int)
+        self.resp = np.zeros((n_days, n_shifts), dtype=int)
+
+    def candidates(self, d, s, swap=False):
+        """Employees who could take shift (d, s) now; with swap, the headcount is not checked."""
+        p = self.p
+        if not swap and self.staff[d, s] >= self.max_staff[d, s]:
+            return np.zeros(len(p.employees), dtype=bool)
+        ok = (p.available[:, d, s] & ~self.assigned[:, d, s]
+              & (self.worked[:, p.week[d]] + p.shift_hours[s] <= self.max_hours + 1e-9))
+        if self.rest:
+            last = p.shape[2] - 1
+            if s == last and d + 1 < p.shape[1]:
+                ok &= ~self.assigned[:, d + 1, 0]
+            if s == 0 and d > 0:
+                ok &= ~self.assigned[:, d - 1, last]
+        return ok
+
+    def deficit(self, d):
+        # Hours each employee still needs in the week of day d
+        return self.p.min_hours - self.worked[:, self.p.week[d]]
+
+    def can_leave(self, e, d, s):
+        # e keeps its minimum hours without shift (d, s)
+        return self.worked[e, self.p.week[d]] - self.p.shift_hours[s] >= self.p.min_hours[e] - 1e-9
+
+    def only_responsible(self, e, d, s):
+        return self.p.responsible_required and self.p.responsible[e] and self.resp[d, s] == 1
+
+    def add(self, e, d, s):
+        self.assigned[e, d, s] = True
+        self.worked[e, self.p.week[d]] += self.p.shift_hours[s]
+        self.staff[d, s] += np.size(e)
+        self.resp[d, s] += np.sum(self.p.responsible[e])
+
+    def remove(self, e, d, s):
+        self.assigned[e, d, s] = False
+        self.worked[e, self.p.week[d]] -= self.p.shift_hours[s]
+        self.staff[d, s] -= 1
+        self.resp[d, s] -= int(self.p.responsible[e])
+
+    def keys(self, d, s):
+        # Cheapest first; people short of their minimum hours before everyone else
+        return np.where(self.deficit(d) > 1e-9, -1.0 / (1.0 + self.cost[:, s]), self.cost[:, s])
+
+
+def construct(problem):
+    """Greedy (E, D, S) bool assignment, or None when the passes can't meet every rule."""
+    state = _State(problem)
+    p = problem
+
+    if p.responsible_required:
+        order = np.argsort(p.available[p.responsible].sum(axis=0), axis=None, kind='stable')
+        for d, s in zip(*np.unravel_index(order, p.min_staff.shape)):
+            ok = state.candidates(d, s) & p.responsible
+            if ok.any():
+                keys = state.keys(d, s)
+                state.add(np.flatnonzero(ok)[np.argmin(keys[ok])], d, s)
+
+    slack = p.available.sum(axis=0) - p.min_staff
+    for d, s in zip(*np.unravel_index(np.argsort(slack, axis=None, kind='stable'), slack.shape)):
+        need = int(p.min_staff[d, s]) - state.staff[d, s]
+        if need <= 0:
+            continue
+        ok = np.flatnonzero(state.candidates(d, s))
+        room = min(need, state.max_staff[d, s] - state.staff[d, s])
+        chosen = ok[np.argsort(state.keys(d, s)[ok], kind='stable')[:int(room)]]
+        if len(chosen):
+            state.add(chosen, d, s)
+
+    for e, w in zip(*np.nonzero(p.min_hours[:, None] - state.worked > 1e-9)):
+        days = np.flatnonzero(p.week == w)
+        while state.worked[e, w] < p.min_hours[e] - 1e-9:
+            options = [(p.shift_hours[s], d, s) for d in days for s in range(p.shape[2])
+                       if state.candidates(d, s)[e]]
+            if not options:
+                break
+            missing = p.min_hours[e] - state.worked[e, w]
+            # The shortest shift that closes the gap, else the longest one
+            enough = [o for o in options if o[0] >= missing - 1e-9]
+            _, d, s = min(enough) if enough else max(options)
+            state.add(e, d, s)
+
+    return state.assigned if not violations(p, state.assigned) else None
+
+
+def improve(problem, assigned, time_limit=None, should_stop=None):
+    """Drop and swap assignments of a valid schedule while that lowers its cost."""
+    deadline = time.monotonic() + (min(time_limit, IMPROVE_SECONDS) if time_limit else IMPROVE_SECONDS)
+    state = _State(problem)
+    for e, d, s in zip(*np.nonzero(assigned)):
+        state.add(e, d, s)
+    p = problem
+
+    changed = True
+    while changed and time.monotonic() < deadline and not (should_stop and should_stop()):
+        changed = False
+        e_idx, d_idx, s_idx = np.nonzero(state.assigned)
+        for i in np.argsort(-state.cost[e_idx, s_idx], kind='stable'):
+            e, d, s = e_idx[i], d_idx[i], s_idx[i]
+            if not state.assigned[e, d, s] or not state.can_leave(e, d, s):
+                continue
+            only_responsible = state.only_responsible(e, d, s)
+            if state.staff[d, s] > p.min_staff[d, s] and not only_responsible:
+                state.remove(e, d, s)
+                changed = True
+                continue
+            # Hand the shift to someone cheaper, responsible if e was the only one
+            state.remove(e, d, s)
+            ok = state.candidates(d, s, swap=True) & (state.cost[:, s] < state.cost[e, s] - 1e-9)
+            if only_responsible:
+                ok &= p.responsible
+            ok[e] = False
+            if ok.any():
+                state.add(np.flatnonzero(ok)[np.argmin(state.cost[ok, s])], d, s)
+                changed = True
+            else:
+                state.add(e, d, s)
+            if time.monotonic() >= deadline:
+                break
+    return state.assigned
+
+
+def total_cost(problem, assigned):
+    return float((assigned.sum(axis=1) * problem.shift_hours[None, :] * problem.wage[:, None]).sum())
+
+
+def lower_bound(problem):
+    """A bound no schedule can beat: the larger of the cheapest minimum headcounts and the minimum hours."""
+    cost = problem.wage[:, None] * problem.shift_hours[None, :]
+    staffing = 0.0
+    for d, s in zip(*np.nonzero(problem.min_staff > 0)):
+        costs = np.sort(cost[problem.available[:, d, s], s])
+        staffing += costs[:int(problem.min_staff[d, s])].sum()
+    hours = float((problem.wage * problem.min_hours).sum() * problem.n_weeks)
+    return max(staffing, hours)
+
+
+def violations(problem, assigned):
+    """Number of broken rules in an (E, D, S) assignment (0 for a valid schedule)."""
+    p = problem
+    hours = np.zeros((len(p.employees), p.n_weeks))
+    np.add.at(hours.T, p.week, (assigned * p.shift_hours).sum(axis=2).T)
+    staff = assigned.sum(axis=0)
+    count = int((assigned & ~p.available).sum())
+    count += int((hours < p.min_hours[:, None] - 1e-9).sum())
+    count += int(((p.max_hours[:, None] > 0) & (hours > p.max_hours[:, None] + 1e-9)).sum())
+    count += int((staff < p.min_staff).sum() + ((p.max_staff > 0) & (staff > p.max_staff)).sum())
+    if p.responsible_required:
+        count += int((assigned[p.responsible].sum(axis=0) == 0).sum())
+    if p.forbid_close_open and p.shape[1] > 1 and p.shape[2] > 1:
+        count += int((assigned[:, :-1, -1] & assigned[:, 1:, 0]).sum())
+    return count
@@ -0,0 +1,231 @@
+"""
+Multi-week rolling-horizon planning.
+
+A horizon request is a regular solve payload describing one week plus
+'weeks' (the number of weeks to plan) and optional 'week_overrides', a list
+with one delta per week (see problem.apply_delta) for availability and
+staffing that differ from the template. Weekly hour limits apply to each week.
+
+Each week is solved as its own window, all windows in parallel on the solve
+pool. The only constraints that cross a window boundary are rest rules
+(forbid_close_open), so a final pass re-solves each boundary that breaks one:
+both adjacent weeks together, with everything but the days around the
+boundary fixed to the window solutions. Boundaries are reconciled in two
+rounds (even, then odd) so each round's re-solves share no week.
+"""
+import time
+from dataclasses import replace
+
+import numpy as np
+
+from problem import parse_problem, apply_delta, assignment_tensor
+
+# Seconds between cancel checks while waiting for window jobs
+WAIT_INTERVAL = 0.25
+
+
+class HorizonError(ValueError):
+    # A horizon the planner can't join; the message is meant for the client
+    pass
+
+
+def parse_horizon(data, max_weeks, parse=parse_problem):
+    """Return one Problem per week; raises HorizonError for horizons the planner can't join.
+
+    parse turns a weekly payload into a Problem, e.g. for the stored employees
+    of a payload with 'employee_ids'; such payloads have no employee data for
+    overrides to change, so their overrides may only change staffing.
+    """
+    n_weeks = int(data['weeks'])
+    if not 1 <= n_weeks <= max_weeks:
+        raise HorizonError(f'weeks must be between 1 and {max_weeks}')
+    overrides = list(data.get('week_overrides') or [])
+    if len(overrides) > n_weeks:
+        raise HorizonError('There are more week_overrides than weeks')
+    overrides += [None] * (n_weeks - len(overrides))
+    if 'employees' not in data and any(delta and ('employees' in delta or 'remove_employees' in delta)
+                                       for delta in overrides):
+        raise HorizonError('week_overrides may only change staffing when solving for employee_ids')
+    weeks = [parse(apply_delta(data, delta) if delta else data) for delta in overrides]
+    join_weeks(weeks)
+    return weeks
+
+
+def join_weeks(weeks, first_week=1):
+    """Concatenate weekly Problems into one Problem with per-week hour limits.
+
+    Days are labelled 'W{n} {day}', counting weeks from first_week. Every week must have the same shifts and
+    the same employees with the same wage, hour limits and role; only
+    availability and staffing may differ.
+    """
+    first = weeks[0]
+    order = []
+    for k, week in enumerate(weeks):
+        if week.shift_names != first.shift_names or not np.array_equal(week.shift_hours, first.shift_hours):
+            raise HorizonError(f'Week {k + 1} has different shifts than week 1')
+        if sorted(week.employees) != sorted(first.employees):
+            raise HorizonError(f'Week {k + 1} has different employees than week 1')
+        position = {name: e for e, name in enumerate(week.employees)}
+        rows = [position[name] for name in first.employees]
+        for name in ('min_hours', 'max_hours', 'wage', 'responsible'):
+            if not np.array_equal(getattr(week, name)[rows], getattr(first, name)):
+                raise HorizonError(f'Week {k + 1} changes employee {name.replace("_", " ")}; '
+                                 f'week overrides may only change availability and staffing')
+        if week.responsible_required != first.responsible_required or week.forbid_close_open != first.forbid_close_open:
+            raise HorizonError(f'Week {k + 1} has different rules than week 1')
+        order.append(rows)
+
+    return replace(
+        first,
+        days=[f'W{first_week + k} {day}' for k, week in enumerate(weeks) for day in week.days],
+        available=np.concatenate([week.available[rows] for week, rows in zip(weeks, order)], axis=1),
+        min_staff=np.concatenate([week.min_staff for week in weeks]),
+        max_staff=np.concatenate([week.max_staff for week in weeks]),
+        week=np.concatenate([np.full(len(week.days), k) for k, week in enumerate(weeks)]),
+    )
+
+
+def solve_horizon(weeks, jobs, time_limit=None, owner=None, should_stop=None, on_progress=None,
+                  aggregate=False, mip_gap=None, engine=None, overlap=1):
+    """Plan all weeks with the SolveJobs pool and return one merged result.
+
+    The schedule covers every day of the horizon, labelled 'W{n} {day}' as
+    by join_weeks(); 'days' lists those labels in order. on_progress(dict) is told which phase ('windows' or 'boundaries') runs.
+    overlap is the number of days on each side of a boundary that the final
+    pass may change. The status is 'optimal' when every window was solved to
+    optimality and no boundary needed a change, 'feasible' for a valid merged
+    schedule otherwise, 'cancelled' after a stop request, or the status of the
+    first window that has no schedule. When a boundary still breaks a rest rule
+    ('unresolved_boundaries'), the status is 'unresolved' and the merged days
+    come as 'draft_schedule' instead of 'schedule'.
+    """
+    started = time.perf_counter()
+    if on_progress is not None:
+        on_progress({'started_at': time.time(), 'phase': 'windows', 'weeks': len(weeks)})
+    job_ids = [jobs.submit(week, time_limit=time_limit, owner=owner, aggregate=aggregate, mip_gap=mip_gap,
+                           engine=engine)
+               for week in weeks]
+    finished = _wait(jobs, job_ids, owner, should_stop)
+
+    report = []
+    for k, job in enumerate(finished):
+        result = job['result'] or {}
+        report.append({
+            'week': k + 1,
+            'status': result.get('status', job['state']),
+            'total_cost': result.get('total_cost'),
+            'seconds': _seconds(job),
+            'cached': bool(result.get('cached')),
+            'solve_stats': result.get('solve_stats'),
+        })
+        if 'schedule' not in result:
+            # No point in reconciling around a week without a schedule
+            failed = {'status': 'error', 'message': job.get('error')} if job['state'] == 'failed' else result
+            return {
+                'status': failed.get('status', job['state']),
+                'message': f"Week {k + 1}: {failed.get('message', 'no schedule was found.')}",
+                'issues': failed.get('issues', []),
+                'weeks': report,
+                'seconds': time.perf_counter() - started,
+            }
+    schedules = [job['result']['schedule'] for job in finished]
+
+    boundaries = []
+    if weeks[0].forbid_close_open:
+        if on_progress is not None:
+            on_progress({'phase': 'boundaries', 'weeks': len(weeks)})
+        for parity in (0, 1):
+            todo = [k for k in range(parity, len(weeks) - 1, 2) if _conflicts(weeks, schedules, k)]
+            job_ids = [_submit_boundary(jobs, weeks, schedules, k, overlap, time_limit, mip_gap, engine, owner)
+                       for k in todo]
+            for k, job in zip(todo, _wait(jobs, job_ids, owner, should_stop)):
+                result = job['result'] or {}
+                if 'schedule' in result:
+                    schedules[k], schedules[k + 1] = _split(weeks, k, result['schedule'])
+                boundaries.append({
+                    'after_week': k + 1,
+                    'status': result.get('status', job['state']),
+                    'seconds': _seconds(job),
+                    'fixed_days': result.get('fixed_days'),
+                    'changed_assignments': result.get('changed_assignments'),
+                })
+
+    horizon = join_weeks(weeks)
+    merged = {f'W{k + 1} {day}': shifts for k, schedule in enumerate(schedules) for day, shifts in schedule.items()}
+    assigned = assignment_tensor(horizon, merged)
+    unresolved = [k + 1 for k in range(len(weeks) - 1) if weeks[0].forbid_close_open and _conflicts(weeks, schedules, k)]
+    if should_stop is not None and should_stop():
+        status = 'cancelled'
+    elif unresolved:
+        status = 'unresolved'
+    elif all(w['status'] == 'optimal' for w in report) and not boundaries:
+        status = 'optimal'
+    else:
+        status = 'feasible'
+    result = {
+        'status': status,
+        'schedule': merged,
+        'days': horizon.days,
+        'total_cost': float((assigned * horizon.shift_hours).sum(axis=(1, 2)) @ horizon.wage),
+        'weeks': report,
+        'boundaries': boundaries,
+        'unresolved_boundaries': unresolved,
+        'seconds': time.perf_counter() - started,
+    }
+    if unresolved:
+        # Someone still closes and opens across these boundaries: not a valid schedule
+        result['draft_schedule'] = result.pop('schedule')
+        result['message'] = (f"Someone still closes and opens across the end of week(s) "
+                             f"{', '.join(map(str, unresolved))}; the merged schedule is only a draft.")
+    return result
+
+
+def _wait(jobs, job_ids, owner, should_stop):
+    # Job statuses in submission order; a stop request cancels every job. A job
+    # that is gone (pruned) is reported as failed rather than waited for forever
+    finished = []
+    for job_id in job_ids:
+        while True:
+            job = jobs.wait(job_id, owner=owner, timeout=WAIT_INTERVAL)
+            if job is not None:
+                break
+            if jobs.status(job_id, owner=owner) is None:
+                now = time.time()
+                job = {'id': job_id, 'state': 'failed', 'error': 'The job is no longer available.',
+                       'result': None, 'submitted_at': now, 'finished_at': now}
+                break
+            if should_stop is not None and should_stop():
+                for other in job_ids:
+                    jobs.cancel(other, owner=owner)
+        finished.append(job)
+    return finished
+
+
+def _seconds(job):
+    # Wall time from submission; done callbacks may not have stamped finished_at yet
+    return (job['finished_at'] or time.time()) - job['submitted_at']
+
+
+def _conflicts(weeks, schedules, k):
+    # Does anyone close the last day of week k and open the first day of week k + 1?
+    last_day, first_day = weeks[k].days[-1], weeks[k + 1].days[0]
+    closing = schedules[k].get(last_day, {}).get(weeks[k].shift_names[-1], [])
+    opening = schedules[k + 1].get(first_day, {}).get(weeks[k + 1].shift_names[0], [])
+    return bool(set(closing) & set(opening))
+
+
+def _submit_boundary(jobs, weeks, schedules, k, overlap, time_limit, mip_gap, engine, owner):
+    pair = join_weeks(weeks[k:k + 2], first_week=k + 1)
+    n_days = len(weeks[k].days)
+    free = set(pair.days[max(n_days - overlap, 0):n_days + overlap])
+    previous = dict(_label(weeks[k], schedules[k], k + 1), **_label(weeks[k + 1], schedules[k + 1], k + 2))
+    return jobs.submit(pair, time_limit=time_limit, owner=owner, previous=previous, mip_gap=mip_gap, engine=engine,
+                       fixed_days=[day for day in pair.days if day not in free])
+
+
+def _label(week, schedule, n):
+    return {f'W{n} {day}': schedule.get(day, {}) for day in week.days}
+
+
+def _split(weeks, k, schedule):
+    return [{day: schedule[f'W{n + 1} {day}'] for day in weeks[n].days} for n in (k, k + 1)]
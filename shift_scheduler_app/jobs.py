@@ -0,0 +1,386 @@
+"""
+Background solve jobs.
+
+Solves run on a bounded process pool so that a few large models can't tie up
+the web workers. Submitting returns a job id right away; progress reported by
+the solver callback and cancel requests travel through a multiprocessing
+Manager shared with the workers.
+
+Each worker process starts one Gurobi environment when it comes up and builds
+every model on it, so license checks and environment setup happen once per
+worker. The core budget is split evenly over the workers through the
+environment's Threads parameter. Workers also keep the models they built,
+per job owner, for re-solves of the same roster (see models.py). Gurobi and
+the model code are imported by the workers only, never by the web process.
+"""
+import multiprocessing
+import os
+import threading
+import time
+import uuid
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, CancelledError, TimeoutError
+
+import horizon
+import engines
+from cache import problem_key, reorder_schedule
+from feasibility import find_issues, infeasible_result
+
+
+class JobQueueFull(Exception):
+    pass
+
+
+# Gurobi environment and model cache of this pool worker, set up by _init_worker
+_env = None
+_models = None
+
+
+def _init_worker(threads, model_cache_bytes):
+    global _env, _models
+    solver = engines.load_solver()
+    if solver is None:
+        # Without gurobipy only the greedy engine can run ('auto' jobs fall back to it)
+        return
+    from models import ModelCache
+    try:
+        _env = solver.make_env(threads)
+    except solver.gp.GurobiError:
+        # Jobs then use the default environment: 'auto' jobs fall back to the greedy
+        # engine, 'gurobi' jobs report the license error themselves
+        _env = None
+    _models = ModelCache(model_cache_bytes) if model_cache_bytes else None
+
+
+def _ping():
+    return os.getpid()
+
+
+def _run_job(job_id, problem, time_limit, progress, cancel_flags, options, owner):
+    # Executed inside a pool worker process
+    solver = engines.load_solver()
+    state = {'state': 'running', 'started_at': time.time(), 'solution_count': 0}
+    progress[job_id] = state
+
+    # Manager dicts only see reassignments, so the whole state is written back each time
+    def on_progress(info):
+        state.update(info)
+        progress[job_id] = state
+
+    def on_incumbent(solution):
+        state['solution'] = solution
+        state['solution_count'] += 1
+        progress[job_id] = state
+
+    options = dict(options)
+    try:
+        return engines.solve(
+            options.pop('engine'),
+            problem,
+            time_limit=time_limit,
+            on_progress=on_progress,
+            on_incumbent=on_incumbent,
+            should_stop=lambda: cancel_flags.get(job_id, False),
+            env=_env,
+            models=_models,
+            owner=owner,
+            **options,
+        )
+    except Exception as e:
+        # GurobiError doesn't survive pickling back to the parent reliably
+        if solver is not None and isinstance(e, solver.gp.GurobiError):
+            raise RuntimeError(f'Gurobi Error: {e.message}') from None
+        raise
+
+
+def _completed(result):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class SolveJobs:
+    def __init__(self, max_workers=2, default_time_limit=60, max_time_limit=300,
+                 max_pending=100, retention=3600, cache=None, thread_budget=None,
+                 default_mip_gap=None, tenant_defaults=None, max_alternatives=10, on_result=None,
+                 model_cache_bytes=0, default_engine='auto', heuristic_start=True):
+        self.max_workers = max_workers
+        self.default_time_limit = default_time_limit
+        self.max_time_limit = max_time_limit
+        self.max_pending = max_pending
+        self.retention = retention
+        self.cache = cache
+        # Cores shared by all concurrent solves (default: every core of the machine)
+        self.thread_budget = thread_budget or os.cpu_count() or 1
+        self.threads_per_solve = max(1, self.thread_budget // max_workers)
+        self.default_mip_gap = default_mip_gap
+        # {owner: {'time_limit': ..., 'mip_gap': ...}} overriding the defaults per tenant
+        self.tenant_defaults = tenant_defaults or {}
+        # Most schedules a single solve may return from the solution pool
+        self.max_alternatives = max_alternatives
+        # on_result(result) is called with the result of every solve that ran on the pool
+        self.on_result = on_result
+        # Memory budget of the model cache of each worker (0 disables it)
+        self.model_cache_bytes = model_cache_bytes
+        # Engine of jobs that don't name one (see engines.py), and whether Gurobi
+        # solves start from the greedy schedule
+        self.default_engine = default_engine
+        self.heuristic_start = heuristic_start
+
+        self._started_at = None
+        self._busy_seconds = 0.0
+        self._solved = 0
+        self._jobs = {}
+        self._lock = threading.Lock()
+        self._executor = None
+        self._horizon_executor = None
+        self._manager = None
+        self._progress = None
+        self._cancel_flags = None
+
+    def _ensure_started(self):
+        # The pool and manager are started lazily so that importing the app
+        # (e.g. for scripts) doesn't spawn processes.
+        if self._executor is None:
+            ctx = multiprocessing.get_context('spawn')
+            self._manager = ctx.Manager()
+            self._progress = self._manager.dict()
+            self._cancel_flags = self._manager.dict()
+            self._executor = ProcessPoolExecutor(max_workers=self.max_workers, mp_context=ctx,
+                                                 initializer=_init_worker,
+                                                 initargs=(self.threads_per_solve, self.model_cache_bytes))
+            self._started_at = time.time()
+            # Horizon jobs only coordinate window jobs, so threads are enough
+            self._horizon_executor = ThreadPoolExecutor(max_workers=self.max_workers)
+
+    def start(self):
+        """Start the pool and one worker per slot now instead of on the first solve."""
+        with self._lock:
+            self._ensure_started()
+            # Each submit spawns a worker while none is idle; the pings aren't awaited
+            for _ in range(self.max_workers):
+                self._executor.submit(_ping)
+
+    def clamp_time_limit(self, time_limit, owner=None):
+        if not time_limit:
+            return self.tenant_defaults.get(owner, {}).get('time_limit') or self.default_time_limit
+        return min(float(time_limit), self.max_time_limit)
+
+    def mip_gap(self, mip_gap=None, owner=None):
+        if mip_gap is not None:
+            return max(float(mip_gap), 0.0)
+        return self.tenant_defaults.get(owner, {}).get('mip_gap', self.default_mip_gap)
+
+    def submit(self, problem, time_limit=None, owner=None, previous=None, fixed_days=(), aggregate=False,
+               explain=False, mip_gap=None, alternatives=1, min_changes=0, engine=None):
+        # Obvious infeasibility is reported right away instead of going through the pool
+        issues = find_issues(problem)
+        if issues:
+            with self._lock:
+                return self._add_job(_completed(infeasible_result(issues)), owner, time_limit=None, key=None)
+
+        mip_gap = self.mip_gap(mip_gap, owner)
+        alternatives = max(1, min(int(alternatives or 1), self.max_alternatives))
+        min_changes = max(int(min_changes or 0), 0)
+        options = {'aggregate': aggregate, 'explain': explain, 'precheck': False, 'mip_gap': mip_gap,
+                   'alternatives': alternatives, 'min_changes': min_changes,
+                   'engine': engine or self.default_engine, 'heuristic_start': self.heuristic_start}
+        if previous is not None:
+            options.update(previous=previous, fixed_days=list(fixed_days))
+        # Warm-started re-solves depend on the previous schedule, so they bypass the cache;
+        # so do greedy solves, which are asked for by name
+        key = (problem_key(problem, mip_gap, alternatives, min_changes, explain)
+               if self.cache is not None and previous is None and options['engine'] != 'greedy' else None)
+        cached = self.cache.get(key) if key is not None else None
+
+        with self._lock:
+            self._prune()
+            if cached is not None:
+                # Answer from the cache with an already completed job
+                result = dict(reorder_schedule(cached, problem.employees), cached=True)
+                return self._add_job(_completed(result), owner, time_limit=None, key=None)
+
+            pending = sum(1 for job in self._jobs.values() if not job['future'].done())
+            if pending >= self.max_pending:
+                raise JobQueueFull('Too many solve jobs are pending, please try again later')
+
+            self._ensure_started()
+            job_id = uuid.uuid4().hex
+            time_limit = self.clamp_time_limit(time_limit, owner)
+            future = self._executor.submit(_run_job, job_id, problem, time_limit,
+                                           self._progress, self._cancel_flags, options, owner)
+            return self._add_job(future, owner, time_limit, key, job_id=job_id)
+
+    def submit_horizon(self, weeks, time_limit=None, owner=None, aggregate=False, mip_gap=None, engine=None):
+        """Plan several weekly Problems as one job (see horizon.py); the windows run as jobs of their own."""
+        with self._lock:
+            self._prune()
+            pending = sum(1 for job in self._jobs.values() if not job['future'].done())
+            if pending + len(weeks) >= self.max_pending:
+                raise JobQueueFull('Too many solve jobs are pending, please try again later')
+
+            self._ensure_started()
+            job_id = uuid.uuid4().hex
+            time_limit = self.clamp_time_limit(time_limit, owner)
+            state = {'state': 'running'}
+
+            def on_progress(info):
+                state.update(info)
+                self._progress[job_id] = state
+
+            future = self._horizon_executor.submit(
+                horizon.solve_horizon, weeks, self, time_limit=time_limit, owner=owner, aggregate=aggregate,
+                mip_gap=mip_gap, engine=engine,
+                should_stop=lambda: self._cancel_flags.get(job_id, False), on_progress=on_progress,
+            )
+            return self._add_job(future, owner, time_limit, key=None, job_id=job_id, kind='horizon')
+
+    def _add_job(self, future, owner, time_limit, key, job_id=None, kind='solve'):
+        job_id = job_id or uuid.uuid4().hex
+        self._jobs[job_id] = {
+            'id': job_id,
+            'kind': kind,
+            'owner': owner,
+            'future': future,
+            'key': key,
+            'time_limit': time_limit,
+            'submitted_at': time.time(),
+            'finished_at': None,
+            # Set once _on_done has stored the result; only then is the job reported finished
+            'done': threading.Event(),
+        }
+        future.add_done_callback(lambda f, job_id=job_id: self._on_done(job_id))
+        return job_id
+
+    def run(self, problem, **kwargs):
+        """Submit a job and block until it finishes, returning the job status."""
+        job_id = self.submit(problem, **kwargs)
+        return self.wait(job_id, owner=kwargs.get('owner'))
+
+    def wait(self, job_id, owner=None, timeout=None):
+        """Block until a job finishes and return its status; None on timeout or for an unknown job."""
+        job = self._get(job_id, owner)
+        if job is None:
+            return None
+        try:
+            job['future'].result(timeout=timeout)
+        except TimeoutError:
+            return None
+        except Exception:
+            pass
+        # The done callback may still be running on the pool's thread
+        if not job['done'].wait(timeout):
+            return None
+        return self.status(job_id, owner=owner)
+
+    def _on_done(self, job_id):
+        job = self._jobs.get(job_id)
+        if job is not None:
+            finished_at = time.time()
+            try:
+                future = job['future']
+                # Worker time spent on pool jobs, for utilization()
+                started_at = (self._progress.get(job_id) or {}).get('started_at') if self._progress is not None else None
+                if started_at and job['kind'] == 'solve':
+                    self._busy_seconds += finished_at - started_at
+                    self._solved += 1
+                    if self.on_result is not None and not future.cancelled() and future.exception() is None:
+                        self.on_result(future.result())
+                # Cached before the job shows as finished, so a repeat of the request is a hit
+                if job['key'] is not None and not future.cancelled() and future.exception() is None:
+                    self.cache.put(job['key'], future.result())
+            finally:
+                job['finished_at'] = finished_at
+                job['done'].set()
+        if self._progress is not None:
+            self._progress.pop(job_id, None)
+            self._cancel_flags.pop(job_id, None)
+
+    def _prune(self):
+        cutoff = time.time() - self.retention
+        for job_id in [j['id'] for j in self._jobs.values()
+                       if j['finished_at'] and j['finished_at'] < cutoff]:
+            del self._jobs[job_id]
+
+    def _get(self, job_id, owner):
+        job = self._jobs.get(job_id)
+        if job is None or job['owner'] != owner:
+            return None
+        return job
+
+    def status(self, job_id, owner=None):
+        job = self._get(job_id, owner)
+        if job is None:
+            return None
+
+        future = job['future']
+        info = {
+            'id': job_id,
+            'time_limit': job['time_limit'],
+            'submitted_at': job['submitted_at'],
+            'finished_at': job['finished_at'],
+            'progress': None,
+            'result': None,
+        }
+        if future.cancelled():
+            info['state'] = 'cancelled'
+        elif job['done'].is_set():
+            try:
+                result = future.result()
+            except CancelledError:
+                info['state'] = 'cancelled'
+            except Exception as e:
+                info['state'] = 'failed'
+                info['error'] = str(e)
+            else:
+                info['state'] = 'cancelled' if result['status'] == 'cancelled' else 'completed'
+                info['result'] = result
+        else:
+            progress = dict(self._progress.get(job_id) or {})
+            info['state'] = progress.pop('state', 'queued')
+            info['started_at'] = progress.pop('started_at', None)
+            info['progress'] = progress or None
+        return info
+
+    def cancel(self, job_id, owner=None):
+        job = self._get(job_id, owner)
+        if job is None:
+            return False
+        # Queued jobs are simply dropped; running ones are told to terminate
+        if not job['future'].cancel() and not job['future'].done():
+            self._cancel_flags[job_id] = True
+        return True
+
+    def utilization(self):
+        """Pool sizing figures: slots, threads, queue length and the share of worker time spent solving."""
+        with self._lock:
+            running = queued = 0
+            for job in self._jobs.values():
+                if job['future'].done() or job['kind'] != 'solve':
+                    continue
+                state = (self._progress.get(job['id']) or {}).get('state') if self._progress is not None else None
+                if state == 'running':
+                    running += 1
+                else:
+                    queued += 1
+            uptime = time.time() - self._started_at if self._started_at else 0.0
+            capacity = uptime * self.max_workers
+            return {
+                'started': self._started_at is not None,
+                'workers': self.max_workers,
+                'thread_budget': self.thread_budget,
+                'threads_per_solve': self.threads_per_solve,
+                'running': running,
+                'queued': queued,
+                'solved': self._solved,
+                'busy_seconds': self._busy_seconds,
+                'uptime_seconds': uptime,
+                'utilization': min(self._busy_seconds / capacity, 1.0) if capacity else 0.0,
+            }
+
+    def shutdown(self):
+        if self._executor is not None:
+            self._horizon_executor.shutdown(wait=False, cancel_futures=True)
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._manager.shutdown()
+            self._executor = None
+            self._horizon_executor = None
@@ -0,0 +1,178 @@
+"""
+In-process metrics in the Prometheus text exposition format.
+
+A small registry of labelled counters, gauges and histograms, rendered by the
+/metrics route of app.py. It only covers what the app records (request
+latency, DB queries per route, solve phases and solver statistics), so there
+is no dependency on a client library. Values live in the web process; solve
+workers report through the solve_stats of their results.
+"""
+import math
+import threading
+
+# Request and DB query latency (seconds)
+LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+# Solve phases, from building a model to a solve that runs into the time limit (seconds)
+SOLVE_BUCKETS = (0.001, 0.01, 0.05, 0.1, 0.5, 1, 5, 10, 30, 60, 120, 300)
+# Model rows and columns
+SIZE_BUCKETS = (10, 50, 100, 500, 1000, 2000, 5000, 10000, 50000, 100000)
+
+
+def _format_labels(names, values):
+    if not names:
+        return ''
+    escaped = (str(v).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n') for v in values)
+    return '{' + ','.join(f'{n}="{v}"' for n, v in zip(names, escaped)) + '}'
+
+
+def _format_value(value):
+    if value == math.inf:
+        return '+Inf'
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+
+class _Metric:
+    kind = None
+
+    def __init__(self, name, help, labels=()):
+        self.name = name
+        self.help = help
+        self.labels = tuple(labels)
+        self._values = {}
+        self._lock = threading.Lock()
+
+    def _key(self, labels):
+        return tuple(labels.get(name, '') for name in self.labels)
+
+    def render(self):
+        lines = [f'# HELP {self.name} {self.help}', f'# TYPE {self.name} {self.kind}']
+        with self._lock:
+            for key, value in sorted(self._values.items()):
+                lines.extend(self._samples(key, value))
+        return lines
+
+    def _samples(self, key, value):
+        return [f'{self.name}{_format_labels(self.labels, key)} {_format_value(value)}']
+
+
+class Counter(_Metric):
+    kind = 'counter'
+
+    def inc(self, amount=1, **labels):
+        key = self._key(labels)
+        with self._lock:
+            self._values[key] = self._values.get(key, 0) + amount
+
+    def set_total(self, value, **labels):
+        # For totals counted elsewhere and sampled by a collector
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Gauge(_Metric):
+    kind = 'gauge'
+
+    def set(self, value, **labels):
+        with self._lock:
+            self._values[self._key(labels)] = value
+
+
+class Histogram(_Metric):
+    kind = 'histogram'
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        super().__init__(name, help, labels)
+        self.buckets = tuple(sorted(buckets)) + (math.inf,)
+
+    def observe(self, value, **labels):
+        key = self._key(labels)
+        with self._lock:
+            counts, total = self._values.get(key, ([0] * len(self.buckets), 0.0))
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            self._values[key] = (counts, total + value)
+
+    def _samples(self, key, value):
+        counts, total = value
+        lines = []
+        for bound, count in zip(self.buckets, counts):
+            labels = _format_labels(self.labels + ('le',), key + (_format_value(bound),))
+            lines.append(f'{self.name}_bucket{labels} {count}')
+        labels = _format_labels(self.labels, key)
+        lines.append(f'{self.name}_sum{labels} {_format_value(total)}')
+        lines.append(f'{self.name}_count{labels} {counts[-1]}')
+        return lines
+
+
+class Registry:
+    def __init__(self):
+        self._metrics = []
+        # Called before rendering, to refresh gauges that are sampled rather than recorded
+        self._collectors = []
+
+    def counter(self, name, help, labels=()):
+        return self._add(Counter(name, help, labels))
+
+    def gauge(self, name, help, labels=()):
+        return self._add(Gauge(name, help, labels))
+
+    def histogram(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        return self._add(Histogram(name, help, labels, buckets))
+
+    def collector(self, collect):
+        self._collectors.append(collect)
+        return collect
+
+    def _add(self, metric):
+        self._metrics.append(metric)
+        return metric
+
+    def render(self):
+        for collect in self._collectors:
+            collect()
+        lines = []
+        for metric in self._metrics:
+            lines.extend(metric.render())
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+http_requests = registry.counter('http_requests_total', 'HTTP requests handled', ('endpoint', 'method', 'status'))
+http_latency = registry.histogram('http_request_duration_seconds', 'HTTP request latency', ('endpoint', 'method'))
+db_queries = registry.counter('db_queries_total', 'Database queries issued', ('endpoint',))
+db_latency = registry.histogram('db_query_duration_seconds', 'Database query latency', ('endpoint',))
+
+solves = registry.counter('solves_total', 'Solves finished by the solve pool', ('status',))
+solve_phases = registry.histogram('solve_phase_seconds', 'Time spent per solve phase', ('phase',), SOLVE_BUCKETS)
+model_variables = registry.histogram('solve_model_variables', 'Variables per built model', buckets=SIZE_BUCKETS)
+model_constraints = registry.histogram('solve_model_constraints', 'Constraints per built model', buckets=SIZE_BUCKETS)
+model_cache = registry.counter('solve_model_cache_total', 'Model lookups in the model caches of the solve workers',
+                               ('result',))
+solver_runtime = registry.histogram('solve_runtime_seconds', 'Gurobi runtime per solve', buckets=SOLVE_BUCKETS)
+solver_nodes = registry.histogram('solve_nodes', 'Branch-and-bound nodes per solve',
+                                  buckets=(0, 1, 10, 100, 1000, 10000, 100000))
+solver_gap = registry.histogram('solve_mip_gap', 'Relative MIP gap of solves that stopped early',
+                                buckets=(0.0001, 0.001, 0.01, 0.05, 0.1, 0.25, 0.5, 1))
+
+
+def record_solve(result):
+    """Record the solve_stats of a solve result (see solver.solve)."""
+    stats = result.get('solve_stats') or {}
+    solves.inc(status=result.get('status', 'unknown'))
+    for key, value in stats.items():
+        if key.endswith('_seconds'):
+            solve_phases.observe(value, phase=key[:-len('_seconds')])
+    if 'variables' in stats:
+        model_variables.observe(stats['variables'])
+    if 'constraints' in stats:
+        model_constraints.observe(stats['constraints'])
+    if 'model_reused' in stats:
+        model_cache.inc(result='hit' if stats['model_reused'] else 'miss')
+    if 'runtime' in stats:
+        solver_runtime.observe(stats['runtime'])
+    if 'nodes' in stats:
+        solver_nodes.observe(stats['nodes'])
+    if result.get('mip_gap') is not None:
+        solver_gap.observe(result['mip_gap'])
@@ -0,0 +1,134 @@
+"""
+Cache of built scheduling models, per manager.
+
+A manager's what-if loop mostly changes numbers on the same roster: a wage,
+someone's max hours, one shift's headcount. Models are therefore kept per
+(owner, structure), where the structure is what fixes the variables and rows
+of the model: the employees, days, shifts, availability, weeks and the
+responsible and rest rules. On a hit, the objective, right-hand sides,
+coefficients and bounds are updated in place (solver.update_model) and the
+last solution of the model becomes the MIP start of the next solve.
+
+Entries are evicted least recently used once the estimated size of all cached
+models exceeds the budget, and disposed right away so Gurobi frees them. Each
+solve worker process has a cache of its own (see jobs.py).
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+from gurobipy import GRB
+
+from solver import build_model, update_model
+
+# Rough memory use of a Gurobi model, measured with the MemUsed attribute
+BYTES_PER_VARIABLE = 100
+BYTES_PER_CONSTRAINT = 100
+BYTES_PER_NONZERO = 24
+
+# Parameters solve() may set on a model; restored to their build-time values on reuse
+RESET_PARAMS = ('TimeLimit', 'Threads', 'MIPGap')
+
+
+def structure_key(problem):
+    """What two Problems must share for one model to serve both."""
+    return (tuple(problem.employees), tuple(problem.days), tuple(problem.shift_names),
+            problem.available.tobytes(), problem.week.tobytes(),
+            problem.responsible_required, problem.forbid_close_open)
+
+
+def model_bytes(model):
+    return (model.NumVars * BYTES_PER_VARIABLE + model.NumConstrs * BYTES_PER_CONSTRAINT
+            + model.NumNZs * BYTES_PER_NONZERO)
+
+
+@dataclass
+class CachedModel:
+    model: object
+    x: object
+    slots: np.ndarray
+    problem: object
+    params: dict = field(default_factory=dict)
+    solution: np.ndarray = None
+    nbytes: int = 0
+    reused: bool = False
+
+
+class ModelCache:
+    def __init__(self, max_bytes):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def checkout(self, owner, problem, env=None):
+        """Take the model for problem out of the cache, updated, or build a new one.
+
+        The model is the caller's until it is handed back with checkin().
+        """
+        key = (owner, structure_key(problem))
+        with self._lock:
+            entry = self._entries.pop(key, None)
+            if entry is None:
+                self.misses += 1
+            else:
+                self._bytes -= entry.nbytes
+                self.hits += 1
+
+        if entry is None:
+            model, x, slots = build_model(problem, env=env, fixed_rows=True)
+            params = {name: model.getParamInfo(name)[2] for name in RESET_PARAMS}
+            return CachedModel(model, x, slots, problem, params)
+
+        for name, value in entry.params.items():
+            entry.model.setParam(name, value)
+        update_model(entry.model, entry.x, entry.slots, entry.problem, problem)
+        entry.x.Start = entry.solution if entry.solution is not None else GRB.UNDEFINED
+        entry.problem = problem
+        entry.reused = True
+        return entry
+
+    def checkin(self, owner, entry):
+        """Return a checked out model; it is disposed when it doesn't fit the budget."""
+        try:
+            entry.solution = entry.x.X if entry.model.SolCount > 0 else None
+            entry.nbytes = model_bytes(entry.model)
+        except Exception:
+            entry.model.dispose()
+            raise
+        if entry.nbytes > self.max_bytes:
+            entry.model.dispose()
+            return
+
+        key = (owner, structure_key(entry.problem))
+        evicted = []
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                # Built by a concurrent solve of the same structure
+                self._bytes -= previous.nbytes
+                evicted.append(previous)
+            self._entries[key] = entry
+            self._bytes += entry.nbytes
+            while self._bytes > self.max_bytes:
+                _, oldest = self._entries.popitem(last=False)
+                self._bytes -= oldest.nbytes
+                self.evictions += 1
+                evicted.append(oldest)
+        for old in evicted:
+            old.model.dispose()
+
+    def stats(self):
+        with self._lock:
+            return {'models': len(self._entries), 'bytes': self._bytes, 'max_bytes': self.max_bytes,
+                    'hits': self.hits, 'misses': self.misses, 'evictions': self.evictions}
+
+    def clear(self):
+        with self._lock:
+            entries, self._entries, self._bytes = list(self._entries.values()), OrderedDict(), 0
+        for entry in entries:
+            entry.model.dispose()
@@ -0,0 +1,49 @@
+"""
+Storage format of saved schedule payloads.
+
+Small payloads are kept as JSON text in saved_schedule.data. Larger ones
+(solve inputs and schedules of big rosters) are zlib-compressed into
+saved_schedule.data_zlib, leaving data empty. Listing schedules never reads
+either column; only loading one schedule inflates its payload.
+
+The assignments of a saved schedule are also kept as rows of the
+shift_assignment table (see assignment_rows), so they can be looked up
+without reading payloads.
+
+Shared by app.py and the scripts that write saved schedules directly.
+"""
+import json
+import zlib
+
+# Payloads from this size (bytes of JSON) on are stored compressed
+COMPRESS_MIN_BYTES = 1024
+
+
+def dump_data(payload):
+    """Return (data, data_zlib) column values for a JSON-serializable payload."""
+    text = json.dumps(payload)
+    if len(text) < COMPRESS_MIN_BYTES:
+        return text, None
+    return '', zlib.compress(text.encode('utf-8'))
+
+
+def load_data(data, data_zlib):
+    """Inverse of dump_data; rows written before compression only have data."""
+    if data_zlib is not None:
+        return json.loads(zlib.decompress(data_zlib).decode('utf-8'))
+    return json.loads(data)
+
+
+def assignment_rows(payload, employee_ids):
+    """(employee_id, day, shift) for every assignment in the 'schedule' of a payload.
+
+    employee_ids maps schedule names to employee ids; other names are skipped.
+    """
+    schedule = payload.get('schedule') if isinstance(payload, dict) else None
+    if not isinstance(schedule, dict):
+        return []
+    rows = []
+    for day, shifts in schedule.items():
+        for shift, names in (shifts or {}).items():
+            rows.extend((employee_ids[name], day, shift) for name in names or [] if name in employee_ids)
+    return rows
@@ -0,0 +1,170 @@
+"""
+The scheduling problem as arrays, and the solve payloads it is parsed from.
+
+Only NumPy is needed here, so the web process can parse, diff and cache
+Problems without importing the optimization stack (see solver.py, which
+builds and solves the models in the solve workers).
+"""
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from availability import GridMapper
+
+
+@dataclass
+class Problem:
+    """Normalized solve input, with availability as an (employee, day, shift) tensor."""
+    days: list
+    shift_names: list
+    employees: list
+    shift_hours: np.ndarray   # (S,) hours per shift
+    available: np.ndarray     # (E, D, S) bool
+    min_hours: np.ndarray     # (E,) 0 means no lower bound
+    max_hours: np.ndarray     # (E,) 0 means no upper bound
+    wage: np.ndarray          # (E,)
+    responsible: np.ndarray   # (E,) bool
+    min_staff: np.ndarray     # (D, S) 0 means no minimum
+    max_staff: np.ndarray     # (D, S) 0 means no maximum
+    responsible_required: bool
+    # Week of each day (D,); the hour limits apply per week. All zeros for a single week
+    week: np.ndarray = field(default=None)
+    # Nobody works the last shift of a day and the first shift of the next day
+    forbid_close_open: bool = False
+
+    def __post_init__(self):
+        if self.week is None:
+            self.week = np.zeros(len(self.days), dtype=int)
+
+    @property
+    def shape(self):
+        return self.available.shape
+
+    @property
+    def n_weeks(self):
+        return int(self.week.max()) + 1 if len(self.week) else 1
+
+
+def parse_problem(data):
+    """Convert a /solve_schedule payload into a Problem."""
+    days = list(data['days'])
+    shifts_data = data['shifts'] # List of {name: 'Morning', hours: 4}
+    shift_names = [s['name'] for s in shifts_data]
+    employees_data = data['employees'] # List of employee objects
+    employees = [emp['name'] for emp in employees_data]
+
+    # Availability arrives either as a packed mask (see availability.py) or
+    # as the legacy dict of 'Employee1_Mon_Morning': True/False
+    suffixes = [f"_{d}_{s_name}" for d in days for s_name in shift_names]
+    mapper = GridMapper(days, shift_names)
+    available = np.zeros((len(employees), len(days), len(shift_names)), dtype=bool)
+    for e, emp in enumerate(employees_data):
+        if emp.get('availability_mask') is not None:
+            available[e] = mapper.grid(emp['availability_mask'])
+        else:
+            legacy = emp.get('availability') or {}
+            available[e] = np.array([bool(legacy.get(emp['name'] + suffix, False)) for suffix in suffixes],
+                                    dtype=bool).reshape(len(days), len(shift_names))
+
+    min_per_shift = data['min_employees_per_shift']
+    max_per_shift = data['max_employees_per_shift']
+    staff_keys = [f'{d}_{s_name}' for d in days for s_name in shift_names]
+
+    return Problem(
+        days=days,
+        shift_names=shift_names,
+        employees=employees,
+        shift_hours=np.array([s['hours'] for s in shifts_data], dtype=float),
+        available=available,
+        min_hours=np.array([emp['min_hours'] or 0 for emp in employees_data], dtype=float),
+        max_hours=np.array([emp['max_hours'] or 0 for emp in employees_data], dtype=float),
+        wage=np.array([emp['wage'] for emp in employees_data], dtype=float),
+        responsible=np.array([bool(emp['can_be_responsible']) for emp in employees_data], dtype=bool),
+        min_staff=np.array([min_per_shift.get(k, 0) or 0 for k in staff_keys], dtype=float).reshape(len(days), len(shift_names)),
+        max_staff=np.array([max_per_shift.get(k, 0) or 0 for k in staff_keys], dtype=float).reshape(len(days), len(shift_names)),
+        responsible_required=bool(data['responsible_required_overall']),
+        forbid_close_open=bool(data.get('forbid_close_open')),
+    )
+
+
+def extract_schedule(problem, slots, values):
+    """Map solution values (one per slot) back to {day: {shift: [employee, ...]}}."""
+    schedule = {d: {s_name: [] for s_name in problem.shift_names} for d in problem.days}
+    chosen = slots[np.asarray(values) > 0.5]
+    # slots are employee-major, so each shift list keeps the input employee order
+    for e, d, s in zip(*np.unravel_index(chosen, problem.shape)):
+        schedule[problem.days[d]][problem.shift_names[s]].append(problem.employees[e])
+    return schedule
+
+
+def assignment_tensor(problem, schedule):
+    """(E, D, S) bool tensor of a {day: {shift: [employee, ...]}} schedule.
+
+    Days, shifts and employees that are not part of the problem are ignored.
+    """
+    assigned = np.zeros(problem.shape, dtype=bool)
+    emp_pos = {name: e for e, name in enumerate(problem.employees)}
+    shift_pos = {name: s for s, name in enumerate(problem.shift_names)}
+    for d, day in enumerate(problem.days):
+        for shift, names in (schedule or {}).get(day, {}).items():
+            if shift not in shift_pos:
+                continue
+            for name in names:
+                if name in emp_pos:
+                    assigned[emp_pos[name], d, shift_pos[shift]] = True
+    return assigned
+
+
+def affected_days(base, problem):
+    """Days of problem whose inputs differ from base.
+
+    Changes that aren't tied to a day (employees added or removed, wage,
+    hour limits, shifts) affect the whole week.
+    """
+    all_days = list(problem.days)
+    if (base.days != problem.days or base.shift_names != problem.shift_names
+            or sorted(base.employees) != sorted(problem.employees)
+            or base.responsible_required != problem.responsible_required
+            or base.forbid_close_open != problem.forbid_close_open
+            or not np.array_equal(base.week, problem.week)
+            or not np.array_equal(base.shift_hours, problem.shift_hours)):
+        return all_days
+
+    # Align the base employees with the order used by problem
+    base_pos = {name: e for e, name in enumerate(base.employees)}
+    order = [base_pos[name] for name in problem.employees]
+    for attr in ('min_hours', 'max_hours', 'wage', 'responsible'):
+        if not np.array_equal(getattr(base, attr)[order], getattr(problem, attr)):
+            return all_days
+
+    changed = ((base.available[order] != problem.available).any(axis=(0, 2))
+               | (base.min_staff != problem.min_staff).any(axis=1)
+               | (base.max_staff != problem.max_staff).any(axis=1))
+    return [day for day, flag in zip(all_days, changed) if flag]
+
+
+def apply_delta(data, delta):
+    """Return a copy of a solve payload with a partial update applied.
+
+    delta may contain 'employees' (dicts merged into the employee of the same
+    name, or added), 'remove_employees' (names) and per-shift
+    'min_employees_per_shift' / 'max_employees_per_shift' overrides. Payloads
+    for stored employees ('employee_ids') only take the staffing overrides.
+    """
+    data = dict(data)
+    if 'employees' in data:
+        employees = {emp['name']: dict(emp) for emp in data['employees']}
+        for name in delta.get('remove_employees', []):
+            employees.pop(name, None)
+        for update in delta.get('employees', []):
+            base = dict(employees.get(update['name'], {}))
+            # A new availability in either format replaces the old one
+            if 'availability' in update or 'availability_mask' in update:
+                base.pop('availability', None)
+                base.pop('availability_mask', None)
+            employees[update['name']] = dict(base, **update)
+        data['employees'] = list(employees.values())
+    for name in ('min_employees_per_shift', 'max_employees_per_shift'):
+        if name in delta:
+            data[name] = dict(data[name], **delta[name])
+    return data
@@ -0,0 +1,174 @@
+"""
+Per-manager cache of stored employees as solver arrays.
+
+Solve requests may name employees by id instead of shipping their data; the
+arrays for those employees come from a Roster built once from the Employee
+table and kept until one of the manager's employees changes. Availability is
+mapped onto each requested day/shift grid once and memoized, so repeated
+what-if solves only pay for the shift configuration they send.
+
+The cache lives in the web process; every worker process keeps its own.
+invalidate() only reaches the process it runs in, so lookups also compare a
+version of the manager's employees (see RosterCache) and reload rosters
+changed through another process.
+"""
+import threading
+from collections import OrderedDict
+from dataclasses import dataclass, field
+
+import numpy as np
+
+from availability import DAYS
+from problem import Problem
+
+# Request grids memoized per roster; what-if solves rarely use more than a few
+MAX_GRIDS = 8
+
+# Same default as the full-time hours field of the scheduler page
+DEFAULT_FULL_TIME_HOURS = 40
+
+
+class UnknownEmployees(ValueError):
+    pass
+
+
+@dataclass
+class Roster:
+    ids: np.ndarray           # (E,) employee ids, ascending
+    names: list
+    min_hours: np.ndarray     # (E,)
+    max_hours: np.ndarray     # (E,)
+    wage: np.ndarray          # (E,)
+    responsible: np.ndarray   # (E,) bool
+    full_time: np.ndarray     # (E,) bool
+    groups: dict              # shift names -> (rows, (n, len(DAYS), S) bool grids)
+    _grids: dict = field(default_factory=dict, repr=False)
+    # Rosters are shared by the request threads
+    _lock: threading.Lock = field(default_factory=threading.Lock, repr=False, compare=False)
+
+    @classmethod
+    def from_rows(cls, rows):
+        """rows: (id, name, min_hours, max_hours, wage, can_be_responsible, is_full_time, shifts, grid) tuples."""
+        rows = sorted(rows, key=lambda row: row[0])
+        grouped = {}
+        for position, row in enumerate(rows):
+            grouped.setdefault(tuple(row[7]), []).append(position)
+        groups = {}
+        for shifts, positions in grouped.items():
+            grids = np.array([rows[p][8] for p in positions], dtype=bool)
+            groups[shifts] = (np.array(positions), grids.reshape(len(positions), len(DAYS), len(shifts)))
+        return cls(
+            ids=np.array([row[0] for row in rows], dtype=np.int64),
+            names=[row[1] for row in rows],
+            min_hours=np.array([row[2] or 0 for row in rows], dtype=float),
+            max_hours=np.array([row[3] or 0 for row in rows], dtype=float),
+            wage=np.array([row[4] or 0 for row in rows], dtype=float),
+            responsible=np.array([bool(row[5]) for row in rows], dtype=bool),
+            full_time=np.array([bool(row[6]) for row in rows], dtype=bool),
+            groups=groups,
+        )
+
+    def available(self, days, shift_names):
+        """(E, D, S) availability of every employee on a request grid, memoized per grid."""
+        key = (tuple(days), tuple(shift_names))
+        with self._lock:
+            grid = self._grids.get(key)
+        if grid is None:
+            grid = np.zeros((len(self.ids), len(days), len(shift_names)), dtype=bool)
+            day_idx = [DAYS.index(d) if d in DAYS else len(DAYS) for d in days]
+            for shifts, (rows, grids) in self.groups.items():
+                shift_idx = [shifts.index(s) if s in shifts else len(shifts) for s in shift_names]
+                # Pad with a False day/shift for names the stored grids don't have
+                padded = np.zeros((len(rows), len(DAYS) + 1, len(shifts) + 1), dtype=bool)
+                padded[:, :len(DAYS), :len(shifts)] = grids
+                grid[rows] = padded[:, day_idx][:, :, shift_idx]
+            grid.flags.writeable = False
+            with self._lock:
+                if key not in self._grids and len(self._grids) >= MAX_GRIDS:
+                    self._grids.pop(next(iter(self._grids)))
+                self._grids[key] = grid
+        return grid
+
+    def positions(self, employee_ids):
+        """Row positions of employee_ids ('all' for everyone); raises UnknownEmployees."""
+        if employee_ids == 'all':
+            return np.arange(len(self.ids))
+        wanted = np.unique(np.asarray(employee_ids, dtype=np.int64))
+        unknown = wanted[~np.isin(wanted, self.ids)]
+        if len(unknown):
+            raise UnknownEmployees(f'Unknown employee ids: {unknown.tolist()}')
+        return np.searchsorted(self.ids, wanted)
+
+    def problem(self, data, employee_ids):
+        """Problem for a solve payload without 'employees', using the stored employees instead.
+
+        Like the scheduler page, full-time employees work exactly
+        full_time_hours_per_week and are not counted in the cost.
+        """
+        days = list(data['days'])
+        shift_names = [s['name'] for s in data['shifts']]
+        rows = self.positions(employee_ids)
+        min_per_shift = data['min_employees_per_shift']
+        max_per_shift = data['max_employees_per_shift']
+        staff_keys = [f'{d}_{s_name}' for d in days for s_name in shift_names]
+        full_time = self.full_time[rows]
+        full_time_hours = float(data.get('full_time_hours_per_week', DEFAULT_FULL_TIME_HOURS) or 0)
+        return Problem(
+            days=days,
+            shift_names=shift_names,
+            employees=[self.names[r] for r in rows],
+            shift_hours=np.array([s['hours'] for s in data['shifts']], dtype=float),
+            available=self.available(days, shift_names)[rows],
+            min_hours=np.where(full_time, full_time_hours, self.min_hours[rows]),
+            max_hours=np.where(full_time, full_time_hours, self.max_hours[rows]),
+            wage=np.where(full_time, 0.0, self.wage[rows]),
+            responsible=self.responsible[rows],
+            min_staff=np.array([min_per_shift.get(k, 0) or 0 for k in staff_keys], dtype=float).reshape(len(days), len(shift_names)),
+            max_staff=np.array([max_per_shift.get(k, 0) or 0 for k in staff_keys], dtype=float).reshape(len(days), len(shift_names)),
+            responsible_required=bool(data['responsible_required_overall']),
+            forbid_close_open=bool(data.get('forbid_close_open')),
+        )
+
+
+class RosterCache:
+    def __init__(self, load, maxsize=128, version=None):
+        # load(manager_id) -> rows for Roster.from_rows; version(manager_id) -> a value
+        # that changes whenever the manager's employees do, checked on every get()
+        self.maxsize = maxsize
+        self._load = load
+        self._version = version
+        self._rosters = OrderedDict()
+        # Bumped by invalidate() so a roster loaded during a change isn't kept
+        self._generations = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, manager_id):
+        version = self._version(manager_id) if self._version is not None else None
+        with self._lock:
+            entry = self._rosters.get(manager_id)
+            if entry is not None and entry[0] == version:
+                self._rosters.move_to_end(manager_id)
+                self.hits += 1
+                return entry[1]
+            self.misses += 1
+            generation = self._generations.get(manager_id, 0)
+
+        roster = Roster.from_rows(self._load(manager_id))
+        with self._lock:
+            if self._generations.get(manager_id, 0) == generation:
+                # The version was read before loading, so a change in between only costs a reload
+                self._rosters[manager_id] = (version, roster)
+                while len(self._rosters) > self.maxsize:
+                    self._rosters.popitem(last=False)
+        return roster
+
+    def invalidate(self, manager_id):
+        with self._lock:
+            self._rosters.pop(manager_id, None)
+            self._generations[manager_id] = self._generations.get(manager_id, 0) + 1
+
+    def stats(self):
+        with self._lock:
+            return {'hits': self.hits, 'misses': self.misses, 'size': len(self._rosters), 'maxsize': self.maxsize}
@@ -0,0 +1,493 @@
+"""
+Shift scheduling optimization model.
+
+Everything in this module is independent of Flask and the database so it can
+run inside the solve worker processes (see jobs.py) as well as in-process.
+The Problem arrays and payload helpers live in problem.py.
+"""
+import time
+
+import gurobipy as gp
+import numpy as np
+import scipy.sparse as sp
+from gurobipy import GRB
+
+import heuristic
+from aggregation import group_employees, class_problem, disaggregate
+from feasibility import find_issues, infeasible_result
+from problem import extract_schedule, assignment_tensor
+
+INFEASIBLE_MESSAGE = "No feasible solution found. The current availability of employees is not enough to generate a schedule that satisfies all conditions. Please adjust your inputs (e.g., increase availability, reduce minimum requirements, or add more employees)."
+UNBOUNDED_MESSAGE = "The model is unbounded, which means the objective can be infinitely improved. This usually indicates a problem in the model formulation."
+
+# Minimum number of seconds between two progress reports / cancel checks from the solver callback
+PROGRESS_INTERVAL = 0.5
+STOP_CHECK_INTERVAL = 0.1
+
+# Pool solutions collected per requested alternative when they must differ by min_changes
+DIVERSITY_OVERSAMPLE = 4
+
+# Seconds of local search spent on the greedy MIP start (see heuristic.py)
+HEURISTIC_START_SECONDS = 0.1
+
+
+def make_env(threads=None):
+    """Start a Gurobi environment to build many models on; threads caps each of them."""
+    env = gp.Env(empty=True)
+    env.setParam('OutputFlag', 0)
+    if threads:
+        env.setParam('Threads', threads)
+    env.start()
+    return env
+
+
+def build_model(problem, env=None, counts=None, fixed_rows=False):
+    """Build the scheduling MIP with one binary per available (employee, day, shift) slot.
+
+    Returns (model, x, slots) where slots holds the flat (E, D, S) index of
+    each column of x, in employee-major order. With counts, each 'employee'
+    stands for that many interchangeable people and x holds integer counts.
+    With fixed_rows, every hour and staffing limit gets a row, unlimited ones
+    with a right-hand side that can't bind, so the limits can later be
+    changed in place (see update_model).
+    """
+    n_emp, n_days, n_shifts = problem.shape
+    slots = np.flatnonzero(problem.available.ravel())
+    e_idx, d_idx, s_idx = np.unravel_index(slots, problem.shape)
+    ds_idx = d_idx * n_shifts + s_idx
+    cols = np.arange(len(slots))
+    hours = problem.shift_hours[s_idx]
+
+    model = gp.Model("ShiftScheduling", env=env)
+    model.setParam('OutputFlag', 0) # Suppress Gurobi output in console
+
+    # Decision variables and objective: minimize cost (full-time workers are sent with wage 0)
+    if counts is None:
+        x = model.addMVar(len(slots), vtype=GRB.BINARY, obj=problem.wage[e_idx] * hours, name="x")
+    else:
+        x = model.addMVar(len(slots), ub=counts[e_idx], vtype=GRB.INTEGER, obj=problem.wage[e_idx] * hours, name="x")
+    model.ModelSense = GRB.MINIMIZE
+
+    # Each row is labelled (kind, employee or flat (day, shift) index) so it can be
+    # traced back, e.g. when explaining an infeasible model
+    blocks, senses, rhs, kinds, refs = [], [], [], [], []
+
+    # Min and Max weekly hours, in the order min_e, max_e for each employee and
+    # week (0 means 'unlimited'). Rows refer to employee * n_weeks + week.
+    n_weeks = problem.n_weeks
+    min_hours, max_hours, min_staff, max_staff = _limits(problem, slots)
+    has_min = np.flatnonzero((min_hours > 0) | fixed_rows)
+    has_max = np.flatnonzero((np.repeat(problem.max_hours, n_weeks) > 0) | fixed_rows)
+    row_emp = np.concatenate([has_min, has_max])
+    row_kind = np.concatenate([np.zeros(len(has_min), dtype=int), np.ones(len(has_max), dtype=int)])
+    order = np.lexsort((row_kind, row_emp))
+    row_emp, row_kind = row_emp[order], row_kind[order]
+    emp_hours = sp.csr_matrix((hours, (e_idx * n_weeks + problem.week[d_idx], cols)), shape=(n_emp * n_weeks, len(slots)))
+    blocks.append(emp_hours[row_emp])
+    senses.append(np.where(row_kind == 0, GRB.GREATER_EQUAL, GRB.LESS_EQUAL))
+    rhs.append(np.where(row_kind == 0, min_hours[row_emp], max_hours[row_emp]))
+    kinds.append(np.where(row_kind == 0, 'min_hours', 'max_hours'))
+    refs.append(row_emp)
+
+    # Minimum and maximum number of employees per shift
+    staffing = sp.csr_matrix((np.ones(len(slots)), (ds_idx, cols)), shape=(n_days * n_shifts, len(slots)))
+    for limits, given, sense, kind in ((min_staff, problem.min_staff, GRB.GREATER_EQUAL, 'min_employees'),
+                                       (max_staff, problem.max_staff, GRB.LESS_EQUAL, 'max_employees')):
+        rows = np.flatnonzero((given.ravel() > 0) | fixed_rows)
+        blocks.append(staffing[rows])
+        senses.append(np.full(len(rows), sense))
+        rhs.append(limits[rows])
+        kinds.append(np.full(len(rows), kind))
+        refs.append(rows)
+
+    # Responsible person assigned per shift (if required)
+    if problem.responsible_required:
+        resp = problem.responsible[e_idx].astype(float)
+        blocks.append(sp.csr_matrix((resp, (ds_idx, cols)), shape=(n_days * n_shifts, len(slots))))
+        senses.append(np.full(n_days * n_shifts, GRB.GREATER_EQUAL))
+        rhs.append(np.ones(n_days * n_shifts))
+        kinds.append(np.full(n_days * n_shifts, 'responsible'))
+        refs.append(np.arange(n_days * n_shifts))
+
+    # Rest between days: closing shift of day d and opening shift of day d + 1
+    # (rows refer to employee * n_days + d)
+    if problem.forbid_close_open and n_shifts > 1 and n_days > 1:
+        column = np.full(problem.available.size, -1)
+        column[slots] = cols
+        column = column.reshape(problem.shape)
+        closing, opening = column[:, :-1, -1], column[:, 1:, 0]
+        e_rest, d_rest = np.nonzero((closing >= 0) & (opening >= 0))
+        rows = np.arange(len(e_rest))
+        blocks.append(sp.csr_matrix(
+            (np.ones(2 * len(rows)), (np.concatenate([rows, rows]),
+                                      np.concatenate([closing[e_rest, d_rest], opening[e_rest, d_rest]]))),
+            shape=(len(rows), len(slots)),
+        ))
+        senses.append(np.full(len(rows), GRB.LESS_EQUAL))
+        rhs.append(np.ones(len(rows)))
+        kinds.append(np.full(len(rows), 'rest'))
+        refs.append(e_rest * n_days + d_rest)
+
+    A = sp.vstack(blocks, format='csr')
+    constrs = model.addMConstr(A, x, np.concatenate(senses), np.concatenate(rhs)) if A.shape[0] else None
+    model._rows = (np.concatenate(kinds), np.concatenate(refs), constrs)
+    return model, x, slots
+
+
+def update_model(model, x, slots, base, problem):
+    """Turn a fixed_rows model of base into the model of problem, in place.
+
+    Both must have the same employees, days, shifts, availability, weeks and
+    rules (see models.structure_key); wages, hour and staffing limits, shift
+    hours and responsible flags may differ. Variable bounds are reset.
+    """
+    n_emp, n_days, n_shifts = problem.shape
+    e_idx, d_idx, s_idx = np.unravel_index(slots, problem.shape)
+    hours = problem.shift_hours[s_idx]
+    x.Obj = problem.wage[e_idx] * hours
+    x.LB, x.UB = 0.0, 1.0
+
+    kinds, refs, constrs = model._rows
+    if constrs is None:
+        return
+    # Rows are min/max per employee-week, min staff, max staff, then the responsible and rest rows
+    min_hours, max_hours, min_staff, max_staff = _limits(problem, slots)
+    n_hours, n_staff = 2 * len(min_hours), 2 * len(min_staff)
+    rhs = constrs.RHS
+    rhs[:n_hours] = np.column_stack([min_hours, max_hours]).ravel()
+    rhs[n_hours:n_hours + n_staff] = np.concatenate([min_staff, max_staff])
+    constrs.RHS = rhs
+
+    # Coefficients that changed: the hours of a shift, or who counts as responsible
+    changed_hours = np.flatnonzero(base.shift_hours[s_idx] != hours)
+    changed_resp = (np.flatnonzero(base.responsible[e_idx] != problem.responsible[e_idx])
+                    if problem.responsible_required else [])
+    if len(changed_hours) or len(changed_resp):
+        rows, columns = constrs.tolist(), x.tolist()
+        emp_week = e_idx * problem.n_weeks + problem.week[d_idx]
+        for c in changed_hours:
+            model.chgCoeff(rows[2 * emp_week[c]], columns[c], hours[c])
+            model.chgCoeff(rows[2 * emp_week[c] + 1], columns[c], hours[c])
+        for c in changed_resp:
+            model.chgCoeff(rows[n_hours + n_staff + d_idx[c] * n_shifts + s_idx[c]], columns[c],
+                           float(problem.responsible[e_idx[c]]))
+
+
+def _limits(problem, slots):
+    # Right-hand sides of the hour rows (per employee-week) and staffing rows (per
+    # flat day-shift). Unlimited maxima become the most that could be assigned.
+    e_idx, d_idx, s_idx = np.unravel_index(slots, problem.shape)
+    n_weeks = problem.n_weeks
+    emp_week = e_idx * n_weeks + problem.week[d_idx]
+    hours_capacity = np.bincount(emp_week, weights=problem.shift_hours[s_idx], minlength=len(problem.employees) * n_weeks)
+    staff_capacity = np.bincount(d_idx * problem.shape[2] + s_idx, minlength=problem.min_staff.size).astype(float)
+    max_hours = np.repeat(problem.max_hours, n_weeks)
+    max_staff = problem.max_staff.ravel()
+    return (np.repeat(problem.min_hours, n_weeks), np.where(max_hours > 0, max_hours, hours_capacity),
+            problem.min_staff.ravel(), np.where(max_staff > 0, max_staff, staff_capacity))
+
+
+def explain_infeasibility(model, problem):
+    """Compute an IIS of an infeasible model and describe its constraints as issues."""
+    kinds, refs, constrs = model._rows
+    if constrs is None:
+        return []
+    model.computeIIS()
+    issues = []
+    for row in np.flatnonzero(constrs.IISConstr):
+        issue = {'type': 'iis', 'constraint': str(kinds[row])}
+        if kinds[row] in ('min_hours', 'max_hours'):
+            e, w = divmod(int(refs[row]), problem.n_weeks)
+            issue['employee'] = problem.employees[e]
+            if problem.n_weeks > 1:
+                issue['week'] = w + 1
+        elif kinds[row] == 'rest':
+            e, d = divmod(int(refs[row]), len(problem.days))
+            issue.update(employee=problem.employees[e], day=problem.days[d])
+        else:
+            d, s = divmod(int(refs[row]), len(problem.shift_names))
+            issue.update(day=problem.days[d], shift=problem.shift_names[s])
+        issues.append(issue)
+    return issues
+
+
+def solve(problem, time_limit=None, on_progress=None, should_stop=None, on_incumbent=None,
+          previous=None, fixed_days=(), aggregate=False, precheck=True, explain=False, threads=None,
+          mip_gap=None, env=None, alternatives=1, min_changes=0, models=None, owner=None,
+          heuristic_start=False):
+    """Build and optimize the scheduling model for a Problem.
+
+    on_progress(dict) is called periodically while Gurobi runs, should_stop()
+    is polled and terminates the solve when it returns True, and
+    on_incumbent(dict) receives every improving schedule with its cost and gap.
+    previous is an earlier schedule used as MIP start; assignments on
+    fixed_days are kept as they were, unless that makes the model infeasible.
+    aggregate solves interchangeable employees as classes (see aggregation.py);
+    it is ignored for warm starts, which refer to named employees, and for
+    problems with several weeks or rest rules, which a class split can't honour.
+    precheck runs the combinatorial checks of feasibility.py first; explain
+    computes an IIS when Gurobi finds the model infeasible. threads caps the
+    Gurobi threads of this solve (default: all cores, or the env's setting)
+    and mip_gap sets the relative gap at which it stops. Models are built on
+    env when given (see make_env), else on the default environment.
+    alternatives > 1 also returns the best schedules from Gurobi's solution
+    pool, each at least min_changes assignments away from the others (see
+    _alternatives); aggregation is skipped for them.
+    models is a models.ModelCache: the model is taken from it for owner,
+    updated in place, and handed back afterwards instead of being disposed.
+    Solves with alternatives build their own model, as they add cuts to it.
+    heuristic_start gives Gurobi the greedy schedule of heuristic.py as MIP
+    start when there is no earlier schedule to start from.
+    Returns a JSON-serializable result dict; Gurobi errors are raised.
+    """
+    if should_stop is not None and should_stop():
+        return {'status': 'cancelled', 'message': 'The solve was cancelled.'}
+
+    stats = {'aggregated': False, 'employees': len(problem.employees)}
+    if precheck:
+        started = time.perf_counter()
+        issues = find_issues(problem)
+        stats['precheck_seconds'] = time.perf_counter() - started
+        if issues:
+            return dict(infeasible_result(issues), solve_stats=stats)
+
+    if (aggregate and previous is None and not explain and alternatives <= 1
+            and problem.n_weeks == 1 and not problem.forbid_close_open):
+        classes = group_employees(problem)
+        stats['classes'] = len(classes)
+        if len(classes) < len(problem.employees):
+            result = _solve_aggregated(problem, classes, time_limit, threads, mip_gap, env,
+                                       on_progress, should_stop, on_incumbent, stats)
+            if result is not None:
+                return result
+            # Counts that can't be split over the members: solve per employee instead
+            stats['disaggregation_failed'] = True
+
+    started = time.perf_counter()
+    cached = models.checkout(owner, problem, env) if models is not None and alternatives <= 1 else None
+    if cached is not None:
+        model, x, slots = cached.model, cached.x, cached.slots
+        stats['model_reused'] = cached.reused
+    else:
+        model, x, slots = build_model(problem, env=env)
+    stats['build_seconds'] = time.perf_counter() - started
+    # From here on the model goes back to the cache, or is disposed, whatever happens
+    try:
+        _set_limits(model, time_limit, threads, mip_gap)
+        if alternatives > 1:
+            model.setParam('PoolSearchMode', 2)
+            model.setParam('PoolSolutions', alternatives * (DIVERSITY_OVERSAMPLE if min_changes else 1))
+
+        if heuristic_start and previous is None and not (cached is not None and cached.solution is not None):
+            started = time.perf_counter()
+            assigned = heuristic.construct(problem)
+            if assigned is not None:
+                assigned = heuristic.improve(problem, assigned, HEURISTIC_START_SECONDS)
+                x.Start = assigned.ravel()[slots].astype(float)
+                stats['heuristic_cost'] = heuristic.total_cost(problem, assigned)
+            stats['heuristic_seconds'] = time.perf_counter() - started
+
+        prev = None
+        if previous is not None:
+            prev = assignment_tensor(problem, previous)
+            start = prev.ravel()[slots].astype(float)
+            x.Start = start
+            fixed = np.isin(np.unravel_index(slots, problem.shape)[1],
+                            [d for d, day in enumerate(problem.days) if day in fixed_days])
+            if fixed.any():
+                lb, ub = np.zeros(len(slots)), np.ones(len(slots))
+                lb[fixed] = ub[fixed] = start[fixed]
+                x.LB, x.UB = lb, ub
+
+        # === Solve ===
+        to_schedule = lambda values: extract_schedule(problem, slots, values)
+        callback = _progress_callback(x, to_schedule, on_progress, should_stop, on_incumbent)
+        started = time.perf_counter()
+        model.optimize(callback)
+        if prev is not None and fixed_days:
+            if model.Status in (GRB.INFEASIBLE, GRB.INF_OR_UNBD):
+                # Keeping those days doesn't work out, re-optimize the whole week
+                x.LB, x.UB = 0.0, 1.0
+                fixed_days = []
+                model.optimize(callback)
+        stats['optimize_seconds'] = time.perf_counter() - started
+        _model_stats(model, stats)
+
+        started = time.perf_counter()
+        result = _result(model, x, to_schedule)
+        stats['extract_seconds'] = time.perf_counter() - started
+        result['solve_stats'] = stats
+        if explain and model.Status == GRB.INFEASIBLE:
+            started = time.perf_counter()
+            result.update(infeasible_result(explain_infeasibility(model, problem)))
+            stats['explain_seconds'] = time.perf_counter() - started
+        if prev is not None:
+            result['fixed_days'] = [day for day in problem.days if day in fixed_days]
+            if 'schedule' in result:
+                new = assignment_tensor(problem, result['schedule'])
+                result['changed_assignments'] = int((new != prev).sum())
+        if alternatives > 1 and 'schedule' in result:
+            result['alternatives'] = _alternatives(model, x, to_schedule, callback, alternatives, min_changes)
+        return result
+    except BaseException:
+        # A model the error may have left half changed isn't cached again
+        cached = None
+        raise
+    finally:
+        if cached is not None:
+            models.checkin(owner, cached)
+        else:
+            model.dispose()
+
+
+def _solve_aggregated(problem, classes, time_limit, threads, mip_gap, env, on_progress, should_stop, on_incumbent, stats):
+    # Returns None when the optimal counts can't be split over the class members
+    started = time.perf_counter()
+    reduced, sizes = class_problem(problem, classes)
+    model, x, slots = build_model(reduced, env=env, counts=sizes)
+    stats['build_seconds'] = time.perf_counter() - started
+    _set_limits(model, time_limit, threads, mip_gap)
+
+    def to_schedule(values):
+        assigned = disaggregate(problem, classes, slots, values)
+        if assigned is None:
+            return None
+        return extract_schedule(problem, np.flatnonzero(assigned.ravel()), np.ones(int(assigned.sum())))
+
+    try:
+        callback = _progress_callback(x, to_schedule, on_progress, should_stop, on_incumbent)
+        started = time.perf_counter()
+        model.optimize(callback)
+        stats['optimize_seconds'] = time.perf_counter() - started
+        _model_stats(model, stats)
+
+        schedule = None
+        if model.SolCount > 0:
+            started = time.perf_counter()
+            schedule = to_schedule(x.X)
+            stats['disaggregate_seconds'] = time.perf_counter() - started
+            if schedule is None:
+                return None
+        stats['aggregated'] = True
+
+        result = _result(model, x, lambda values: schedule)
+        result['solve_stats'] = stats
+        return result
+    finally:
+        model.dispose()
+
+
+def _alternatives(model, x, to_schedule, callback, k, min_changes):
+    # Greedily keep pool solutions, best first, that differ from every kept one in
+    # at least min_changes assignments. When the pool runs short, the neighbourhood
+    # of each kept schedule is cut off and the same model is optimized again.
+    kept, cut = [], 0
+    while True:
+        for n in range(model.SolCount):
+            model.setParam('SolutionNumber', n)
+            chosen = x.Xn > 0.5
+            if all((chosen != other).sum() >= max(min_changes, 1) for other, _ in kept):
+                kept.append((chosen, model.PoolObjVal))
+                if len(kept) == k:
+                    break
+        if len(kept) == k or not min_changes or model.Status != GRB.OPTIMAL:
+            break
+        for chosen, _ in kept[cut:]:
+            model.addConstr((1.0 - 2.0 * chosen) @ x >= min_changes - chosen.sum())
+        cut = len(kept)
+        model.setParam('PoolSolutions', (k - len(kept)) * DIVERSITY_OVERSAMPLE)
+        model.optimize(callback)
+        if model.SolCount == 0:
+            break
+
+    best = kept[0][0]
+    return [{'schedule': to_schedule(chosen.astype(float)), 'total_cost': cost,
+             'changed_assignments': int((chosen != best).sum())} for chosen, cost in kept]
+
+
+def _model_stats(model, stats):
+    # Model size and solver statistics reported with every result
+    stats.update(variables=model.NumVars, constraints=model.NumConstrs, runtime=model.Runtime)
+    if model.IsMIP:
+        stats['nodes'] = int(model.NodeCount)
+
+
+def _set_limits(model, time_limit, threads, mip_gap):
+    if time_limit:
+        model.setParam('TimeLimit', time_limit)
+    if threads:
+        model.setParam('Threads', threads)
+    if mip_gap is not None:
+        model.setParam('MIPGap', mip_gap)
+
+
+def _result(model, x, to_schedule):
+    # === Output ===
+    if model.Status == GRB.OPTIMAL:
+        return {'status': 'optimal', 'schedule': to_schedule(x.X), 'total_cost': model.ObjVal}
+    elif model.Status == GRB.INFEASIBLE:
+        return {'status': 'infeasible', 'message': INFEASIBLE_MESSAGE}
+    elif model.Status == GRB.UNBOUNDED:
+        return {'status': 'unbounded', 'message': UNBOUNDED_MESSAGE}
+    elif model.Status in (GRB.TIME_LIMIT, GRB.INTERRUPTED):
+        status = 'time_limit' if model.Status == GRB.TIME_LIMIT else 'cancelled'
+        result = {'status': status, 'message': f"Optimization stopped early with status {model.Status}."}
+        # Hand back the best schedule found so far, if any
+        if model.SolCount > 0:
+            result.update(schedule=to_schedule(x.X), total_cost=model.ObjVal, mip_gap=model.MIPGap)
+        return result
+    else:
+        return {'status': 'error', 'message': f"Optimization stopped with status {model.Status}."}
+
+
+def _progress_callback(x, to_schedule, on_progress, should_stop, on_incumbent):
+    if on_progress is None and should_stop is None and on_incumbent is None:
+        return None
+
+    last_report = [0.0]
+    last_stop_check = [0.0]
+
+    def callback(model, where):
+        if where == GRB.Callback.MIPSOL and on_incumbent is not None:
+            # Every new incumbent improves on the previous one
+            schedule = to_schedule(model.cbGetSolution(x))
+            if schedule is not None:
+                best = model.cbGet(GRB.Callback.MIPSOL_OBJ)
+                bound = model.cbGet(GRB.Callback.MIPSOL_OBJBND)
+                on_incumbent({
+                    'schedule': schedule,
+                    'total_cost': best,
+                    'mip_gap': _gap(best, bound),
+                    'runtime': model.cbGet(GRB.Callback.RUNTIME),
+                })
+
+        now = time.monotonic()
+        if should_stop is not None and now - last_stop_check[0] >= STOP_CHECK_INTERVAL:
+            last_stop_check[0] = now
+            if should_stop():
+                model.terminate()
+                return
+
+        if where != GRB.Callback.MIP or on_progress is None:
+            return
+        if now - last_report[0] < PROGRESS_INTERVAL:
+            return
+        last_report[0] = now
+
+        best = model.cbGet(GRB.Callback.MIP_OBJBST)
+        bound = model.cbGet(GRB.Callback.MIP_OBJBND)
+        on_progress({
+            'incumbent': best if best < GRB.INFINITY else None,
+            'bound': bound,
+            'mip_gap': _gap(best, bound),
+            'nodes': model.cbGet(GRB.Callback.MIP_NODCNT),
+            'runtime': model.cbGet(GRB.Callback.RUNTIME),
+        })
+
+    return callback
+
+
+def _gap(best, bound):
+    if best >= GRB.INFINITY:
+        return None
+    return abs(best - bound) / max(abs(best), 1e-10)
@@ -268,8 +268,17 @@ document.addEventListener('DOMContentLoaded', function() {
     const resultsDiv = document.getElementById('results');
     const scheduleOutput = document.getElementById('scheduleOutput');
     const totalCostOutput = document.getElementById('totalCostOutput');
+    const resultsIcon = document.getElementById('resultsIcon');
+    const resultsTitle = document.getElementById('resultsTitle');
+    const resultsDetail = document.getElementById('resultsDetail');
     const responsibleRequiredOverallCheckbox = document.getElementById('responsibleRequiredOverall');
     const errorDisplay = document.getElementById('errorDisplay');
+    const incumbentStatus = document.getElementById('incumbentStatus');
+    const acceptIncumbentBtn = document.getElementById('acceptIncumbentBtn');
+    const alternativesPager = document.getElementById('alternativesPager');
+    const alternativesLabel = document.getElementById('alternativesLabel');
+    const prevAlternativeBtn = document.getElementById('prevAlternativeBtn');
+    const nextAlternativeBtn = document.getElementById('nextAlternativeBtn');
 
     const minMaxGrid = document.getElementById('minMaxGrid');
     const sameMinMaxForAllShiftsCheckbox = document.getElementById('sameMinMaxForAllShifts');
@@ -970,6 +979,102 @@ document.addEventListener('DOMContentLoaded', function() {
         updatePhase2UI();
     })();
 
+    // --- Streaming solve progress ---
+    // Resolves with the final result of a solve job. While the solver runs, the best
+    // schedule found so far is announced and the user may accept it, which cancels
+    // the job; the final result then carries that schedule.
+    function followSolveJob(jobId) {
+        incumbentStatus.style.display = 'none';
+        acceptIncumbentBtn.style.display = 'none';
+        acceptIncumbentBtn.disabled = false;
+        acceptIncumbentBtn.onclick = () => {
+            acceptIncumbentBtn.disabled = true;
+            fetch(`/api/solve_jobs/${jobId}`, { method: 'DELETE' });
+        };
+
+        return new Promise((resolve, reject) => {
+            const source = new EventSource(`/api/solve_jobs/${jobId}/events`);
+            source.addEventListener('incumbent', (e) => {
+                const incumbent = JSON.parse(e.data);
+                const gap = incumbent.mip_gap !== null ? ` (gap ${(incumbent.mip_gap * 100).toFixed(1)}%)` : '';
+                incumbentStatus.textContent = `Best schedule so far: $${incumbent.total_cost.toFixed(2)}${gap}`;
+                incumbentStatus.style.display = 'block';
+                acceptIncumbentBtn.style.display = 'inline-block';
+            });
+            source.addEventListener('result', (e) => {
+                source.close();
+                resolve(JSON.parse(e.data).result);
+            });
+            source.onerror = () => {
+                source.close();
+                reject(new Error('Lost connection to the solver'));
+            };
+        });
+    }
+
+    // --- Results ---
+    function renderSchedule(schedule, totalCost, days, shifts) {
+        let scheduleHtml = '';
+        for (const day of days) {
+            scheduleHtml += `<h5>${day}:</h5><ul>`;
+            for (const shift of shifts) {
+                const assigned = schedule[day][shift.name];
+                    if (assigned && assigned.length > 0) {
+                    // Wrap each employee name so it can be styled (e.g., bold) via CSS
+                    const empHtml = assigned.map(name => `<span class="scheduled-employee">${name}</span>`).join(', ');
+                    scheduleHtml += `<li><strong>${shift.name}:</strong> ${empHtml}</li>`;
+                } else {
+                    scheduleHtml += `<li><strong>${shift.name}:</strong> ${ (window.t ? window.t('no_employees_assigned') : 'No employees assigned') }</li>`;
+                }
+            }
+            scheduleHtml += `</ul>`;
+        }
+        scheduleOutput.innerHTML = scheduleHtml;
+        // Render parenthetical as a conventional clarification: smaller, italic, normal weight, muted color
+        totalCostOutput.innerHTML = `Total Labor Cost <small style="font-size:0.60em; font-style:italic; font-weight:normal; color:white;">(Excl. fixed salary for full-time workers)</small>: $${totalCost.toFixed(2)}`;
+    }
+
+    // Only a proven optimum is called optimal; stopped solves still show their best schedule
+    const RESULT_HEADERS = {
+        optimal: ['bi-check-circle-fill text-optimal', 'Optimal Schedule Generated'],
+        feasible: ['bi-check-circle text-optimal', 'Schedule Generated'],
+        time_limit: ['bi-hourglass-split text-warning', 'Time Limit Reached: Best Schedule Found'],
+        cancelled: ['bi-stop-circle text-warning', 'Solve Stopped: Best Schedule Found'],
+    };
+
+    function showResultStatus(result) {
+        const [icon, title] = RESULT_HEADERS[result.status] || RESULT_HEADERS.feasible;
+        resultsIcon.className = `bi ${icon} me-2`;
+        resultsTitle.textContent = title;
+
+        const details = [];
+        if (result.engine === 'greedy') {
+            details.push(result.fallback_reason ? `Greedy engine (${result.fallback_reason})` : 'Greedy engine, not proven optimal');
+        }
+        if (result.status !== 'optimal' && result.mip_gap !== undefined && result.mip_gap !== null) {
+            details.push(`At most ${(result.mip_gap * 100).toFixed(1)}% above the lowest possible cost`);
+        }
+        resultsDetail.textContent = details.join('. ');
+        resultsDetail.style.display = details.length ? 'block' : 'none';
+    }
+
+    // Alternatives all come with the solve result, so paging through them needs no new solve
+    function showAlternatives(alternatives, days, shifts) {
+        let current = 0;
+        const show = () => {
+            const alternative = alternatives[current];
+            renderSchedule(alternative.schedule, alternative.total_cost, days, shifts);
+            const changes = current > 0 ? ` (${alternative.changed_assignments} changes from schedule 1)` : '';
+            alternativesLabel.textContent = `Schedule ${current + 1} of ${alternatives.length}${changes}`;
+            prevAlternativeBtn.disabled = current === 0;
+            nextAlternativeBtn.disabled = current === alternatives.length - 1;
+        };
+        prevAlternativeBtn.onclick = () => { current -= 1; show(); };
+        nextAlternativeBtn.onclick = () => { current += 1; show(); };
+        alternativesPager.style.display = alternatives.length > 1 ? 'block' : 'none';
+        show();
+    }
+
     // --- Form Submission ---
     submitScheduleBtn.addEventListener('click', async function(event) {
         event.preventDefault();
@@ -1070,42 +1175,33 @@ document.addEventListener('DOMContentLoaded', function() {
             max_employees_per_shift: maxEmployeesPerShift,
             responsible_required_overall: responsibleRequiredOverall,
             full_time_hours_per_week: fullTimeHours,
+            alternatives: parseInt(document.getElementById('alternativesCount').value) || 1,
+            min_changes: parseInt(document.getElementById('alternativesMinChanges').value) || 0,
             employees: employeesData
         };
 
         try {
-            const response = await fetch('/solve_schedule', {
+            // Submit the solve as a background job, then follow its progress over Server-Sent Events
+            const submitResponse = await fetch('/api/solve_jobs', {
                 method: 'POST',
                 headers: {
                     'Content-Type': 'application/json'
                 },
                 body: JSON.stringify(payload)
             });
+            const submitted = await submitResponse.json();
+            if (!submitResponse.ok) {
+                throw new Error(submitted.message || `HTTP ${submitResponse.status}`);
+            }
 
-            const result = await response.json();
+            const result = await followSolveJob(submitted.job_id);
             loadingSpinner.style.display = 'none';
 
-            if (result.status === 'optimal') {
+            if (result.schedule) {
                 resultsDiv.style.display = 'block';
-                let scheduleHtml = '';
-                for (const day of days) {
-                    scheduleHtml += `<h5>${day}:</h5><ul>`;
-                    for (const shift of shifts) {
-                        const assigned = result.schedule[day][shift.name];
-                            if (assigned && assigned.length > 0) {
-                            // Wrap each employee name so it can be styled (e.g., bold) via CSS
-                            const empHtml = assigned.map(name => `<span class="scheduled-employee">${name}</span>`).join(', ');
-                            scheduleHtml += `<li><strong>${shift.name}:</strong> ${empHtml}</li>`;
-                        } else {
-                            scheduleHtml += `<li><strong>${shift.name}:</strong> ${ (window.t ? window.t('no_employees_assigned') : 'No employees assigned') }</li>`;
-                        }
-                    }
-                    scheduleHtml += `</ul>`;
-                }
-                scheduleOutput.innerHTML = scheduleHtml;
-                // Render parenthetical as a conventional clarification: smaller, italic, normal weight, muted color
-                totalCostOutput.innerHTML = `Total Labor Cost <small style="font-size:0.60em; font-style:italic; font-weight:normal; color:white;">(Excl. fixed salary for full-time workers)</small>: $${result.total_cost.toFixed(2)}`;
-            } else if (result.status === 'infeasible' || result.status === 'unbounded' || result.status === 'error') {
+                showResultStatus(result);
+                showAlternatives(result.alternatives || [result], days, shifts);
+            } else if (result.message) {
                 errorDisplay.style.display = 'block';
                 errorDisplay.textContent = result.message;
             }
@@ -44,6 +44,9 @@ const translations = {
         employee: "Employee",
         availability_for: "Availability",
     availability_info: "Select the days and shifts you are available to work. Your manager will use this information when creating schedules.",
+        my_shifts: "My Shifts",
+        my_shifts_info: "Your shifts in the latest schedule of your manager.",
+        no_shifts: "You have no shifts in a saved schedule yet.",
         weekly_hours: "Weekly Hours",
         min_hours: "Min Hours",
         max_hours: "Max Hours",
@@ -183,6 +186,9 @@ const translations = {
         employee: "Employé",
         availability_for: "Disponibilité",
     availability_info: "Sélectionnez les jours et les postes où vous êtes disponible. Votre responsable utilisera ces informations pour établir les plannings.",
+        my_shifts: "Mes postes",
+        my_shifts_info: "Vos postes dans le dernier planning de votre responsable.",
+        no_shifts: "Vous n'avez encore aucun poste dans un planning enregistré.",
         weekly_hours: "Heures Hebdomadaires",
         min_hours: "Heures Min",
         max_hours: "Heures Max",
@@ -319,6 +325,9 @@ const translations = {
         employee: "Nhân Viên",
         availability_for: "Lịch rảnh",
     availability_info: "Chọn các ngày và ca mà bạn có thể làm. Quản lý sẽ sử dụng thông tin này khi tạo lịch.",
+        my_shifts: "Ca làm của tôi",
+        my_shifts_info: "Các ca của bạn trong lịch mới nhất của quản lý.",
+        no_shifts: "Bạn chưa có ca nào trong lịch đã lưu.",
         weekly_hours: "Giờ Hàng Tuần",
         min_hours: "Giờ Tối Thiểu",
         max_hours: "Giờ Tối Đa",
@@ -455,6 +464,9 @@ const translations = {
         employee: "Medewerker",
         availability_for: "Beschikbaarheid",
     availability_info: "Selecteer de dagen en diensten waarop u beschikbaar bent. Uw manager gebruikt deze informatie bij het opstellen van roosters.",
+        my_shifts: "Mijn diensten",
+        my_shifts_info: "Uw diensten in het laatste rooster van uw manager.",
+        no_shifts: "U heeft nog geen diensten in een opgeslagen rooster.",
         weekly_hours: "Wekelijkse uren",
         min_hours: "Min. uren",
         max_hours: "Max. uren",
@@ -0,0 +1,120 @@
+"""
+SQLite storage settings and schema migrations.
+
+configure_sqlite() makes every new connection of an engine use WAL, relaxed
+fsyncs and a busy timeout. With WAL, readers no longer block the writer (and
+the other way round), and writers queue behind each other for up to the busy
+timeout instead of failing with "database is locked".
+
+migrate() runs the migrations a database hasn't seen yet, in order, each in
+its own transaction, and records them in the schema_migrations table.
+Migrations must still be written idempotently: databases created before the
+table existed run all of them once.
+
+WriteBehind batches small writes that nothing waits for (e.g. cache hit
+timestamps) into one transaction per interval, off the request path.
+"""
+import logging
+import threading
+import time
+from datetime import datetime
+
+from sqlalchemy import event, text
+
+log = logging.getLogger(__name__)
+
+# Applied to every new connection, in this order. journal_mode=WAL is
+# persistent, the others are per connection.
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',
+    # Durable at checkpoints rather than at every commit; safe with WAL
+    'synchronous': 'NORMAL',
+    # Negative: KiB of page cache per connection
+    'cache_size': -64000,
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'MEMORY',
+    'busy_timeout': 5000,
+}
+
+
+def configure_sqlite(engine, pragmas=None):
+    """Apply pragmas (default: DEFAULT_PRAGMAS) to every new connection of engine."""
+    pragmas = dict(DEFAULT_PRAGMAS if pragmas is None else pragmas)
+
+    @event.listens_for(engine, 'connect')
+    def set_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for name, value in pragmas.items():
+            cursor.execute(f'PRAGMA {name}={value}')
+        cursor.close()
+
+    return pragmas
+
+
+def migrate(engine, migrations):
+    """Run the (name, fn(connection)) migrations that aren't recorded yet; returns their names."""
+    with engine.begin() as conn:
+        conn.execute(text('CREATE TABLE IF NOT EXISTS schema_migrations '
+                          '(name VARCHAR(200) PRIMARY KEY, applied_at DATETIME NOT NULL)'))
+        applied = {name for (name,) in conn.execute(text('SELECT name FROM schema_migrations'))}
+
+    ran = []
+    for name, fn in migrations:
+        if name in applied:
+            continue
+        started = time.perf_counter()
+        with engine.begin() as conn:
+            fn(conn)
+            conn.execute(text('INSERT INTO schema_migrations (name, applied_at) VALUES (:name, :now)'),
+                         {'name': name, 'now': datetime.utcnow()})
+        log.info('Applied migration %s in %.2fs', name, time.perf_counter() - started)
+        ran.append(name)
+    return ran
+
+
+class WriteBehind:
+    def __init__(self, engine, interval=1.0, max_batch=500):
+        # Pending (statement, params) are executed together every interval seconds,
+        # or as soon as max_batch of them are waiting
+        self.engine = engine
+        self.interval = interval
+        self.max_batch = max_batch
+        self._pending = []
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._thread = None
+        self.flushed = 0
+
+    def add(self, statement, params):
+        with self._lock:
+            self._pending.append((statement, params))
+            full = len(self._pending) >= self.max_batch
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='write-behind', daemon=True)
+                self._thread.start()
+        if full:
+            self._wake.set()
+
+    def _run(self):
+        while True:
+            self._wake.wait(self.interval)
+            self._wake.clear()
+            self.flush()
+
+    def flush(self):
+        with self._lock:
+            pending, self._pending = self._pending, []
+        if not pending:
+            return
+        # Consecutive writes of the same statement go out as one executemany
+        try:
+            with self.engine.begin() as conn:
+                batch = []
+                for statement, params in pending + [(None, None)]:
+                    if batch and statement is not batch[0][0]:
+                        conn.execute(batch[0][0], [p for _, p in batch])
+                        batch = []
+                    batch.append((statement, params))
+            self.flushed += len(pending)
+        except Exception:
+            log.exception('Dropped %d batched writes', len(pending))